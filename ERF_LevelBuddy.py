@@ -15,11 +15,33 @@
 #
 #  ***** END GPL LICENSE BLOCK *****
 
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
+import argparse
+import bisect
+import hashlib
+import json
 import math
-import bpy
-import bmesh
-from mathutils import Matrix, Vector
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import numpy as np
+try:
+    import bpy
+    import bmesh
+    from bpy.app.handlers import persistent
+    from bpy_extras.io_utils import ExportHelper
+    from mathutils import Matrix, Vector
+    from mathutils.bvhtree import BVHTree
+    from mathutils.geometry import delaunay_2d_cdt, intersect_point_line, intersect_tri_tri_2d
+except ImportError:  # plain Python (tests/): only the numpy algorithms are usable
+    bpy = None
+    def persistent(func): return func
 
 bl_info = {
     "name": "ERF Level Buddy",
@@ -33,7 +55,7 @@ bl_info = {
     "category": "Object",
 }
 
-IS_4X = bpy.app.version >= (4, 0, 0)
+IS_4X = bpy is not None and bpy.app.version >= (4, 0, 0)
 PREFERRED_COLOR_ATTR_NAME = "Attribute"
 
 # =========================
@@ -113,14 +135,12 @@ def fill_color_layer_object_mode(obj, rgba):
         data = layer.data
         n = len(data)
         if n > 0:
-            flat = [rgba[0], rgba[1], rgba[2], rgba[3]] * n
-            data.foreach_set("color", flat)
+            data.foreach_set("color", np.tile(np.asarray(rgba, dtype=np.float32), n))
     else:
         layer = ensure_color_layer(mesh)
         loop_count = len(mesh.loops)
         if loop_count > 0:
-            flat = [rgba[0], rgba[1], rgba[2], rgba[3]] * loop_count
-            layer.data.foreach_set("color", flat)
+            layer.data.foreach_set("color", np.tile(np.asarray(rgba, dtype=np.float32), loop_count))
 
     try:
         mesh.update()
@@ -148,112 +168,315 @@ def _prep_boolean_mesh(me, merge_dist=1e-6):
         bm.to_mesh(me)
         bm.free()
 
-def _cleanup_result_mesh(me, merge_dist=1e-5, angle_limit=0.0):
-    """Merge-by-distance; optional dissolve by angle."""
-    bm = bmesh.new()
-    bm.from_mesh(me)
+# ---------- World-space snap helpers ----------
+
+def read_vertex_coords(mesh):
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    return co.reshape(-1, 3)
+
+def write_changed_coords(mesh, co, new_co):
+    """Write new_co (float64) back if any vertex moved; returns the number of moved vertices."""
+    new_co = new_co.astype(np.float32)
+    changed = int(np.count_nonzero(np.any(new_co != co, axis=1)))
+    if changed:
+        mesh.vertices.foreach_set("co", new_co.ravel())
+        try:
+            mesh.update()
+        except Exception:
+            pass
+    return changed
+
+def snap_coords_world(co, matrix_world, step):
+    """Local coords (n, 3) snapped to a world-space grid with given step, as float64."""
+    m = np.array(matrix_world, dtype=np.float64)
+    im = np.array(matrix_world.inverted_safe(), dtype=np.float64)
+    wco = co @ m[:3, :3].T + m[:3, 3]
+    wco = np.round(wco / step) * step
+    return wco @ im[:3, :3].T + im[:3, 3]
+
+# ---------- Bounding-box broadphase ----------
+
+def object_matrix(obj):
+    """Object transform; matrix_basis for unparented (possibly unlinked) objects."""
+    return obj.matrix_world if obj.parent else obj.matrix_basis
+
+def world_aabb(obj):
+    """World-space (min, max) of the mesh vertices of obj, or None for an empty mesh."""
+    me = obj.data
+    n = len(me.vertices)
+    if n == 0: return None
+    co = np.empty(n * 3, dtype=np.float64)
+    me.vertices.foreach_get("co", co)
+    mw = np.array(object_matrix(obj), dtype=np.float64)
+    wco = co.reshape(-1, 3) @ mw[:3, :3].T + mw[:3, 3]
+    return wco.min(axis=0), wco.max(axis=0)
+
+def brush_world_aabb(ob):
+    """Conservative world (min, max) of a brush's operand: sectors include their extrusion, plus overlap."""
+    me = ob.data
+    if not len(me.vertices): return None
+    co = read_vertex_coords(me).astype(np.float64)
+    if getattr(ob, "brush_type", 'NONE') == 'SECTOR':
+        reach = max(abs(ob.floor_height), abs(ob.ceiling_height))
+        co = np.concatenate([co + (0.0, 0.0, reach), co - (0.0, 0.0, reach)])
+    scn = bpy.context.scene
+    if scn.use_boolean_overlap: co *= 1.0 + abs(scn.boolean_overlap_epsilon)
+    mw = np.array(object_matrix(ob), dtype=np.float64)
+    wco = co @ mw[:3, :3].T + mw[:3, 3]
+    return wco.min(axis=0), wco.max(axis=0)
+
+def aabbs_overlap(a, b, margin=0.0):
+    if a is None or b is None: return False
+    return bool(np.all(a[0] <= b[1] + margin) and np.all(b[0] <= a[1] + margin))
+
+def join_mesh_into(target, bool_obj):
+    """Append bool_obj's geometry to target's mesh (no boolean), mapping materials onto target slots."""
+    src = bool_obj.data.copy()
     try:
-        bmesh.ops.remove_doubles(bm, verts=bm.verts[:], dist=merge_dist)
-        if angle_limit > 0.0:
-            bmesh.ops.dissolve_limit(
-                bm, angle_limit=math.radians(angle_limit),
-                verts=bm.verts[:], edges=bm.edges[:]
-            )
-        bm.normal_update()
+        src.transform(object_matrix(target).inverted_safe() @ object_matrix(bool_obj))
+        tmats = target.data.materials
+        remap = []
+        for m in src.materials:
+            if m is not None and m.name not in tmats: tmats.append(m)
+            remap.append(tmats.find(m.name) if m is not None else 0)
+        if remap and len(src.polygons):
+            idx = np.empty(len(src.polygons), dtype=np.int32)
+            src.polygons.foreach_get("material_index", idx)
+            lut = np.array(remap, dtype=np.int32)
+            src.polygons.foreach_set("material_index", lut[np.clip(idx, 0, len(lut) - 1)])
+        bm = bmesh.new()
+        try:
+            bm.from_mesh(target.data)
+            bm.from_mesh(src)
+            bm.to_mesh(target.data)
+        finally:
+            bm.free()
     finally:
-        bm.to_mesh(me)
-        bm.free()
+        bpy.data.meshes.remove(src)
+    target.data.update()
 
-# ---------- World-space snap helpers ----------
+# ---------- Data-API evaluation (no operators, no context) ----------
 
-def snap_object_mesh_world(obj, step=0.01):
-    """Snap all verts of obj.data to a world-space grid with given step."""
-    if step <= 0.0 or obj.type != 'MESH':
-        return 0
-    mesh = obj.data
-    mw = obj.matrix_world
-    imw = mw.inverted_safe()
-    bm = bmesh.new()
-    bm.from_mesh(mesh)
-    changed = 0
-    for v in bm.verts:
-        wco = mw @ v.co
-        wco.x = round(wco.x / step) * step
-        wco.y = round(wco.y / step) * step
-        wco.z = round(wco.z / step) * step
-        new_local = imw @ wco
-        if (new_local - v.co).length > 1e-9:
-            v.co = new_local
-            changed += 1
-    bm.to_mesh(mesh)
-    bm.free()
+BUILD_SCENE_NAME = "_LB_BuildScene"
+
+def get_build_scene():
+    """Private scene whose depsgraph evaluates build objects without touching the user's view layer."""
+    sc = bpy.data.scenes.get(BUILD_SCENE_NAME)
+    if sc is None:
+        sc = bpy.data.scenes.new(BUILD_SCENE_NAME)
+    return sc
+
+def free_build_scene():
+    sc = bpy.data.scenes.get(BUILD_SCENE_NAME)
+    if sc is not None:
+        bpy.data.scenes.remove(sc)
+
+def evaluate_object_mesh(obj, into=None):
+    """New mesh with obj's modifier stack applied, evaluated in the build scene (into: refill that mesh instead)."""
+    sc = get_build_scene()
+    linked = sc.collection.objects.get(obj.name) is None
+    if linked: sc.collection.objects.link(obj)
     try:
-        mesh.update()
-    except Exception:
-        pass
-    return changed
+        view_layer = sc.view_layers[0]
+        view_layer.update()
+        dg = view_layer.depsgraph
+        evaluated = obj.evaluated_get(dg)
+        if into is None:
+            return bpy.data.meshes.new_from_object(evaluated, preserve_all_data_layers=True, depsgraph=dg)
+        # the evaluated object owns this mesh, it never enters bpy.data
+        me = evaluated.to_mesh(preserve_all_data_layers=True, depsgraph=dg)
+        bm = bmesh.new()
+        try:
+            bm.from_mesh(me)
+            bm.to_mesh(into)
+            # the evaluated mesh holds evaluated copies of the materials
+            for m in me.materials:
+                into.materials.append(m.original if m is not None else None)
+        finally:
+            bm.free()
+            evaluated.to_mesh_clear()
+        return into
+    finally:
+        if linked: sc.collection.objects.unlink(obj)
+
+def apply_modifiers(obj, accept=None):
+    """Bake obj's modifiers into its mesh; the data-API counterpart of modifier_apply.
+
+    accept(mesh) may reject the result: obj is left unchanged then and None is returned.
+    """
+    me = evaluate_object_mesh(obj)
+    if accept is not None and not accept(me):
+        bpy.data.meshes.remove(me)
+        return None
+    old = obj.data
+    name = old.name
+    obj.modifiers.clear()
+    obj.data = me
+    if old.users == 0: bpy.data.meshes.remove(old)
+    me.name = name
+    return me
+
+# ---------- Operand pool ----------
+# Boolean operands are pooled "_booley" objects. A released operand's mesh is cleared and
+# refilled in place for the next brush, so a build holds as many temporaries as operands
+# are in use at once (one run of brushes), whatever the brush count. Whoever builds
+# operands frees the pool when done, which removes exactly what it created.
+
+# "free": released operand objects, "used": handed out since the last release
+_operand_pool = {"free": [], "used": []}
+
+def acquire_operand():
+    """An empty pooled operand object: no geometry, no materials, identity transform."""
+    pool = _operand_pool
+    if pool["free"]:
+        ob = pool["free"].pop()
+        ob.data.clear_geometry()  # also drops every attribute layer
+        ob.data.materials.clear()
+        ob.location, ob.rotation_euler, ob.scale = (0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+    else:
+        ob = bpy.data.objects.new("_booley", bpy.data.meshes.new("_booley"))
+    pool["used"].append(ob)
+    return ob
+
+def release_operands():
+    """Hand every operand acquired since the last release back to the pool."""
+    pool = _operand_pool
+    pool["free"] += pool["used"]
+    pool["used"] = []
+
+def free_operand_pool():
+    """Remove the pooled operand objects and their meshes."""
+    pool = _operand_pool
+    for ob in pool["free"] + pool["used"]:
+        try:
+            me = ob.data
+            bpy.data.objects.remove(ob)
+            if me is not None and me.users == 0: bpy.data.meshes.remove(me)
+        except ReferenceError:
+            pass  # removed by undo or a file load in between
+    pool["free"], pool["used"] = [], []
 
 # =========================
 # core functionality
 # =========================
 
 def auto_texture(bool_obj, source_obj):
+    """Box-project UVs for every face of bool_obj in one array pass (foreach_get/foreach_set)."""
     mesh = bool_obj.data
-    objectLocation = source_obj.location
-    objectScale = source_obj.scale
+    n_faces, n_loops = len(mesh.polygons), len(mesh.loops)
+    if n_loops == 0: return
 
-    bm = bmesh.new()
-    bm.from_mesh(mesh)
-    uv_layer = bm.loops.layers.uv.verify()
-
-    for f in bm.faces:
-        nX, nY, nZ = abs(f.normal.x), abs(f.normal.y), abs(f.normal.z)
-        faceDirection = "x"
-        faceNormalLargest = nX
-        if faceNormalLargest < nY: faceNormalLargest, faceDirection = nY, "y"
-        if faceNormalLargest < nZ: faceNormalLargest, faceDirection = nZ, "z"
-        if faceDirection == "x" and f.normal.x < 0: faceDirection = "-x"
-        if faceDirection == "y" and f.normal.y < 0: faceDirection = "-y"
-        if faceDirection == "z" and f.normal.z < 0: faceDirection = "-z"
-
-        for l in f.loops:
-            luv = l[uv_layer]
-            if faceDirection in ("x", "-x"):
-                luv.uv.x = (l.vert.co.y * objectScale[1]) + objectLocation[1]
-                luv.uv.y = (l.vert.co.z * objectScale[2]) + objectLocation[2]
-                luv.uv = rotate2D(luv.uv, source_obj.wall_texture_rotation)
-                luv.uv.x = translate(scale(luv.uv.x, source_obj.wall_texture_scale_offset[0]), source_obj.wall_texture_scale_offset[2])
-                luv.uv.y = translate(scale(luv.uv.y, source_obj.wall_texture_scale_offset[1]), source_obj.wall_texture_scale_offset[3])
-            if faceDirection in ("y", "-y"):
-                luv.uv.x = (l.vert.co.x * objectScale[0]) + objectLocation[0]
-                luv.uv.y = (l.vert.co.z * objectScale[2]) + objectLocation[2]
-                luv.uv = rotate2D(luv.uv, source_obj.wall_texture_rotation)
-                luv.uv.x = translate(scale(luv.uv.x, source_obj.wall_texture_scale_offset[0]), source_obj.wall_texture_scale_offset[2])
-                luv.uv.y = translate(scale(luv.uv.y, source_obj.wall_texture_scale_offset[1]), source_obj.wall_texture_scale_offset[3])
-            if faceDirection == "z":
-                luv.uv.x = (l.vert.co.x * objectScale[0]) + objectLocation[0]
-                luv.uv.y = (l.vert.co.y * objectScale[1]) + objectLocation[1]
-                luv.uv = rotate2D(luv.uv, source_obj.ceiling_texture_rotation)
-                luv.uv.x = translate(scale(luv.uv.x, source_obj.ceiling_texture_scale_offset[0]), source_obj.ceiling_texture_scale_offset[2])
-                luv.uv.y = translate(scale(luv.uv.y, source_obj.ceiling_texture_scale_offset[1]), source_obj.ceiling_texture_scale_offset[3])
-            if faceDirection == "-z":
-                luv.uv.x = (l.vert.co.x * objectScale[0]) + objectLocation[0]
-                luv.uv.y = (l.vert.co.y * objectScale[1]) + objectLocation[1]
-                luv.uv = rotate2D(luv.uv, source_obj.floor_texture_rotation)
-                luv.uv.x = translate(scale(luv.uv.x, source_obj.floor_texture_scale_offset[0]), source_obj.floor_texture_scale_offset[2])
-                luv.uv.y = translate(scale(luv.uv.y, source_obj.floor_texture_scale_offset[1]), source_obj.floor_texture_scale_offset[3])
-    bm.to_mesh(mesh)
-    bm.free()
-    bool_obj.data = mesh
+    normals = np.empty(n_faces * 3, dtype=np.float64)
+    mesh.polygons.foreach_get("normal", normals)
+    normals = normals.reshape(-1, 3)
+    totals = np.empty(n_faces, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", totals)
+    loop_verts = np.empty(n_loops, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)[loop_verts]
+
+    # dominant axis per face (first largest wins, as x > y > z before); class 0 wall, 1 ceiling (+z), 2 floor (-z)
+    axis = np.abs(normals).argmax(axis=1)
+    face_class = np.where(axis < 2, 0, np.where(normals[:, 2] < 0, 2, 1))
+    loop_axis = np.repeat(axis, totals)
+    loop_class = np.repeat(face_class, totals)
+
+    uv = box_project_uvs(co, loop_axis, loop_class, source_obj)
+    uv_layer = mesh.uv_layers.active or mesh.uv_layers.new()
+    uv_layer.data.foreach_set("uv", uv.ravel())
+
+def box_project_uvs(co, axis, face_class, source_obj):
+    """Auto-texture UVs (n, 2) of local corner positions co (n, 3) by dominant normal axis and class."""
+    # x faces project (y, z), y faces (x, z), z faces (x, y); object scale/location applied per axis
+    loc = np.array(source_obj.location, dtype=np.float64)
+    scl = np.array(source_obj.scale, dtype=np.float64)
+    rows = np.arange(len(co))
+    u_axis = np.where(axis == 0, 1, 0)
+    v_axis = np.where(axis == 2, 1, 2)
+    u = co[rows, u_axis] * scl[u_axis] + loc[u_axis]
+    v = co[rows, v_axis] * scl[v_axis] + loc[v_axis]
+
+    radians = np.radians([source_obj.wall_texture_rotation,
+                          source_obj.ceiling_texture_rotation,
+                          source_obj.floor_texture_rotation])[face_class]
+    scale_offset = np.array([source_obj.wall_texture_scale_offset,
+                             source_obj.ceiling_texture_scale_offset,
+                             source_obj.floor_texture_scale_offset], dtype=np.float64)[face_class]
+    cos, sin = np.cos(radians), np.sin(radians)
+    uv = np.empty((len(co), 2), dtype=np.float64)
+    uv[:, 0] = (u * cos - v * sin) * scale_offset[:, 0] + scale_offset[:, 2]
+    uv[:, 1] = (u * sin + v * cos) * scale_offset[:, 1] + scale_offset[:, 3]
+    return uv
+
+# ---------- Colour presets ----------
+# A brush either keeps its painted colour attribute ('LAYER') or carries a preset that is
+# written into its operand, so the booleans carry it into LevelGeometry: one colour per
+# face class (the auto-texture classes: wall, ceiling, floor) or a gradient over world height.
+
+def fill_color_layers(objects, rgba):
+    """Fill the colour layer of all objects from one preallocated buffer (Object Mode data, no mode switch)."""
+    meshes = {ob.data for ob in objects}
+    layers = [(me, ensure_color_layer(me)) for me in meshes]
+    buf = np.empty((max((len(layer.data) for me, layer in layers), default=0), 4), dtype=np.float32)
+    buf[:] = rgba
+    buf = buf.ravel()
+    for me, layer in layers:
+        layer.data.foreach_set("color", buf[:len(layer.data) * 4])
+        me.update()
+    return len(meshes)
+
+def brush_height_range(ob):
+    """World (min z, max z) of a brush; sectors include their floor and ceiling."""
+    co = read_vertex_coords(ob.data).astype(np.float64)
+    if not len(co): return None
+    if ob.brush_type == 'SECTOR':
+        up = -1.0 if _foreach_array(ob.data.polygons, "normal", 3, np.float32)[2::3].sum() < 0.0 else 1.0
+        co = np.concatenate([co + (0.0, 0.0, up * ob.floor_height), co + (0.0, 0.0, up * ob.ceiling_height)])
+    m = np.array(object_matrix(ob), dtype=np.float64)
+    z = co @ m[2, :3] + m[2, 3]
+    return float(z.min()), float(z.max())
+
+def preset_colors(ob, z, face_class):
+    """RGBA (n, 4) of ob's colour preset for corners at world heights z with face classes; None for 'LAYER'."""
+    if ob.color_mode == 'PARTS':
+        return np.array([ob.color_wall, ob.color_ceiling, ob.color_floor], dtype=np.float32)[face_class]
+    if ob.color_mode == 'GRADIENT':
+        lo, hi = ob.color_height_range
+        t = np.clip((z - lo) / (hi - lo), 0.0, 1.0) if hi != lo else (z >= hi).astype(np.float64)
+        bottom, top = np.array(ob.color_bottom), np.array(ob.color_top)
+        return (bottom + (top - bottom) * t[:, None]).astype(np.float32)
+    return None
+
+def apply_color_preset(bool_obj, source_obj):
+    """Write source_obj's colour preset into the colour layer of its operand."""
+    me = bool_obj.data
+    if source_obj.color_mode == 'LAYER' or not len(me.loops): return
+    normals = _foreach_array(me.polygons, "normal", 3, np.float32).reshape(-1, 3)
+    totals = _foreach_array(me.polygons, "loop_total", 1, np.int32)
+    corner_vert = _foreach_array(me.loops, "vertex_index", 1, np.int32)
+    axis = np.abs(normals).argmax(axis=1)
+    face_class = np.repeat(np.where(axis < 2, 0, np.where(normals[:, 2] < 0, 2, 1)), totals)
+    m = np.array(object_matrix(bool_obj), dtype=np.float64)
+    color = preset_colors(source_obj, (read_vertex_coords(me) @ m[2, :3] + m[2, 3])[corner_vert], face_class)
+    layer = ensure_color_layer(me)
+    if layer.domain == 'POINT':
+        point = np.ones((len(me.vertices), 4), dtype=np.float32)  # white where no corner writes
+        point[corner_vert] = color
+        color = point
+    layer.data.foreach_set("color", color.ravel())
 
 def update_location_precision(ob):
     p = bpy.context.scene.map_precision
-    ob.location.x = round(ob.location.x, p)
-    ob.location.y = round(ob.location.y, p)
-    ob.location.z = round(ob.location.z, p)
+    _set_changed(ob.location, "x", round(ob.location.x, p))
+    _set_changed(ob.location, "y", round(ob.location.y, p))
+    _set_changed(ob.location, "z", round(ob.location.z, p))
     cleanup_vertex_precision(ob)
 
 def _update_sector_solidify(self, context):
+    _brush_index_changed(self, context)
     ob = context.active_object
     if ob and ob.modifiers:
         mod = ob.modifiers[0]
@@ -262,7 +485,14 @@ def _update_sector_solidify(self, context):
             if mod.thickness != 0:
                 mod.offset = 1 + ob.floor_height / (mod.thickness / 2)
 
+def _set_changed(owner, attr, value):
+    """Assign only if different, so unchanged brushes don't get tagged for a depsgraph update."""
+    old = getattr(owner, attr)
+    if isinstance(old, float) and abs(old - value) <= 1e-6 * max(1.0, abs(value)): return
+    if old != value: setattr(owner, attr, value)
+
 def update_brush_sector_modifier(ob):
+    """Keep the display-only SOLIDIFY of a sector in sync with its heights (builds use sector_prism_mesh)."""
     if ob.brush_type == 'BRUSH':
         for mod in list(ob.modifiers):
             if mod.type == 'SOLIDIFY':
@@ -270,46 +500,113 @@ def update_brush_sector_modifier(ob):
         return
     has_solidify = any(m.type == 'SOLIDIFY' for m in ob.modifiers)
     if not has_solidify:
-        bpy.ops.object.modifier_add(type='SOLIDIFY')
+        ob.modifiers.new(name="Solidify", type='SOLIDIFY')
     for mod in ob.modifiers:
         if mod.type == 'SOLIDIFY':
-            mod.use_even_offset = True
-            try: mod.use_quality_normals = True
+            _set_changed(mod, "use_even_offset", True)
+            try: _set_changed(mod, "use_quality_normals", True)
             except Exception: pass
-            mod.thickness = ob.ceiling_height - ob.floor_height
-            if mod.thickness != 0:
-                mod.offset = 1 + ob.floor_height / (mod.thickness / 2)
-            mod.material_offset = 1
-            mod.material_offset_rim = 2
+            thickness = ob.ceiling_height - ob.floor_height
+            _set_changed(mod, "thickness", thickness)
+            if thickness != 0:
+                _set_changed(mod, "offset", 1 + ob.floor_height / (thickness / 2))
+            _set_changed(mod, "material_offset", 1)
+            _set_changed(mod, "material_offset_rim", 2)
             break
 
+def sector_prism_mesh(ob, me=None):
+    """Triangulated vertical prism of a sector footprint between floor_height and ceiling_height.
+
+    Built in one array pass with the layout of the sector's SOLIDIFY: footprint faces become
+    the ceiling (material 0), their reversed copy the floor (1) and boundary edges the walls (2).
+    Written into me (empty) if given, else into a new mesh.
+    """
+    src = ob.data
+    src.calc_loop_triangles()
+    nv, ne, nf, nl = len(src.vertices), len(src.edges), len(src.polygons), len(src.loops)
+    co = read_vertex_coords(src)
+    corner_vert = _foreach_array(src.loops, "vertex_index", 1, np.int32)
+    corner_edge = _foreach_array(src.loops, "edge_index", 1, np.int32)
+    loop_start = _foreach_array(src.polygons, "loop_start", 1, np.int32)
+    loop_total = _foreach_array(src.polygons, "loop_total", 1, np.int32)
+    tri_loops = _foreach_array(src.loop_triangles, "loops", 3, np.int32).reshape(-1, 3)
+    tri_face = _foreach_array(src.loop_triangles, "polygon_index", 1, np.int32)
+    normal_z = _foreach_array(src.polygons, "normal", 3, np.float32)[2::3]
+    # solidify offsets along the face normals; a flipped footprint builds downwards
+    up = -1.0 if nf and normal_z.sum() < 0.0 else 1.0
+
+    # a boundary edge is used by one corner only; its wall is (a, b, b'), (a, b', a')
+    face_of = np.repeat(np.arange(nf, dtype=np.int32), loop_total)
+    first = loop_start[face_of]
+    following = first + (np.arange(nl, dtype=np.int32) - first + 1) % loop_total[face_of]
+    wall = np.flatnonzero(np.bincount(corner_edge, minlength=ne)[corner_edge] == 1)
+    nxt = following[wall]
+    # corner -> source corner of the footprint, and whether it sits on the top (ceiling) level
+    src_loop = np.concatenate([tri_loops.ravel(), tri_loops[:, ::-1].ravel(),
+                               np.stack([wall, nxt, nxt, wall, nxt, wall], axis=1).ravel()])
+    top = np.concatenate([np.ones(tri_loops.size, dtype=bool), np.zeros(tri_loops.size, dtype=bool),
+                          np.tile(np.array([0, 0, 1, 0, 1, 1], dtype=bool), len(wall))])
+    nt = len(src_loop) // 3
+
+    if me is None: me = bpy.data.meshes.new("_booley")
+    verts = np.concatenate([co, co])
+    verts[:nv, 2] += up * ob.floor_height
+    verts[nv:, 2] += up * ob.ceiling_height
+    me.vertices.add(2 * nv)
+    me.vertices.foreach_set("co", verts.ravel())
+    me.loops.add(len(src_loop))
+    me.loops.foreach_set("vertex_index", corner_vert[src_loop] + nv * top)
+    me.polygons.add(nt)
+    me.polygons.foreach_set("loop_start", np.arange(0, 3 * nt, 3, dtype=np.int32))
+    me.polygons.foreach_set("material_index", np.repeat(np.array([0, 1, 2], dtype=np.int32),
+                                                         [len(tri_face), len(tri_face), 2 * len(wall)]))
+
+    # carry shading, colours and (unless auto texture replaces them) UVs over to the prism elements
+    index = {'POINT': np.concatenate([np.arange(nv), np.arange(nv)]), 'CORNER': src_loop,
+             'FACE': np.concatenate([tri_face, tri_face, np.repeat(face_of[wall], 2)])}
+    attrs = [src.attributes.get("sharp_face")] + list(src.color_attributes)
+    if not ob.brush_auto_texture: attrs += [src.attributes[layer.name] for layer in src.uv_layers]
+    for attr in attrs:
+        if attr is None or attr.data_type not in _ATTR_LAYOUT or attr.domain not in index: continue
+        key, size, dtype = _ATTR_LAYOUT[attr.data_type]
+        values = _foreach_array(attr.data, key, size, dtype).reshape(-1, size)[index[attr.domain]]
+        layer = me.attributes.get(attr.name) or me.attributes.new(attr.name, attr.data_type, attr.domain)
+        layer.data.foreach_set(key, values.ravel())
+    for m in src.materials:
+        me.materials.append(m)
+    me.update(calc_edges=True)
+    if src.uv_layers.active and src.uv_layers.active.name in me.uv_layers:
+        me.uv_layers.active = me.uv_layers[src.uv_layers.active.name]
+    if src.color_attributes.active_color_name in me.color_attributes:
+        me.color_attributes.active_color_name = src.color_attributes.active_color_name
+    return me
+
+def _set_material_slot_count(ob, count):
+    while len(ob.material_slots) < count:
+        ob.data.materials.append(None)
+    while len(ob.material_slots) > count:
+        ob.data.materials.pop()
+
 def update_sector_materials(ob):
-    while len(ob.material_slots) < 3:
-        bpy.ops.object.material_slot_add()
-    while len(ob.material_slots) > 3:
-        bpy.ops.object.material_slot_remove()
+    _set_material_slot_count(ob, 3)
     if bpy.data.materials.find(ob.ceiling_texture) != -1:
-        ob.material_slots[0].material = bpy.data.materials[ob.ceiling_texture]
+        _set_changed(ob.material_slots[0], "material", bpy.data.materials[ob.ceiling_texture])
     if bpy.data.materials.find(ob.floor_texture) != -1:
-        ob.material_slots[1].material = bpy.data.materials[ob.floor_texture]
+        _set_changed(ob.material_slots[1], "material", bpy.data.materials[ob.floor_texture])
     if bpy.data.materials.find(ob.wall_texture) != -1:
-        ob.material_slots[2].material = bpy.data.materials[ob.wall_texture]
+        _set_changed(ob.material_slots[2], "material", bpy.data.materials[ob.wall_texture])
 
 def update_brush_material(ob):
-    while len(ob.material_slots) < 1:
-        bpy.ops.object.material_slot_add()
-    while len(ob.material_slots) > 1:
-        bpy.ops.object.material_slot_remove()
+    _set_material_slot_count(ob, 1)
     mat_name = getattr(ob, "brush_material", "") or ""
     if mat_name and bpy.data.materials.find(mat_name) != -1:
-        ob.material_slots[0].material = bpy.data.materials[mat_name]
+        _set_changed(ob.material_slots[0], "material", bpy.data.materials[mat_name])
     else:
-        ob.material_slots[0].material = None
+        _set_changed(ob.material_slots[0], "material", None)
 
 def update_brush(obj):
-    bpy.context.view_layer.objects.active = obj
     if obj:
-        obj.display_type = 'WIRE'
+        _set_changed(obj, "display_type", 'WIRE')
         update_brush_sector_modifier(obj)
         if obj.brush_type == 'SECTOR':
             update_sector_materials(obj)
@@ -318,31 +615,79 @@ def update_brush(obj):
         update_location_precision(obj)
 
 def cleanup_vertex_precision(ob):
-    p = bpy.context.scene.map_precision
-    for v in ob.data.vertices:
-        v.co.x = round(v.co.x, p)
-        v.co.y = round(v.co.y, p)
-        v.co.z = round(v.co.z, p)
+    """Round local vertex coordinates to map_precision; returns the number of changed vertices."""
+    if ob.data.is_editmode:
+        return _cleanup_edit_vertex_precision(ob)
+    if not len(ob.data.vertices): return 0
+    co = read_vertex_coords(ob.data)
+    return write_changed_coords(ob.data, co, np.round(co.astype(np.float64), bpy.context.scene.map_precision))
+
+def _cleanup_edit_vertex_precision(ob):
+    """cleanup_vertex_precision for a mesh in edit mode: the edit bmesh is what the depsgraph
+    evaluates and what is written back on leaving edit mode, so it is rounded instead of ob.data,
+    which is then refreshed from it for the code reading brush data directly (prisms, fingerprints)."""
+    me = ob.data
+    bm = bmesh.from_edit_mesh(me)
+    if not len(bm.verts):
+        ob.update_from_editmode()
+        return 0
+    co = np.array([v.co for v in bm.verts], dtype=np.float32)
+    new_co = np.round(co.astype(np.float64), bpy.context.scene.map_precision).astype(np.float32)
+    moved = np.flatnonzero(np.any(new_co != co, axis=1))
+    if len(moved):
+        bm.verts.ensure_lookup_table()
+        for i in moved.tolist():
+            bm.verts[i].co = new_co[i]
+        bmesh.update_edit_mesh(me, loop_triangles=False, destructive=False)
+    ob.update_from_editmode()
+    return len(moved)
+
+def apply_csg(target, source_obj, bool_obj, reporter=None, operation=None, use_self=False, solver='EXACT', accept=None,
+              materials=None):
+    """Apply one operand to target. Returns 'BOOLEAN', 'SKIPPED', 'JOINED' or 'FAILED'.
 
-def apply_csg(target, source_obj, bool_obj, reporter=None):
+    solver 'FAST' selects the cheap float solver (named 'FLOAT' in newer Blender).
+    accept(mesh) can veto the boolean result, which returns 'REJECTED' and leaves target as it was.
+    materials: object whose materials target needs as well, e.g. an operand combined from several
+    brushes (the boolean maps a material missing on target to its first slot).
+    """
     # ensure color attrs
     if target.data: ensure_color_layer(target.data)
     if bool_obj.data: ensure_color_layer(bool_obj.data)
 
-    bpy.ops.object.select_all(action='DESELECT')
-    target.select_set(True)
+    if operation is None:
+        operation = csg_operation_to_blender_boolean[source_obj.csg_operation]
+
+    # broadphase: a disjoint operand cannot cut the target, and only needs a join to be added
+    if bpy.context.scene.use_boolean_broadphase:
+        margin = max(1e-4, 10.0 ** -bpy.context.scene.map_precision)
+        if not aabbs_overlap(world_aabb(target), world_aabb(bool_obj), margin):
+            if operation == 'DIFFERENCE':
+                return 'SKIPPED'
+            # a batched operand may overlap itself and still needs the solver to resolve that
+            if operation == 'UNION' and not use_self:
+                join_mesh_into(target, bool_obj)
+                return 'JOINED'
+
     copy_materials(target, source_obj)
+    if materials is not None: copy_materials(target, materials)
 
     # Boolean modifier with robustness tweaks
     mod = target.modifiers.new(name=source_obj.name, type='BOOLEAN')
     mod.object = bool_obj
-    mod.operation = csg_operation_to_blender_boolean[source_obj.csg_operation]
-    mod.solver = 'EXACT'
+    mod.operation = operation
+    if solver == 'FAST' and 'FAST' not in mod.bl_rna.properties["solver"].enum_items.keys():
+        solver = 'FLOAT'
+    mod.solver = solver
     if hasattr(mod, "double_threshold"):
         mod.double_threshold = 1e-6
+    if use_self and hasattr(mod, "use_self"):
+        mod.use_self = True
 
     try:
-        bpy.ops.object.modifier_apply(modifier=source_obj.name)
+        if apply_modifiers(target, accept) is None:
+            target.modifiers.remove(mod)
+            return 'REJECTED'
     except Exception as e:
         if reporter:
             reporter.report({'WARNING'}, f"Boolean apply failed on {target.name}: {e}")
@@ -350,31 +695,188 @@ def apply_csg(target, source_obj, bool_obj, reporter=None):
             target.modifiers.remove(mod)
         except Exception:
             pass
+        return 'FAILED'
+    return 'BOOLEAN'
 
-def build_bool_object(sourceObj):
-    bpy.ops.object.select_all(action='DESELECT')
-    sourceObj.select_set(True)
+def operand_needs_evaluation(brush):
+    """True when the operand comes from evaluated data (modifiers, shape keys), not just the brush's own props."""
+    if brush.data.shape_keys is not None: return True
+    return any(not (brush.brush_type == 'SECTOR' and m.type == 'SOLIDIFY') for m in brush.modifiers)
 
-    dg = bpy.context.evaluated_depsgraph_get()
-    eval_obj = sourceObj.evaluated_get(dg)
-    me = bpy.data.meshes.new_from_object(eval_obj)
+def build_bool_object(sourceObj, eps=None):
+    """Pooled operand (acquire_operand) holding sourceObj's operand mesh and transform."""
+    ob_bool = acquire_operand()
+    # sectors are generated directly unless they carry shape keys or modifiers besides their display solidify
+    generated = sourceObj.brush_type == 'SECTOR' and not operand_needs_evaluation(sourceObj)
+    me = sector_prism_mesh(sourceObj, ob_bool.data) if generated else evaluate_object_mesh(sourceObj, ob_bool.data)
 
     # optional small overlap push
-    scn = bpy.context.scene
-    eps = scn.boolean_overlap_epsilon if scn.use_boolean_overlap else 0.0
-    if eps and eps != 0.0:
-        for v in me.vertices:
-            v.co *= (1.0 + eps)
+    if eps is None:
+        scn = bpy.context.scene
+        eps = scn.boolean_overlap_epsilon if scn.use_boolean_overlap else 0.0
+    if eps and eps != 0.0 and len(me.vertices):
+        me.vertices.foreach_set("co", (read_vertex_coords(me) * (1.0 + eps)).ravel())
 
-    if me is not None:
+    if not generated:  # prisms come out triangulated and without doubles
         _prep_boolean_mesh(me, merge_dist=1e-6)
-        ensure_color_layer(me)
+    ensure_color_layer(me)
 
-    ob_bool = bpy.data.objects.new("_booley", me)
     copy_transforms(ob_bool, sourceObj)
     cleanup_vertex_precision(ob_bool)
     return ob_bool
 
+def build_operand(brush, profile=None, eps=None):
+    """Boolean operand for a brush: evaluated mesh, auto-texture UVs and color layer (eps: overlap override)."""
+    t = time.perf_counter()
+    bool_obj = build_bool_object(brush, eps)
+    t = profile_span(profile, brush.name, "build_bool_object", t, obj=bool_obj)
+    if brush.brush_auto_texture:
+        auto_texture(bool_obj, brush)
+        profile_span(profile, brush.name, "auto_texture", t, obj=bool_obj)
+    ensure_color_layer(bool_obj.data)
+    apply_color_preset(bool_obj, brush)
+    return bool_obj
+
+# ---------- Adaptive solver ----------
+# With build_solver 'ADAPTIVE' a brush whose operand is a small convex hull without faces
+# coplanar to the map (the float solver's blind spot) is cut with FAST first. The result is
+# kept if it changed the map, stayed manifold and has a plausible face count; otherwise
+# EXACT runs. A failing EXACT boolean is retried with a larger, then a smaller overlap
+# epsilon. What worked is remembered on the brush, keyed by its fingerprint, so later
+# builds go straight to it.
+
+ADAPTIVE_MAX_FACES = 64
+SOLVER_MEMORY_KEY = "lb_solver"
+
+def operand_is_simple_convex(operand, max_faces=ADAPTIVE_MAX_FACES):
+    me = operand.data
+    if not 0 < len(me.polygons) <= max_faces: return False
+    co = read_vertex_coords(me).astype(np.float64)
+    normal = _foreach_array(me.polygons, "normal", 3, np.float32).reshape(-1, 3)
+    center = _foreach_array(me.polygons, "center", 3, np.float32).reshape(-1, 3)
+    # every vertex on the inner side of every face plane
+    dist = np.einsum('fk,fvk->fv', normal, co[None, :, :] - center[:, None, :])
+    return bool(dist.max() <= 1e-5 * max(1.0, float(np.ptp(co, axis=0).max())))
+
+def _world_face_planes(obj):
+    """World (normals, centers, per-face AABB min, max) of obj's mesh."""
+    me = obj.data
+    m = np.array(object_matrix(obj), dtype=np.float64)
+    normal = _foreach_array(me.polygons, "normal", 3, np.float32).reshape(-1, 3) @ np.linalg.inv(m[:3, :3])
+    normal /= np.maximum(np.linalg.norm(normal, axis=1), 1e-12)[:, None]
+    co = read_vertex_coords(me).astype(np.float64) @ m[:3, :3].T + m[:3, 3]
+    center = _foreach_array(me.polygons, "center", 3, np.float32).reshape(-1, 3) @ m[:3, :3].T + m[:3, 3]
+    starts = _foreach_array(me.polygons, "loop_start", 1, np.int32)
+    corner = co[_foreach_array(me.loops, "vertex_index", 1, np.int32)]
+    return normal, center, np.minimum.reduceat(corner, starts), np.maximum.reduceat(corner, starts)
+
+def operand_allows_fast(target, operand, tolerance=1e-4):
+    """True if operand is simple and convex and none of its faces lies in the plane of a nearby map face."""
+    if not operand_is_simple_convex(operand): return False
+    if not len(target.data.polygons): return True
+    on, oc, olo, ohi = _world_face_planes(operand)
+    tn, tc, tlo, thi = _world_face_planes(target)
+    near = np.all(tlo <= ohi.max(axis=0) + tolerance, axis=1) & np.all(olo.min(axis=0) <= thi + tolerance, axis=1)
+    tn, tc = tn[near], tc[near]
+    if not len(tn): return True
+    parallel = np.abs(on @ tn.T) > 1.0 - 1e-6
+    offset = np.abs(np.einsum('ok,otk->ot', on, tc[None, :, :] - oc[:, None, :]))
+    return not bool(np.any(parallel & (offset < tolerance)))
+
+def mesh_is_manifold(me):
+    """Every edge used by exactly two faces."""
+    if not len(me.polygons): return True
+    counts = np.bincount(_foreach_array(me.loops, "edge_index", 1, np.int32), minlength=len(me.edges))
+    return bool(np.all(counts == 2))
+
+def fast_result_ok(me, before, operand_faces):
+    """Plausibility of a FAST boolean result given the map's (verts, faces) before it."""
+    if (len(me.vertices), len(me.polygons)) == before: return False  # the float solver gives up silently
+    if len(me.polygons) > 4 * (before[1] + operand_faces) + 16: return False
+    return mesh_is_manifold(me)
+
+def _remember_solver(brush, key, solver, eps=None):
+    memory = {"key": key, "solver": solver}
+    if eps is not None: memory["epsilon"] = eps
+    brush[SOLVER_MEMORY_KEY] = memory
+
+def apply_csg_adaptive(target, brush, operand, reporter=None):
+    """apply_csg with the adaptive solver policy; returns (result, solver used)."""
+    key = brush_fingerprint(brush)
+    memory = brush.get(SOLVER_MEMORY_KEY)
+    memory = memory.to_dict() if memory is not None and memory.get("key") == key else {}
+    if memory.get("solver") != 'EXACT' and operand_allows_fast(target, operand):
+        before, faces = _mesh_counts(target), len(operand.data.polygons)
+        result = apply_csg(target, brush, operand, reporter, solver='FAST',
+                           accept=lambda me: fast_result_ok(me, before, faces))
+        if result == 'BOOLEAN':
+            _remember_solver(brush, key, 'FAST')
+        if result not in ('REJECTED', 'FAILED'):
+            return result, 'FAST' if result == 'BOOLEAN' else 'NONE'
+
+    eps = memory.get("epsilon")
+    if eps is not None:
+        operand = build_operand(brush, eps=eps)
+    result = apply_csg(target, brush, operand, reporter)
+    if result == 'FAILED':
+        scn = bpy.context.scene
+        base = scn.boolean_overlap_epsilon if scn.use_boolean_overlap else 0.0
+        tried = {base if eps is None else eps}
+        # a larger, then a smaller push; without overlap the smaller one shrinks the operand slightly
+        for eps in (max(base * 4.0, 1e-3), base * 0.25 if base > 0.0 else -1e-4):
+            if eps in tried: continue
+            tried.add(eps)
+            result = apply_csg(target, brush, build_operand(brush, eps=eps), reporter)
+            if result != 'FAILED':
+                _report(reporter, 'INFO', f"{brush.name}: boolean succeeded with overlap epsilon {eps:g}")
+                break
+        else:
+            return result, 'EXACT'
+    if result == 'BOOLEAN':
+        _remember_solver(brush, key, 'EXACT', eps)
+    return result, 'EXACT' if result == 'BOOLEAN' else 'NONE'
+
+# ---------- Build strategies ----------
+
+def csg_runs(brushes):
+    """Split an order group into runs of consecutive brushes sharing a csg_operation.
+
+    Applying a run at once keeps the sequential result: (M + A) + B == M + (A + B)
+    and (M - A) - B == M - (A + B).
+    """
+    runs = []
+    for brush in brushes:
+        if runs and runs[-1][0].csg_operation == brush.csg_operation:
+            runs[-1].append(brush)
+        else:
+            runs.append([brush])
+    return runs
+
+def reduce_operands_tree(operands, stats=None, reporter=None):
+    """Union operand objects pairwise in a balanced tree and return the combined operand."""
+    level = list(operands)
+    while len(level) > 1:
+        merged = []
+        for k in range(0, len(level) - 1, 2):
+            a, b = level[k], level[k + 1]
+            result = apply_csg(a, b, b, reporter=reporter, operation='UNION')
+            if stats is not None: stats[result] += 1
+            merged.append(a)
+        if len(level) % 2:
+            merged.append(level[-1])
+        level = merged
+    return level[0]
+
+def batch_operands(operands):
+    """Join operand objects into a single identity-transform operand (no boolean between them)."""
+    if len(operands) == 1:
+        return operands[0]
+    batched = acquire_operand()
+    for bool_obj in operands:
+        join_mesh_into(batched, bool_obj)
+    ensure_color_layer(batched.data)
+    return batched
+
 def create_new_boolean_object(scn, name):
     old_map = None
     if bpy.data.meshes.get(name + "_MESH") is not None:
@@ -382,12 +884,13 @@ def create_new_boolean_object(scn, name):
     me = bpy.data.meshes.new(name + "_MESH")
     if bpy.data.objects.get(name) is None:
         ob = bpy.data.objects.new(name, me)
-        bpy.context.scene.collection.objects.link(ob)
+        scn.collection.objects.link(ob)
     else:
-        ob = bpy.data.objects[name]; ob.data = me
+        ob = bpy.data.objects[name]
+        old = ob.data; ob.data = me
+        if old is not None and old != old_map and old.users == 0: bpy.data.meshes.remove(old)
     if old_map is not None:
         bpy.data.meshes.remove(old_map)
-    ob.select_set(True)
     return ob
 
 def copy_materials(target, source):
@@ -402,557 +905,3400 @@ def copy_transforms(a, b):
     a.scale = b.scale
     a.rotation_euler = b.rotation_euler
 
-def set_normals_inward(ob):
+def removal_material_names(scn):
+    """Names of scene.remove_material and of the materials listed in scene.remove_materials."""
+    names = {item.material.name for item in getattr(scn, "remove_materials", ()) if item.material}
+    name = (getattr(scn, "remove_material", "") or "").strip()
+    if name: names.add(name)
+    return names
+
+def post_process_level_mesh(ob, merge_dist=1e-5, snap_step=0.0, remove=(), precision=3):
+    """Final clean-up of the built map without edit mode; returns the number of removed faces.
+
+    One bmesh pass welds by distance, deletes faces of the removed materials and makes the
+    winding consistent and pointing inward; one array pass then snaps to the world grid
+    and rounds to precision.
+    """
+    me = ob.data
+    slots = [i for i, m in enumerate(me.materials) if m and m.name in remove]
+    removed = 0
+    bm = bmesh.new()
+    bm.from_mesh(me)
     try:
-        bpy.ops.object.select_all(action='DESELECT')
-        ob.select_set(True)
-        bpy.context.view_layer.objects.active = ob
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.mesh.select_all(action='SELECT')
-        bpy.ops.mesh.normals_make_consistent(inside=True)
-        bpy.ops.object.mode_set(mode='OBJECT')
-    except Exception:
-        try:
-            bpy.ops.mesh.flip_normals()
-            bpy.ops.object.mode_set(mode='OBJECT')
-        except Exception:
-            pass
+        bmesh.ops.remove_doubles(bm, verts=bm.verts[:], dist=merge_dist)
+        if slots:
+            drop = set(slots)
+            faces = [f for f in bm.faces if f.material_index in drop]
+            removed = len(faces)
+            bmesh.ops.delete(bm, geom=faces, context='FACES')
+        bmesh.ops.recalc_face_normals(bm, faces=bm.faces[:])
+        bmesh.ops.reverse_faces(bm, faces=bm.faces[:])
+    finally:
+        bm.to_mesh(me)
+        bm.free()
+    # pop() also shifts the material index of faces using later slots
+    for i in reversed(slots):
+        me.materials.pop(index=i)
 
-def remove_material(obj):
-    scn = bpy.context.scene
-    name = (getattr(scn, "remove_material", "") or "").strip()
-    if not name: return
-    i, remove = 0, False
-    for m in obj.material_slots:
-        if m.name == name: remove = True
-        else:
-            if not remove: i += 1
-    if remove:
-        obj.active_material_index = i
-        bpy.ops.object.editmode_toggle()
-        bpy.ops.mesh.select_all(action='DESELECT')
-        bpy.ops.object.material_slot_select()
-        bpy.ops.mesh.delete(type='FACE')
-        bpy.ops.object.editmode_toggle()
-        bpy.ops.object.material_slot_remove()
+    ob.location = [round(c, precision) for c in ob.location]
+    if len(me.vertices):
+        co = read_vertex_coords(me)
+        new_co = co.astype(np.float64)
+        if snap_step > 0.0:
+            # matrix_world is only refreshed on depsgraph evaluation; matrix_basis follows the rounded location
+            matrix = ob.matrix_basis if ob.parent is None else ob.parent.matrix_world @ ob.matrix_parent_inverse @ ob.matrix_basis
+            new_co = snap_coords_world(new_co, matrix, snap_step)
+        write_changed_coords(me, co, np.round(new_co, precision))
+    return removed
 
 # =========================
-# properties
+# incremental build
 # =========================
 
-bpy.types.Scene.map_precision = bpy.props.IntProperty(
-    name="Map Precision", default=3, min=0, max=6,
-    description="Rounding level of vertex precision"
-)
-bpy.types.Scene.map_use_auto_smooth = bpy.props.BoolProperty(
-    name="Map Auto Smooth", description="Use auto smooth", default=True,
-)
-bpy.types.Scene.map_auto_smooth_angle = bpy.props.FloatProperty(
-    name="Angle", description="Auto smooth angle",
-    default=30, min=0, max=180, step=1, precision=0,
-)
-bpy.types.Scene.remove_material = bpy.props.StringProperty(
-    name="Remove Material",
-    description="Faces with this material will be removed on build"
-)
-bpy.types.Scene.color_attribute_name = bpy.props.StringProperty(
-    name="Color Attribute Name",
-    description="Per-corner color attribute to use",
-    default=PREFERRED_COLOR_ATTR_NAME
-)
+CHECKPOINT_PREFIX = "_LB_Checkpoint"
 
-# Boolean Overlap control (default ON with 0.002)
-bpy.types.Scene.use_boolean_overlap = bpy.props.BoolProperty(
-    name="Use Boolean Overlap", default=True,
-    description="If enabled, operands are slightly expanded to ensure overlap for booleans"
-)
-bpy.types.Scene.boolean_overlap_epsilon = bpy.props.FloatProperty(
-    name="Overlap Epsilon",
-    description="Tiny uniform scale on boolean operands before operations. Set 0 to disable.",
-    default=0.002, min=0.0, max=0.01, precision=5, step=0.0001
+# Object properties that feed a brush's boolean operand (UVs, materials, heights).
+FINGERPRINT_PROPS = (
+    "brush_type", "csg_operation", "csg_order", "brush_auto_texture", "brush_material",
+    "ceiling_height", "floor_height", "ceiling_texture", "wall_texture", "floor_texture",
+    "ceiling_texture_rotation", "wall_texture_rotation", "floor_texture_rotation",
+    "ceiling_texture_scale_offset", "wall_texture_scale_offset", "floor_texture_scale_offset",
+    "color_mode", "color_wall", "color_ceiling", "color_floor", "color_bottom", "color_top", "color_height_range",
 )
 
-# Post-build snap control (default ON, 0.01 world grid)
-bpy.types.Scene.post_build_snap_enable = bpy.props.BoolProperty(
-    name="Post-Build Snap", default=True,
-    description="Snap final LevelGeometry to a world grid after booleans"
-)
-bpy.types.Scene.post_build_snap_step = bpy.props.FloatProperty(
-    name="Snap Step",
-    description="World grid step for post-build snap",
-    default=0.01, min=0.0001, max=10.0, precision=4
-)
+def _hash_foreach(h, collection, attr, size, dtype):
+    arr = np.empty(len(collection) * size, dtype=dtype)
+    if len(arr): collection.foreach_get(attr, arr)
+    h.update(arr.tobytes())
 
-# UV/Height etc.
-bpy.types.Object.ceiling_texture_scale_offset = bpy.props.FloatVectorProperty(
-    name="Ceiling Texture Scale Offset", default=(1, 1, 0, 0),
-    min=0, step=10, precision=3, size=4
-)
-bpy.types.Object.wall_texture_scale_offset = bpy.props.FloatVectorProperty(
-    name="Wall Texture Scale Offset", default=(1, 1, 0, 0),
-    min=0, step=10, precision=3, size=4
-)
-bpy.types.Object.floor_texture_scale_offset = bpy.props.FloatVectorProperty(
-    name="Floor Texture Scale Offset", default=(1, 1, 0, 0),
-    min=0, step=10, precision=3, size=4
-)
-bpy.types.Object.ceiling_texture_rotation = bpy.props.FloatProperty(
-    name="Ceiling Texture Rotation", default=0, min=0, step=10, precision=3,
-)
-bpy.types.Object.wall_texture_rotation = bpy.props.FloatProperty(
-    name="Wall Texture Rotation", default=0, min=0, step=10, precision=3,
-)
-bpy.types.Object.floor_texture_rotation = bpy.props.FloatProperty(
-    name="Floor Texture Rotation", default=0, min=0, step=10, precision=3,
-)
-bpy.types.Object.ceiling_height = bpy.props.FloatProperty(
-    name="Ceiling Height", default=4, step=10, precision=3, update=_update_sector_solidify
-)
-bpy.types.Object.floor_height = bpy.props.FloatProperty(
-    name="Floor Height", default=0, step=10, precision=3, update=_update_sector_solidify
-)
-bpy.types.Object.floor_texture = bpy.props.StringProperty(name="Floor Texture")
-bpy.types.Object.wall_texture = bpy.props.StringProperty(name="Wall Texture")
-bpy.types.Object.ceiling_texture = bpy.props.StringProperty(name="Ceiling Texture")
-
-bpy.types.Object.brush_type = bpy.props.EnumProperty(
-    items=[("BRUSH", "Brush", "is a brush"),
-           ("SECTOR", "Sector", "is a sector"),
-           ("NONE", "None", "none")],
-    name="Brush Type", description="the brush type", default='NONE'
-)
+def _rna_value(value):
+    if isinstance(value, bpy.types.ID): return value.name
+    try: return tuple(value)
+    except TypeError: return value
 
-# UI labels swapped, behavior unchanged:
-# ADD (UNION) is shown as "Subtract", SUBTRACT (DIFFERENCE) is shown as "Add".
-bpy.types.Object.csg_operation = bpy.props.EnumProperty(
-    items=[
-        ("ADD", "Subtract", "Boolean UNION (label swapped)"),
-        ("SUBTRACT", "Add", "Boolean DIFFERENCE (label swapped)")
-    ],
-    name="CSG Op",
-    description="Boolean operation (labels swapped by request)",
-    default='ADD'
-)
+def _modifier_fingerprint(mod):
+    props = []
+    for p in mod.bl_rna.properties:
+        if p.identifier == "rna_type": continue
+        try: props.append((p.identifier, _rna_value(getattr(mod, p.identifier))))
+        except Exception: pass
+    return (mod.type, props)
 
-# mapping restored to original behavior
-csg_operation_to_blender_boolean = {"ADD": "UNION", "SUBTRACT": "DIFFERENCE"}
+def brush_fingerprint(ob):
+    """Content hash of mesh, attributes (UVs, colours, sharp_face...), transform, modifiers and CSG/UV/material props."""
+    h = hashlib.sha1()
+    me = ob.data
+    _hash_foreach(h, me.vertices, "co", 3, np.float32)
+    _hash_foreach(h, me.polygons, "loop_total", 1, np.int32)
+    _hash_foreach(h, me.polygons, "material_index", 1, np.int32)
+    _hash_foreach(h, me.loops, "vertex_index", 1, np.int32)
+    # every generic attribute the operand carries over; internal (".select_vert"...) ones are skipped
+    for attr in me.attributes:
+        if attr.name.startswith(".") or attr.name == "position" or attr.data_type not in _ATTR_LAYOUT: continue
+        key, size, dtype = _ATTR_LAYOUT[attr.data_type]
+        h.update(f"{attr.name}:{attr.domain}:{attr.data_type}".encode())
+        _hash_foreach(h, attr.data, key, size, dtype)
+    h.update(repr((
+        tuple(ob.location), tuple(ob.scale), tuple(ob.rotation_euler), ob.rotation_mode,
+        me.uv_layers.active.name if me.uv_layers.active else "", me.color_attributes.active_color_name,
+        [m.name if m else "" for m in me.materials],
+        [_modifier_fingerprint(m) for m in ob.modifiers],
+        [(name, _rna_value(getattr(ob, name))) for name in FINGERPRINT_PROPS],
+    )).encode())
+    return h.hexdigest()
 
-bpy.types.Object.csg_order = bpy.props.IntProperty(
-    name="CSG Order", default=0, description="Controls the order of CSG operation of the object"
-)
-bpy.types.Object.brush_auto_texture = bpy.props.BoolProperty(
-    name="Brush Auto Texture", default=True, description="Auto Texture on or off"
-)
-bpy.types.Object.brush_material = bpy.props.StringProperty(
-    name="Brush Material", description="Material used by Brush objects (copied into the built geometry)"
-)
+def scene_fingerprint(scn):
+    return repr((
+        scn.map_precision, scn.use_boolean_overlap, round(scn.boolean_overlap_epsilon, 8),
+        _get_attr_name(), scn.build_strategy, scn.build_solver, scn.build_flat_sectors,
+    ))
 
-# Color Attribute UI
-bpy.types.Scene.color_picker = bpy.props.FloatVectorProperty(
-    name="Active", subtype='COLOR', default=(1.0, 1.0, 1.0), min=0.0, max=1.0
-)
+def group_chain_hashes(scn, orders, brushes_by_order):
+    """Cumulative hash per csg_order group: group i's hash covers groups 0..i."""
+    chain = hashlib.sha1(scene_fingerprint(scn).encode()).hexdigest()
+    chains = []
+    for order in orders:
+        h = hashlib.sha1(chain.encode())
+        h.update(str(order).encode())
+        for brush in brushes_by_order[order]:
+            h.update(brush_fingerprint(brush).encode())
+        chain = h.hexdigest()
+        chains.append(chain)
+    return chains
+
+def _checkpoint_name(order):
+    return f"{CHECKPOINT_PREFIX}[{order}]"
+
+def find_resume_index(orders, chains):
+    """Index of the last order group with a valid checkpoint, or -1 for a full build.
+
+    Chains are cumulative, so a valid checkpoint also vouches for every group before it.
+    """
+    for i in range(len(orders) - 1, -1, -1):
+        me = bpy.data.meshes.get(_checkpoint_name(orders[i]))
+        if me is not None and me.get("lb_chain") == chains[i]:
+            return i
+    return -1
+
+def checkpoint_indices(count, limit):
+    """Order groups (indices) that keep a checkpoint: every k-th from the last one, at most limit."""
+    step = max(1, -(-count // max(1, limit)))
+    return set(range(count - 1, -1, -step))
+
+def store_checkpoint(level_map, order, chain):
+    name = _checkpoint_name(order)
+    old = bpy.data.meshes.get(name)
+    if old is not None: bpy.data.meshes.remove(old)
+    me = level_map.data.copy()
+    me.name = name
+    me.use_fake_user = True
+    me["lb_chain"] = chain
+    me["lb_order"] = order
+    return me
+
+def restore_checkpoint(level_map, order):
+    me = bpy.data.meshes[_checkpoint_name(order)].copy()
+    me.use_fake_user = False
+    for key in ("lb_chain", "lb_order"):
+        if key in me: del me[key]
+    old = level_map.data
+    name = old.name
+    level_map.data = me
+    bpy.data.meshes.remove(old)
+    me.name = name
+    return me
+
+def clear_checkpoints(keep_orders=()):
+    for me in list(bpy.data.meshes):
+        if not me.name.startswith(CHECKPOINT_PREFIX): continue
+        if me.get("lb_order") in keep_orders: continue
+        bpy.data.meshes.remove(me)
 
 # =========================
-# UI helpers
+# persistent build cache
 # =========================
+# Content-addressed, on disk: the key of order group i hashes the evaluated operands of
+# groups 0..i, the value is LevelGeometry's mesh after group i as raw numpy arrays.
+# File modification time doubles as LRU clock (touched on every hit).
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".lbmesh.npz"
+
+# foreach_get key and width per generic attribute type
+_ATTR_LAYOUT = {
+    'FLOAT': ("value", 1, np.float32), 'INT': ("value", 1, np.int32), 'INT8': ("value", 1, np.int8),
+    'BOOLEAN': ("value", 1, bool), 'FLOAT2': ("vector", 2, np.float32), 'FLOAT_VECTOR': ("vector", 3, np.float32),
+    'FLOAT_COLOR': ("color", 4, np.float32), 'BYTE_COLOR': ("color", 4, np.float32),
+}
+
+def cache_directory(scn):
+    """Absolute cache directory of scn, or None when disabled or relative to an unsaved file."""
+    if not scn.build_cache_enable or not scn.build_cache_dir: return None
+    if scn.build_cache_dir.startswith("//") and not bpy.data.filepath: return None
+    return os.path.normpath(bpy.path.abspath(scn.build_cache_dir))
+
+def _cache_path(directory, key):
+    return os.path.join(directory, key + CACHE_SUFFIX)
+
+def _domain_size(me, domain):
+    return len({'POINT': me.vertices, 'EDGE': me.edges, 'FACE': me.polygons, 'CORNER': me.loops}[domain])
+
+def _foreach_array(collection, attr, size, dtype):
+    arr = np.empty(len(collection) * size, dtype=dtype)
+    if len(arr): collection.foreach_get(attr, arr)
+    return arr
+
+def operand_fingerprint(bool_obj, brush):
+    """Hash of an evaluated operand: mesh arrays, UVs/colours, transform, materials and CSG op."""
+    h = hashlib.sha1()
+    me = bool_obj.data
+    _hash_foreach(h, me.vertices, "co", 3, np.float32)
+    _hash_foreach(h, me.polygons, "loop_total", 1, np.int32)
+    _hash_foreach(h, me.polygons, "material_index", 1, np.int32)
+    _hash_foreach(h, me.loops, "vertex_index", 1, np.int32)
+    for layer in me.uv_layers:
+        h.update(layer.name.encode())
+        _hash_foreach(h, layer.data, "uv", 2, np.float32)
+    for layer in me.color_attributes:
+        h.update(f"{layer.name}:{layer.domain}".encode())
+        _hash_foreach(h, layer.data, "color", 4, np.float32)
+    h.update(np.array(object_matrix(bool_obj), dtype=np.float32).tobytes())
+    h.update(repr((brush.csg_operation, [m.name if m else "" for m in me.materials])).encode())
+    return h.hexdigest()
+
+def cache_chain_keys(scn, orders, brushes_by_order):
+    """Cumulative content key per order group; only brushes with modifiers or shape keys are evaluated."""
+    seed = repr((CACHE_VERSION, bpy.app.version_string, scene_fingerprint(scn), scn.use_boolean_broadphase))
+    chain = hashlib.sha1(seed.encode()).hexdigest()
+    keys = []
+    try:
+        for order in orders:
+            h = hashlib.sha1(chain.encode())
+            h.update(str(order).encode())
+            for brush in brushes_by_order[order]:
+                if not operand_needs_evaluation(brush):
+                    h.update(brush_fingerprint(brush).encode())
+                    continue
+                operand = build_operand(brush)
+                h.update(operand_fingerprint(operand, brush).encode())
+                release_operands()
+            chain = h.hexdigest()
+            keys.append(chain)
+    finally:
+        free_build_scene()
+        free_operand_pool()
+    return keys
+
+def find_cached_index(directory, keys):
+    """Index of the last order group with a cache entry, or -1 (keys are cumulative)."""
+    for i in range(len(keys) - 1, -1, -1):
+        if os.path.isfile(_cache_path(directory, keys[i])):
+            return i
+    return -1
+
+def write_mesh_arrays(me, path):
+    """Write me as raw arrays (.npz); attributes are stored generically (UVs, colours, material_index...)."""
+    arrays = {
+        "co": _foreach_array(me.vertices, "co", 3, np.float32),
+        "edges": _foreach_array(me.edges, "vertices", 2, np.int32),
+        "corner_vert": _foreach_array(me.loops, "vertex_index", 1, np.int32),
+        "corner_edge": _foreach_array(me.loops, "edge_index", 1, np.int32),
+        "loop_start": _foreach_array(me.polygons, "loop_start", 1, np.int32),
+        "materials": np.array([m.name if m else "" for m in me.materials], dtype=str),
+    }
+    names, types, domains = [], [], []
+    for attr in me.attributes:
+        if attr.name.startswith(".") or attr.name == "position" or attr.data_type not in _ATTR_LAYOUT: continue
+        key_name, size, dtype = _ATTR_LAYOUT[attr.data_type]
+        arrays[f"attr{len(names)}"] = _foreach_array(attr.data, key_name, size, dtype)
+        names.append(attr.name); types.append(attr.data_type); domains.append(attr.domain)
+    arrays["attr_names"] = np.array(names, dtype=str)
+    arrays["attr_types"] = np.array(types, dtype=str)
+    arrays["attr_domains"] = np.array(domains, dtype=str)
+    active_uv = me.uv_layers.active
+    active_color = me.color_attributes.active_color
+    render_color = me.color_attributes[me.color_attributes.render_color_index] \
+        if me.color_attributes.render_color_index >= 0 else None
+    arrays["active"] = np.array([layer.name if layer else "" for layer in (active_uv, active_color, render_color)], dtype=str)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)  # atomic, so a shared (CI) cache never serves half-written files
+    return path
+
+def read_mesh_arrays(path, name="LevelGeometryMesh"):
+    """New mesh from a file written by write_mesh_arrays; materials are looked up by name."""
+    with np.load(path) as data:
+        me = bpy.data.meshes.new(name)
+        me.vertices.add(len(data["co"]) // 3)
+        me.edges.add(len(data["edges"]) // 2)
+        me.loops.add(len(data["corner_vert"]))
+        me.polygons.add(len(data["loop_start"]))
+        me.vertices.foreach_set("co", data["co"])
+        me.edges.foreach_set("vertices", data["edges"])
+        me.loops.foreach_set("vertex_index", data["corner_vert"])
+        me.loops.foreach_set("edge_index", data["corner_edge"])
+        me.polygons.foreach_set("loop_start", data["loop_start"])
+        for name in data["materials"]:
+            me.materials.append(bpy.data.materials.get(str(name)) if name else None)
+        for i, (name, data_type, domain) in enumerate(zip(data["attr_names"], data["attr_types"], data["attr_domains"])):
+            name, data_type, domain = str(name), str(data_type), str(domain)
+            attr = me.attributes.get(name) or me.attributes.new(name, data_type, domain)
+            attr.data.foreach_set(_ATTR_LAYOUT[data_type][0], data[f"attr{i}"])
+        active_uv, active_color, render_color = (str(n) for n in data["active"])
+    me.update()
+    if active_uv and active_uv in me.uv_layers: me.uv_layers.active = me.uv_layers[active_uv]
+    if active_color in me.color_attributes: me.color_attributes.active_color_name = active_color
+    if render_color in me.color_attributes:
+        me.color_attributes.render_color_index = list(me.color_attributes).index(me.color_attributes[render_color])
+    return me
 
-def draw_uv_box(parent, obj, prop_name, label, rot_prop_name, rot_label="Rotation"):
-    box = parent.box(); col = box.column(align=True)
-    col.label(text=label)
-    row = col.row(align=True); row.label(text="Scale")
-    sub = row.row(align=True); sub.prop(obj, prop_name, index=0, text="U"); sub.prop(obj, prop_name, index=1, text="V")
-    row2 = col.row(align=True); row2.label(text="Shift")
-    sub2 = row2.row(align=True); sub2.prop(obj, prop_name, index=2, text="U"); sub2.prop(obj, prop_name, index=3, text="V")
-    row3 = col.row(align=True); row3.label(text=rot_label); row3.prop(obj, rot_prop_name, text="°")
+def store_cached_mesh(directory, key, me):
+    os.makedirs(directory, exist_ok=True)
+    return write_mesh_arrays(me, _cache_path(directory, key))
+
+def load_cached_mesh(level_map, directory, key):
+    """Replace level_map's mesh by the cached one; returns the new mesh."""
+    path = _cache_path(directory, key)
+    me = read_mesh_arrays(path)
+    os.utime(path)  # LRU: mark as recently used
+    old = level_map.data
+    name = old.name
+    level_map.data = me
+    bpy.data.meshes.remove(old)
+    me.name = name
+    return me
+
+def evict_cache(directory, max_bytes):
+    """Delete least recently used entries until the cache fits max_bytes; returns the count removed."""
+    try: entries = [e for e in os.scandir(directory) if e.name.endswith(CACHE_SUFFIX)]
+    except FileNotFoundError: return 0
+    entries = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries), reverse=True)
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    while entries and total > max_bytes:
+        _, size, path = entries.pop()
+        try: os.remove(path)
+        except OSError: continue
+        total -= size; removed += 1
+    return removed
 
 # =========================
-# UI Panels
+# parallel region builds
 # =========================
+# The map is cut into slabs along its longer horizontal axis and every slab is built by
+# its own background Blender from the brushes touching it, then clipped to the slab.
+# Clipping distributes over the CSG operations ((A - B) & C == (A & C) - (B & C)), so the
+# joined slabs equal the serial build once the caps on the cut planes are removed and
+# the seams welded.
 
-class LevelBuddyPanel(bpy.types.Panel):
-    bl_label = "Level Buddy"
-    bl_space_type = "VIEW_3D"
-    bl_region_type = 'UI'
-    bl_category = 'Level Buddy'
-    def draw(self, context):
-        ob = context.active_object
-        scn = bpy.context.scene
-        layout = self.layout
-        mode = context.mode
-
-        col = layout.column(align=True)
-        col.label(icon="WORLD", text="Map Settings")
-        col.prop(scn, "map_precision")
-        row = col.row(align=True)
-        row.prop(scn, "map_use_auto_smooth", text="Auto Smooth")
-        row.prop(scn, "map_auto_smooth_angle", text="Angle")
-        col.prop_search(scn, "remove_material", bpy.data, "materials"); col.separator()
-        col.prop(scn, "color_attribute_name")
-
-        box = layout.box()
-        box.label(text="Boolean Stability")
-        rowb = box.row(align=True)
-        rowb.prop(scn, "use_boolean_overlap", text="Use Boolean Overlap")
-        rowb.prop(scn, "boolean_overlap_epsilon", text="Epsilon")
-
-        box2 = layout.box()
-        box2.label(text="Post-Build Snap")
-        rowp = box2.row(align=True)
-        rowp.prop(scn, "post_build_snap_enable", text="Enable")
-        rowp.prop(scn, "post_build_snap_step", text="Step")
-
-        col = layout.column(align=True)
-        col.operator("scene.level_buddy_build_map", text="Build Map", icon="MOD_BUILD").bool_op = "UNION"
-
-        if mode == 'OBJECT':
-            col = layout.column(align=True)
-            col.label(icon="SNAP_PEEL_OBJECT", text="Tools")
-            row = col.row(align=True)
-            op1 = row.operator("scene.level_buddy_new_geometry", text="New Sector", icon="MESH_PLANE"); op1.brush_type = 'SECTOR'
-            op2 = row.operator("scene.level_buddy_new_geometry", text="New Brush", icon="CUBE"); op2.brush_type = 'BRUSH'
+REGION_SEAM_TOLERANCE = 1e-4
 
-        if ob is not None and len(bpy.context.selected_objects) > 0:
-            col = layout.column(align=True)
-            col.label(icon="MOD_ARRAY", text="Brush Properties")
-            typ = getattr(ob, "brush_type", "NONE")
-            col.label(text=f"Type: {typ.title() if isinstance(typ, str) else str(typ)}")
-            col.prop(ob, "csg_operation", text="CSG Op")
-            col.prop(ob, "csg_order", text="CSG Order")
-            col.prop(ob, "brush_auto_texture", text="Auto Texture")
-
-            if ob.brush_auto_texture:
-                draw_uv_box(col, ob, "ceiling_texture_scale_offset", "Ceiling UV", "ceiling_texture_rotation")
-                draw_uv_box(col, ob, "wall_texture_scale_offset", "Wall UV", "wall_texture_rotation")
-                draw_uv_box(col, ob, "floor_texture_scale_offset", "Floor UV", "floor_texture_rotation")
-
-            if getattr(ob, "brush_type", 'NONE') == 'SECTOR':
-                sec = layout.column(align=True)
-                sec.label(icon="MOD_SOLIDIFY", text="Sector Properties")
-                sec.prop(ob, "ceiling_height"); sec.prop(ob, "floor_height")
-                mat = layout.column(align=True)
-                mat.label(icon="MATERIAL", text="Sector Materials")
-                mat.prop_search(ob, "ceiling_texture", bpy.data, "materials", icon="MATERIAL", text="Ceiling")
-                mat.prop_search(ob, "wall_texture", bpy.data, "materials", icon="MATERIAL", text="Wall")
-                mat.prop_search(ob, "floor_texture", bpy.data, "materials", icon="MATERIAL", text="Floor")
-
-            if getattr(ob, "brush_type", 'NONE') == 'BRUSH':
-                br = layout.column(align=True)
-                br.label(icon="MATERIAL", text="Brush Material")
-                br.prop_search(ob, "brush_material", bpy.data, "materials", icon="MATERIAL", text="Material")
-
-class VertexColorPanel(bpy.types.Panel):
-    bl_idname = "OBJECT_PT_vertex_color_panel"
-    bl_label = "Color Attribute"
-    bl_space_type = "VIEW_3D"
-    bl_region_type = "UI"
-    bl_category = "Level Buddy"
-    def draw(self, context):
-        layout = self.layout
-        scn = bpy.context.scene
-        row = layout.row(align=True)
-        row.prop(scn, "color_picker", text="")
-        row.operator("object.set_vertex_color", text="Set Color")
+def partition_regions(boxes, count):
+    """Axis and cut positions splitting the (min, max) boxes into up to count slabs of similar brush count.
+
+    Cuts lie halfway between brush faces, so no axis-aligned face of the map ends up on a seam.
+    """
+    mins = np.array([b[0] for b in boxes]); maxs = np.array([b[1] for b in boxes])
+    extent = maxs.max(axis=0) - mins.min(axis=0)
+    axis = 0 if extent[0] >= extent[1] else 1
+    planes = np.unique(np.concatenate([mins[:, axis], maxs[:, axis]]))
+    candidates = ((planes[1:] + planes[:-1]) * 0.5)[planes[1:] - planes[:-1] > 4 * REGION_SEAM_TOLERANCE]
+    if count < 2 or not len(candidates): return axis, []
+    centers = (mins[:, axis] + maxs[:, axis]) * 0.5
+    targets = np.quantile(centers, np.arange(1, count) / count)
+    cuts = np.unique(candidates[np.abs(candidates[:, None] - targets[None, :]).argmin(axis=0)])
+    return axis, cuts.tolist()
+
+def _split_open_seam_edges(verts, tolerance):
+    """Split open seam edges where the other side has a vertex (a T-junction) so both sides can be welded."""
+    verts = set(verts)
+    edges = {e for v in verts for e in v.link_edges if e.is_boundary and e.other_vert(v) in verts}
+    new_verts = []
+    for v in verts:
+        for e in list(edges):
+            a, b = e.verts
+            if v is a or v is b: continue
+            p, fac = intersect_point_line(v.co, a.co, b.co)
+            if 0.0 < fac < 1.0 and (p - v.co).length <= tolerance:
+                new_edge, new_vert = bmesh.utils.edge_split(e, a, fac)
+                edges.add(new_edge); new_verts.append(new_vert)
+                break
+    return new_verts
+
+def weld_region_seams(me, axis, cuts, tolerance=REGION_SEAM_TOLERANCE):
+    """Delete the cap faces regions got on the cut planes, weld the seams and dissolve the cut edges."""
+    if not cuts or not len(me.vertices): return
+    co = read_vertex_coords(me)
+    on_seam = np.abs(co[:, axis, None] - np.array(cuts)[None, :]).min(axis=1) <= tolerance
+    bm = bmesh.new()
+    bm.from_mesh(me)
+    try:
+        bm.verts.ensure_lookup_table()
+        bm.normal_update()
+        seam = [bm.verts[i] for i in np.flatnonzero(on_seam)]
+        faces = {f for v in seam for f in v.link_faces}
+        caps = [f for f in faces if abs(f.normal[axis]) > 0.999 and all(on_seam[v.index] for v in f.verts)]
+        bmesh.ops.delete(bm, geom=caps, context='FACES')
+        seam = [v for v in seam if v.is_valid]
+        bmesh.ops.remove_doubles(bm, verts=seam, dist=tolerance)
+        seam = [v for v in seam if v.is_valid]
+        # the solver may have put a vertex on one side of a seam only
+        split = _split_open_seam_edges([v for v in seam if any(e.is_boundary for e in v.link_edges)], tolerance)
+        if split:
+            bmesh.ops.remove_doubles(bm, verts=seam + split, dist=tolerance)
+        seam = {v for v in seam + split if v.is_valid}
+        # cut edges: on the seam, between two coplanar faces of one material
+        edges = {e for v in seam for e in v.link_edges if e.other_vert(v) in seam and len(e.link_faces) == 2
+                 and e.link_faces[0].material_index == e.link_faces[1].material_index
+                 and e.calc_face_angle(math.pi) < 1e-4}
+        bmesh.ops.dissolve_edges(bm, edges=list(edges), use_verts=True)
+    finally:
+        bm.to_mesh(me)
+        bm.free()
+
+def _region_worker_command(blender, job):
+    return [blender, "-b", "--factory-startup", "--python-exit-code", "1",
+            "--python", os.path.abspath(__file__), "--", "--region-job", job]
+
+def build_in_regions(level_map, brushes, count, blender, csg_stats, reporter=None, profile=None):
+    """Build brushes (in CSG order) as up to count regions in background Blender processes, at
+    most one per CPU at a time, and stitch the slabs into level_map. Returns False, leaving
+    level_map untouched, if a worker failed."""
+    scn = bpy.context.scene
+    t = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix="levelbuddy_regions_")
+    try:
+        operands, materials = [], set()
+        try:
+            for k, brush in enumerate(brushes):
+                bool_obj = build_operand(brush, profile)
+                box = world_aabb(bool_obj)
+                if box is not None:
+                    path = write_mesh_arrays(bool_obj.data, os.path.join(workdir, f"operand{k}.npz"))
+                    materials.update(m.name for m in bool_obj.data.materials if m)
+                    operands.append({"file": path, "name": brush.name, "box": box,
+                                     "matrix": [list(row) for row in object_matrix(bool_obj)],
+                                     "operation": csg_operation_to_blender_boolean[brush.csg_operation]})
+                release_operands()
+        finally:
+            free_build_scene()
+            free_operand_pool()
+        if not operands: return True
+
+        axis, cuts = partition_regions([o["box"] for o in operands], count)
+        lo = np.min([o["box"][0] for o in operands], axis=0) - 1.0
+        hi = np.max([o["box"][1] for o in operands], axis=0) + 1.0
+        edges = [lo[axis]] + cuts + [hi[axis]]
+        settings = {"map_precision": scn.map_precision, "use_boolean_broadphase": scn.use_boolean_broadphase,
+                    "color_attribute_name": _get_attr_name()}
+        jobs = []
+        for k in range(len(edges) - 1):
+            rmin, rmax = lo.copy(), hi.copy()
+            rmin[axis], rmax[axis] = edges[k], edges[k + 1]
+            job = os.path.join(workdir, f"region{k}.json")
+            with open(job, "w") as f:
+                json.dump({
+                    "settings": settings, "materials": sorted(materials), "clip": len(edges) > 2,
+                    "bounds": [rmin.tolist(), rmax.tolist()], "output": os.path.join(workdir, f"region{k}.npz"),
+                    "operands": [{key: o[key] for key in ("file", "name", "matrix", "operation")}
+                                 for o in operands if aabbs_overlap(o["box"], (rmin, rmax), REGION_SEAM_TOLERANCE)],
+                }, f)
+            jobs.append(job)
+        t = profile_span(profile, "serialise operands", "regions", t, regions=len(jobs), axis="XY"[axis])
+
+        def run(job):
+            with open(job + ".log", "w") as log:
+                try:
+                    return subprocess.run(_region_worker_command(blender, job), stdout=log, stderr=subprocess.STDOUT,
+                                          stdin=subprocess.DEVNULL).returncode
+                except OSError as e:
+                    log.write(f"Level Buddy: could not start Blender: {e}\n")
+                    return -2
+        # every worker is a whole Blender: the region count only sets the split, not the processes
+        with ThreadPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+            codes = list(pool.map(run, jobs))
+        t = profile_span(profile, "region workers", "regions", t, regions=len(jobs))
+        for job, code in zip(jobs, codes):
+            if code != 0:
+                with open(job + ".log") as log:
+                    _report(reporter, 'WARNING', f"Region worker failed ({code}): {log.read()[-500:]}")
+                return False
+
+        for job in jobs:
+            output = job[:-len(".json")] + ".npz"
+            with open(output + ".json") as f:
+                for key, value in json.load(f).items(): csg_stats[key] += value
+            region = bpy.data.objects.new("_LB_Region", read_mesh_arrays(output, "_LB_Region"))
+            me = region.data
+            join_mesh_into(level_map, region)
+            bpy.data.objects.remove(region)
+            bpy.data.meshes.remove(me)
+        weld_region_seams(level_map.data, axis, cuts)
+        profile_span(profile, "stitch regions", "regions", t, obj=level_map)
+        _report(reporter, 'INFO', f"Parallel build: {len(jobs)} regions along {'XY'[axis]}")
+        return True
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def build_region_job(job_path):
+    """Worker side of build_in_regions: apply the job's operands in order, clip to the region, write the result."""
+    with open(job_path) as f:
+        job = json.load(f)
+    scn = bpy.context.scene
+    for key, value in job["settings"].items():
+        setattr(scn, key, value)
+    for name in job["materials"]:
+        if bpy.data.materials.get(name) is None: bpy.data.materials.new(name)
+    level_map = create_new_boolean_object(scn, "LevelGeometry")
+    ensure_color_layer(level_map.data)
+    stats = {'BOOLEAN': 0, 'SKIPPED': 0, 'JOINED': 0, 'FAILED': 0}
+    try:
+        for op in job["operands"]:
+            bool_obj = bpy.data.objects.new(op["name"], read_mesh_arrays(op["file"], "_booley"))
+            bool_obj.matrix_basis = Matrix(op["matrix"])
+            stats[apply_csg(level_map, bool_obj, bool_obj, operation=op["operation"])] += 1
+        if job["clip"]:
+            lo, hi = (Vector(b) for b in job["bounds"])
+            clip = bpy.data.objects.new("_LB_RegionClip", bpy.data.meshes.new("_LB_RegionClip"))
+            bm = bmesh.new()
+            try:
+                bmesh.ops.create_cube(bm, size=1.0)
+                bm.to_mesh(clip.data)
+            finally:
+                bm.free()
+            clip.location = (lo + hi) * 0.5
+            clip.scale = hi - lo
+            stats[apply_csg(level_map, clip, clip, operation='INTERSECT')] += 1
+    finally:
+        free_build_scene()
+    write_mesh_arrays(level_map.data, job["output"])
+    with open(job["output"] + ".json", "w") as f:
+        json.dump(stats, f)
+    return stats
 
 # =========================
-# SNAP TO GRID (world-space) — Edit mode tools
+# flat sector build
 # =========================
+# Sectors are vertical prisms, so a map of sectors is 2.5D: it is decided per cell of the
+# planar arrangement of all footprints. In CSG order the last prism covering a point owns
+# it (added: solid, subtracted: empty). A face between a solid and an empty part belongs
+# to the later of the two owners, which is the operand surface the boolean solver would
+# keep, and takes that sector's material and auto-texture UVs.
 
-vertex_positions = {}
-
-def _sgs_validate_context(context):
-    if not context.active_object: return False, "No active object"
-    if context.active_object.type != 'MESH': return False, "Active object is not a mesh"
-    if context.mode != 'EDIT_MESH': return False, "Not in Edit Mode"
-    return True, ""
-
-def _snap_vec_world(wco, gx, gy, gz):
-    if gx > 0: wco.x = round(wco.x / gx) * gx
-    if gy > 0: wco.y = round(wco.y / gy) * gy
-    if gz > 0: wco.z = round(wco.z / gz) * gz
-    return wco
-
-def _sgs_snap_to_grid(obj, selected_verts, gx, gy, gz):
-    if not selected_verts: return 0
-    mw = obj.matrix_world; imw = mw.inverted_safe()
-    snapped = 0
-    for v in selected_verts:
-        old_local = v.co.copy()
-        wco = mw @ old_local
-        wco = _snap_vec_world(wco, gx, gy, gz)
-        new_local = imw @ wco
-        if (new_local - old_local).length > 1e-6:
-            v.co = new_local; snapped += 1
-    return snapped
-
-def continuous_snap_handler(scene):
-    global vertex_positions
-    if bpy.context.mode != 'EDIT_MESH' or not scene.continuous_snap:
-        return
-    obj = bpy.context.active_object
-    if not obj or obj.type != 'MESH': return
-    mesh = obj.data
-    bm = bmesh.from_edit_mesh(mesh)
-    selected_verts = [v for v in bm.verts if v.select]
-    if not selected_verts:
-        vertex_positions.clear(); return
-    moved = False
-    for v in selected_verts:
-        key = (obj.name, v.index)
-        cur = v.co.copy()
-        if key in vertex_positions and (cur - vertex_positions[key]).length > 0.0001:
-            moved = True
-        vertex_positions[key] = cur
-    if moved:
-        _sgs_snap_to_grid(obj, selected_verts, scene.grid_size_x, scene.grid_size_y, scene.grid_size_z)
-        bmesh.update_edit_mesh(mesh)
-
-class ERF_SnapToGridPanel(bpy.types.Panel):
-    bl_label = "Snap to Grid"
-    bl_idname = "VIEW3D_PT_erf_snap_to_grid"
-    bl_space_type = 'VIEW_3D'
-    bl_region_type = 'UI'
-    bl_category = 'Level Buddy'
-    bl_context = 'mesh_edit'
-    def draw(self, context):
-        layout = self.layout; scene = context.scene
-        box = layout.box(); box.label(text="Grid Settings:")
-        box.prop(scene, "grid_size_x", text="Grid Size X")
-        box.prop(scene, "grid_size_y", text="Grid Size Y")
-        box.prop(scene, "grid_size_z", text="Grid Size Z")
-        row = box.row(align=True); row.operator("mesh.reset_grid_sizes", text="Reset to Default")
-        layout.separator(); layout.operator("mesh.snap_to_grid", text="Snap Selected to Grid")
-        layout.separator(); box = layout.box(); box.label(text="Continuous Snapping:")
-        row = box.row(align=True); row.operator("mesh.toggle_continuous_snap", text="Toggle Continuous Snap")
-        icon = 'CHECKBOX_HLT' if scene.continuous_snap else 'CHECKBOX_DEHLT'
-        status_text = "ON" if scene.continuous_snap else "OFF"
-        row.label(text=f"Status: {status_text}", icon=icon)
-        if scene.continuous_snap: box.label(text="⚠ World-space snapping active", icon='INFO')
-
-class ERF_SnapToGridOperator(bpy.types.Operator):
-    bl_idname = "mesh.snap_to_grid"
-    bl_label = "Snap to Grid"
-    bl_options = {'REGISTER', 'UNDO'}
-    @classmethod
-    def poll(cls, context): ok, _ = _sgs_validate_context(context); return ok
-    def execute(self, context):
-        try:
-            ok, msg = _sgs_validate_context(context)
-            if not ok: self.report({'ERROR'}, msg); return {'CANCELLED'}
-            obj = context.active_object; bm = bmesh.from_edit_mesh(obj.data)
-            sel = [v for v in bm.verts if v.select]
-            if not sel:
-                self.report({'INFO'}, "No vertices selected. Please select vertices in Edit Mode.")
-                return {'CANCELLED'}
-            snapped_count = _sgs_snap_to_grid(
-                obj, sel, context.scene.grid_size_x, context.scene.grid_size_y, context.scene.grid_size_z
-            )
-            bmesh.update_edit_mesh(obj.data)
-            self.report({'INFO'}, f"Snapped {snapped_count}/{len(sel)} vertices to world grid." if snapped_count>0 else "No vertices needed snapping (already on grid).")
-            return {'FINISHED'}
-        except Exception as e:
-            self.report({'ERROR'}, f"Error during grid snapping: {str(e)}"); return {'CANCELLED'}
-
-class ERF_ToggleContinuousSnapOperator(bpy.types.Operator):
-    bl_idname = "mesh.toggle_continuous_snap"
-    bl_label = "Toggle Continuous Snap"
-    bl_options = {'REGISTER', 'UNDO'}
-    @classmethod
-    def poll(cls, context): ok, _ = _sgs_validate_context(context); return ok
-    def execute(self, context):
-        try:
-            context.scene.continuous_snap = not context.scene.continuous_snap
-            if context.scene.continuous_snap:
-                if continuous_snap_handler not in bpy.app.handlers.depsgraph_update_post:
-                    bpy.app.handlers.depsgraph_update_post.append(continuous_snap_handler)
-                self.report({'INFO'}, "Continuous snapping ON (world-space).")
-            else:
-                if continuous_snap_handler in bpy.app.handlers.depsgraph_update_post:
-                    bpy.app.handlers.depsgraph_update_post.remove(continuous_snap_handler)
-                self.report({'INFO'}, "Continuous snapping OFF.")
-            return {'FINISHED'}
-        except Exception as e:
-            self.report({'ERROR'}, f"Error toggling continuous snap: {str(e)}"); return {'CANCELLED'}
-
-class ERF_ResetGridSizesOperator(bpy.types.Operator):
-    bl_idname = "mesh.reset_grid_sizes"
-    bl_label = "Reset Grid Sizes"
-    bl_description = "Reset all grid sizes to default values"
-    bl_options = {'REGISTER', 'UNDO'}
-    def execute(self, context):
-        context.scene.grid_size_x = 1.0; context.scene.grid_size_y = 1.0; context.scene.grid_size_z = 1.0
-        self.report({'INFO'}, "Grid sizes reset to default (1.0)"); return {'FINISHED'}
+def flat_sector(ob, eps, precision):
+    """Prism of a sector as its boolean operand would be, or None if it needs the boolean path."""
+    if getattr(ob, "brush_type", 'NONE') != 'SECTOR' or not ob.brush_auto_texture: return None
+    if operand_needs_evaluation(ob): return None
+    me = ob.data
+    if not len(me.polygons): return None
+    # the operand gets the sector's loc/rot/scale (copy_transforms); its walls must stay vertical
+    m = np.array(Matrix.LocRotScale(ob.location, ob.rotation_euler, ob.scale), dtype=np.float64)
+    if np.abs(m[2, :2]).max() > 1e-9 or np.abs(m[:2, 2]).max() > 1e-9 or m[2, 2] <= 0.0: return None
+    co = read_vertex_coords(me).astype(np.float64)
+    if np.ptp(co[:, 2]) > 1e-6: return None
+    # colours are carried per face, so only uniformly coloured sectors (or presets) qualify
+    color = (1.0, 1.0, 1.0, 1.0)
+    layer = me.color_attributes.get(_get_attr_name()) or me.color_attributes.get("Col") or me.color_attributes.get("Color")
+    if ob.color_mode == 'LAYER' and layer is not None and len(layer.data):
+        colors = _foreach_array(layer.data, "color", 4, np.float32).reshape(-1, 4)
+        if np.ptp(colors, axis=0).max() > 1e-3: return None
+        color = tuple(float(c) for c in colors[0])
+
+    # same numbers as sector_prism_mesh + overlap scaling + cleanup_vertex_precision
+    up = -1.0 if _foreach_array(me.polygons, "normal", 3, np.float32)[2::3].sum() < 0.0 else 1.0
+    scale = 1.0 + eps
+    ceiling = round((co[0, 2] + up * ob.ceiling_height) * scale, precision) * m[2, 2] + m[2, 3]
+    floor = round((co[0, 2] + up * ob.floor_height) * scale, precision) * m[2, 2] + m[2, 3]
+    if ceiling == floor: return None
+    local = np.round(co * scale, precision)
+    local[:, 2] = 0.0
+    corner_vert = _foreach_array(me.loops, "vertex_index", 1, np.int32).tolist()
+    starts = _foreach_array(me.polygons, "loop_start", 1, np.int32).tolist()
+    totals = _foreach_array(me.polygons, "loop_total", 1, np.int32).tolist()
+    mats = [me.materials[i] if i < len(me.materials) else None for i in range(3)]
+    return {
+        "ob": ob, "add": ob.csg_operation == 'ADD', "matrix": m,
+        "xy": (local @ m[:3, :3].T + m[:3, 3])[:, :2],
+        "faces": [corner_vert[a:a + n] for a, n in zip(starts, totals)],
+        "lo": min(ceiling, floor), "hi": max(ceiling, floor),
+        # slot 0 is the ceiling, 1 the floor, 2 the walls (see update_sector_materials)
+        "top": mats[0] if ceiling > floor else mats[1], "bottom": mats[1] if ceiling > floor else mats[0],
+        "wall": mats[2], "materials": [m for m in me.materials if m], "color": color,
+    }
+
+def flat_sector_groups(scn, orders, brushes_by_order):
+    """Prisms of the leading order groups that consist of flat sectors only."""
+    eps = scn.boolean_overlap_epsilon if scn.use_boolean_overlap else 0.0
+    groups = []
+    for order in orders:
+        prisms = [flat_sector(b, eps, scn.map_precision) for b in brushes_by_order[order]]
+        if not prisms or any(p is None for p in prisms): break
+        groups.append(prisms)
+    return groups
+
+def _owner_profile(cover, sectors):
+    """Breakpoints and owner per z interval (-1: nobody) of a cell covered by the sectors in cover."""
+    zs = sorted({sectors[s]["lo"] for s in cover} | {sectors[s]["hi"] for s in cover})
+    owners = []
+    for z0, z1 in zip(zs, zs[1:]):
+        mid, owner = (z0 + z1) * 0.5, -1
+        for s in cover:
+            if sectors[s]["lo"] <= mid <= sectors[s]["hi"]: owner = s
+        owners.append(owner)
+    return zs, owners
+
+def _owner_at(profile, z):
+    zs, owners = profile
+    k = bisect.bisect_right(zs, z) - 1
+    return owners[k] if 0 <= k < len(owners) else -1
+
+def build_flat_sectors(level_map, sectors, precision):
+    """Replace level_map's mesh by the CSG of the sector prisms (in order) without booleans; returns the cell count."""
+    solid = lambda owner: owner >= 0 and sectors[owner]["add"]
+    points, faces, face_sector = [], [], []
+    for s, sec in enumerate(sectors):
+        offset = len(points)
+        points.extend(Vector(p) for p in sec["xy"])
+        faces.extend([i + offset for i in f] for f in sec["faces"])
+        face_sector.extend([s] * len(sec["faces"]))
+    out_co, _, tris, _, _, tri_orig = delaunay_2d_cdt(points, [], faces, 0, 10.0 ** -(precision + 1), True)
+    xy = np.array([tuple(p) for p in out_co], dtype=np.float64)
+    tris = [tuple(t) for t in tris]
+    covers = [tuple(sorted({face_sector[f] for f in orig})) for orig in tri_orig]
+    profiles = {cover: _owner_profile(cover, sectors) for cover in set(covers)}
+    profiles[()] = ([], [])
+
+    # cells as counter-clockwise triangles, half-edge -> cell
+    half = {}
+    for t, (a, b, c) in enumerate(tris):
+        if (xy[b, 0] - xy[a, 0]) * (xy[c, 1] - xy[a, 1]) - (xy[b, 1] - xy[a, 1]) * (xy[c, 0] - xy[a, 0]) < 0.0:
+            tris[t] = a, b, c = a, c, b
+        half[a, b] = half[b, c] = half[c, a] = t
+
+    heights = {}  # arrangement vertex -> z values of face corners on its vertical line
+    caps, walls = [], []
+    for t, cover in enumerate(covers):
+        zs, owners = profiles[cover]
+        for k, z in enumerate(zs):
+            below = owners[k - 1] if k > 0 else -1
+            above = owners[k] if k < len(owners) else -1
+            if solid(below) != solid(above):
+                owner = max(below, above)
+                caps.append((t, z, owner, solid(below)))
+                for v in tris[t]: heights.setdefault(v, set()).add(z)
+    for (a, b), t in half.items():
+        r = half.get((b, a))
+        if r is not None and a > b: continue
+        left, right = profiles[covers[t]], profiles[covers[r] if r is not None else ()]
+        if left is right: continue
+        zs = sorted(set(left[0]) | set(right[0]))
+        run = None
+        for z0, z1 in zip(zs, zs[1:]):
+            mid = (z0 + z1) * 0.5
+            o1, o2 = _owner_at(left, mid), _owner_at(right, mid)
+            piece = (max(o1, o2), solid(o1)) if solid(o1) != solid(o2) else None
+            if run is not None and piece == run[0]:
+                run[2] = z1; continue
+            if run is not None: walls.append((*run[0], run[1], run[2], a, b))
+            run = [piece, z0, z1] if piece is not None else None
+        if run is not None: walls.append((*run[0], run[1], run[2], a, b))
+    for (owner, left_solid, z0, z1, a, b) in walls:
+        heights.setdefault(a, set()).update((z0, z1)); heights.setdefault(b, set()).update((z0, z1))
+    heights = {v: sorted(zs) for v, zs in heights.items()}
+
+    index = {}
+    def vert(v, z):
+        key = (v, z)
+        if key not in index: index[key] = len(index)
+        return index[key]
+    def between(v, z0, z1):
+        zs = heights[v]
+        return zs[bisect.bisect_right(zs, z0):bisect.bisect_left(zs, z1)]
+
+    polys, owner_of, face_class, face_mat = [], [], [], []
+    for t, z, owner, up in caps:
+        a, b, c = tris[t]
+        polys.append([vert(a, z), vert(b, z), vert(c, z)] if up else [vert(a, z), vert(c, z), vert(b, z)])
+        top = z == sectors[owner]["hi"]
+        owner_of.append(owner); face_class.append(1 if top else 2)
+        face_mat.append(sectors[owner]["top" if top else "bottom"])
+    for (owner, left_solid, z0, z1, a, b) in walls:
+        if not left_solid: a, b = b, a  # walk the solid cell counter-clockwise: normal points out
+        polys.append([vert(a, z0), vert(b, z0)] + [vert(b, z) for z in between(b, z0, z1)]
+                     + [vert(b, z1), vert(a, z1)] + [vert(a, z) for z in reversed(between(a, z0, z1))])
+        owner_of.append(owner); face_class.append(0); face_mat.append(sectors[owner]["wall"])
+
+    co = np.empty((len(index), 3), dtype=np.float64)
+    for (v, z), i in index.items():
+        co[i, :2] = xy[v]; co[i, 2] = z
+    totals = np.array([len(p) for p in polys], dtype=np.int32)
+    corner_vert = np.array([i for p in polys for i in p], dtype=np.int32)
+
+    me = bpy.data.meshes.new("LevelGeometryMesh")
+    materials = []
+    for sec in sectors:
+        materials.extend(m for m in sec["materials"] if m not in materials)
+    for m in materials:
+        me.materials.append(m)
+    me.vertices.add(len(co))
+    me.vertices.foreach_set("co", co.astype(np.float32).ravel())
+    me.loops.add(len(corner_vert))
+    me.loops.foreach_set("vertex_index", corner_vert)
+    me.polygons.add(len(polys))
+    me.polygons.foreach_set("loop_start", np.concatenate([[0], np.cumsum(totals)[:-1]]).astype(np.int32))
+    me.polygons.foreach_set("material_index", np.array([materials.index(m) if m in materials else 0 for m in face_mat], dtype=np.int32))
+    me.polygons.foreach_set("use_smooth", np.zeros(len(polys), dtype=bool))
+    me.update(calc_edges=True)
+
+    # auto texture in each owner's operand space, colour (or colour preset) per owner
+    owner_of = np.array(owner_of, dtype=np.int32)
+    face_class = np.array(face_class, dtype=np.int32)
+    loop_owner = np.repeat(owner_of, totals)
+    loop_class = np.repeat(face_class, totals)
+    loop_co = co[corner_vert]
+    first = np.concatenate([[0], np.cumsum(totals)[:-1]])
+    edge = loop_co[first + 1, :2] - loop_co[first, :2]
+    uv = np.zeros((len(corner_vert), 2), dtype=np.float64)
+    color = np.empty((len(corner_vert), 4), dtype=np.float32)
+    normal = np.zeros((len(owner_of), 3))
+    normal[:, 0], normal[:, 1] = edge[:, 1], -edge[:, 0]
+    # faces and loops grouped by owning sector once (stable, so loops stay in face order)
+    owners, face_count = np.unique(owner_of, return_counts=True)
+    faces_of = np.split(np.argsort(owner_of, kind="stable"), np.cumsum(face_count)[:-1])
+    loops_of = np.split(np.argsort(loop_owner, kind="stable"), np.cumsum(np.bincount(loop_owner)[owners])[:-1])
+    for s, faces, rows in zip(owners.tolist(), faces_of, loops_of):
+        sec = sectors[s]
+        m = sec["matrix"]
+        inverse = np.linalg.inv(m)
+        local = loop_co[rows] @ inverse[:3, :3].T + inverse[:3, 3]
+        # local normal of walls (n_local ~ M^T n_world) picks the projection axis like auto_texture
+        axis = np.where(face_class[faces] == 0, np.abs(normal[faces] @ m[:3, :3]).argmax(axis=1), 2)
+        uv[rows] = box_project_uvs(local, np.repeat(axis, totals[faces]), loop_class[rows], sec["ob"])
+        preset = preset_colors(sec["ob"], loop_co[rows, 2], loop_class[rows])
+        color[rows] = sec["color"] if preset is None else preset
+    me.uv_layers.new(name="UVMap").data.foreach_set("uv", uv.ravel())
+    ensure_color_layer(me).data.foreach_set("color", color.ravel())
+
+    old = level_map.data
+    name = old.name
+    level_map.data = me
+    bpy.data.meshes.remove(old)
+    me.name = name
+    return len(tris)
 
 # =========================
-# operators (rest)
+# new brushes
 # =========================
 
-class LevelBuddyNewGeometry(bpy.types.Operator):
-    bl_idname = "scene.level_buddy_new_geometry"
-    bl_label = "Level New Geometry"
-    brush_type: bpy.props.StringProperty(name="brush_type", default='NONE')
-    @classmethod
-    def poll(cls, context): return context.mode == 'OBJECT'
-    def add_vertex_color(self, ob):
-        ensure_color_layer(ob.data); fill_color_layer_object_mode(ob, (1.0, 1.0, 1.0, 1.0))
-    def _set_default_visibility(self, ob):
-        try: ob.hide_select = False
-        except Exception: pass
-        try: ob.hide_set(False)
-        except Exception: pass
-        try: ob.hide_render = True
-        except Exception: pass
-        for attr in ("visible_camera","visible_diffuse","visible_glossy","visible_transmission","visible_volume_scatter","visible_shadow"):
-            if hasattr(ob, attr):
-                try: setattr(ob, attr, False)
-                except Exception: pass
-    def execute(self, context):
-        bpy.ops.object.select_all(action='DESELECT')
-        if self.brush_type == 'SECTOR': bpy.ops.mesh.primitive_plane_add(size=2)
-        else: bpy.ops.mesh.primitive_cube_add(size=2)
-        ob = bpy.context.active_object
-        ob.csg_operation = 'ADD'; ob.display_type = 'WIRE'
-        ob.name = self.brush_type; ob.data.name = self.brush_type
-        ob.brush_type = self.brush_type; ob.csg_order = 0; ob.brush_auto_texture = True
-        bpy.context.view_layer.objects.active = ob
-        self._set_default_visibility(ob)
-        ob.ceiling_height = 4; ob.floor_height = 0
-        ob.ceiling_texture_scale_offset = (1.0, 1.0, 0.0, 0.0)
-        ob.wall_texture_scale_offset = (1.0, 1.0, 0.0, 0.0)
-        ob.floor_texture_scale_offset = (1.0, 1.0, 0.0, 0.0)
-        ob.ceiling_texture_rotation = 0; ob.wall_texture_rotation = 0; ob.floor_texture_rotation = 0
-        ob.ceiling_texture = ""; ob.wall_texture = ""; ob.floor_texture = ""
-        self.add_vertex_color(ob); update_brush(ob)
-        return {"FINISHED"}
-
-class LevelBuddyBuildMap(bpy.types.Operator):
-    bl_idname = "scene.level_buddy_build_map"
-    bl_label = "Build Map"
-    bool_op: bpy.props.StringProperty(name="bool_op", default="UNION")
-    def execute(self, context):
-        scn = bpy.context.scene
-        was_edit_mode = False
-        old_active = bpy.context.active_object
-        old_selected = bpy.context.selected_objects.copy()
-        if bpy.context.mode == 'EDIT_MESH':
-            bpy.ops.object.mode_set(mode='OBJECT'); was_edit_mode = True
-
-        brush_dictionary_list = {}; brush_orders_sorted_list = []
-        level_map = create_new_boolean_object(scn, "LevelGeometry")
-        level_map.data = bpy.data.meshes.new("LevelGeometryMesh")
-
-        ensure_color_layer(level_map.data)
-        mesh = level_map.data
-        if hasattr(mesh, "use_auto_smooth"): mesh.use_auto_smooth = scn.map_use_auto_smooth
-        if hasattr(mesh, "auto_smooth_angle"): mesh.auto_smooth_angle = math.radians(scn.map_auto_smooth_angle)
-
-        level_map.hide_select = True; level_map.hide_set(False)
-
-        for ob in bpy.context.scene.collection.all_objects:
-            if not ob or ob == level_map: continue
-            if getattr(ob, "brush_type", 'NONE') == 'NONE': continue
-            update_brush(ob)
-            if brush_dictionary_list.get(ob.csg_order, None) is None:
-                brush_dictionary_list[ob.csg_order] = []
-            if ob.csg_order not in brush_orders_sorted_list:
-                brush_orders_sorted_list.append(ob.csg_order)
-            brush_dictionary_list[ob.csg_order].append(ob)
-
-        brush_orders_sorted_list.sort()
-        bpy.context.view_layer.objects.active = level_map
-
-        name_index = 0
-        for order in brush_orders_sorted_list:
-            for brush in brush_dictionary_list[order]:
-                brush.name = brush.csg_operation + "[" + str(order) + "]" + str(name_index); name_index += 1
-                bool_obj = build_bool_object(brush)
-                if brush.brush_auto_texture: auto_texture(bool_obj, brush)
-                ensure_color_layer(bool_obj.data)
-                apply_csg(level_map, brush, bool_obj, reporter=self)
-
-        # final clean-up on result mesh
-        _cleanup_result_mesh(level_map.data, merge_dist=1e-5, angle_limit=0.0)
-
-        # optional world-space snap of final geometry
-        if scn.post_build_snap_enable and scn.post_build_snap_step > 0.0:
-            snap_object_mesh_world(level_map, scn.post_build_snap_step)
-
-        remove_material(level_map)
-        update_location_precision(level_map)
-        set_normals_inward(level_map)
-
-        bpy.ops.object.select_all(action='DESELECT')
-        if old_active:
-            old_active.select_set(True); bpy.context.view_layer.objects.active = old_active
-        if was_edit_mode: bpy.ops.object.mode_set(mode='EDIT')
-        for obj in old_selected:
-            if obj: obj.select_set(True)
-
-        for o in list(bpy.data.objects):
-            if o.users == 0: bpy.data.objects.remove(o)
-        for m in list(bpy.data.meshes):
-            if m.users == 0: bpy.data.meshes.remove(m)
-        return {"FINISHED"}
-
-class SetVertexColorOperator(bpy.types.Operator):
-    bl_idname = "object.set_vertex_color"
-    bl_label = "Set Vertex Color"
-    def execute(self, context):
-        obj = context.active_object
-        if obj is None or obj.type != 'MESH': return {'CANCELLED'}
-        color = bpy.context.scene.color_picker
-        ensure_color_layer(obj.data); fill_color_layer_object_mode(obj, (color[0], color[1], color[2], 1.0))
-        return {'FINISHED'}
+def set_brush_default_visibility(ob):
+    try: ob.hide_select = False
+    except Exception: pass
+    try: ob.hide_set(False)
+    except Exception: pass
+    try: ob.hide_render = True
+    except Exception: pass
+    for attr in ("visible_camera","visible_diffuse","visible_glossy","visible_transmission","visible_volume_scatter","visible_shadow"):
+        if hasattr(ob, attr):
+            try: setattr(ob, attr, False)
+            except Exception: pass
+
+def setup_new_brush(ob, brush_type):
+    """Give a fresh plane (SECTOR) or cube (BRUSH) object the default Level Buddy properties."""
+    ob.csg_operation = 'ADD'; ob.display_type = 'WIRE'
+    ob.name = brush_type; ob.data.name = brush_type
+    ob.brush_type = brush_type; ob.csg_order = 0; ob.brush_auto_texture = True
+    set_brush_default_visibility(ob)
+    ob.ceiling_height = 4; ob.floor_height = 0
+    ob.ceiling_texture_scale_offset = (1.0, 1.0, 0.0, 0.0)
+    ob.wall_texture_scale_offset = (1.0, 1.0, 0.0, 0.0)
+    ob.floor_texture_scale_offset = (1.0, 1.0, 0.0, 0.0)
+    ob.ceiling_texture_rotation = 0; ob.wall_texture_rotation = 0; ob.floor_texture_rotation = 0
+    ob.ceiling_texture = ""; ob.wall_texture = ""; ob.floor_texture = ""
+    ensure_color_layer(ob.data); fill_color_layer_object_mode(ob, (1.0, 1.0, 1.0, 1.0))
+    update_brush(ob)
+
+def new_brush_object(scn, brush_type, location=(0.0, 0.0, 0.0), scale=(1.0, 1.0, 1.0)):
+    """Data-API counterpart of New Sector / New Brush: a 2x2 plane or 2x2x2 cube linked to scn."""
+    me = bpy.data.meshes.new(brush_type)
+    bm = bmesh.new()
+    try:
+        if brush_type == 'SECTOR':
+            bmesh.ops.create_grid(bm, x_segments=1, y_segments=1, size=1.0)
+        else:
+            bmesh.ops.create_cube(bm, size=2.0)
+        bm.to_mesh(me)
+    finally:
+        bm.free()
+    ob = bpy.data.objects.new(brush_type, me)
+    scn.collection.objects.link(ob)
+    ob.location = location; ob.scale = scale
+    setup_new_brush(ob, brush_type)
+    return ob
 
 # =========================
-# register
+# build engine
 # =========================
 
-def _register_grid_props():
-    bpy.types.Scene.grid_size_x = bpy.props.FloatProperty(
-        name="Grid Size X", default=1.0, min=0.01, max=100.0, precision=3,
-        description="Grid snapping size for the X-axis (world space)"
-    )
-    bpy.types.Scene.grid_size_y = bpy.props.FloatProperty(
-        name="Grid Size Y", default=1.0, min=0.01, max=100.0, precision=3,
-        description="Grid snapping size for the Y-axis (world space)"
-    )
-    bpy.types.Scene.grid_size_z = bpy.props.FloatProperty(
-        name="Grid Size Z", default=1.0, min=0.01, max=100.0, precision=3,
-        description="Grid snapping size for the Z-axis (world space)"
-    )
-    bpy.types.Scene.continuous_snap = bpy.props.BoolProperty(
-        name="Continuous Snap", default=False,
-        description="Enable continuous world-space snapping of selected vertices while editing"
-    )
+# ---------- Build profiler ----------
+# A profile is a plain dict: Chrome-trace "complete" events, wall time per phase and
+# one entry per brush (or per operation run for the Tree/Batched strategies).
 
-CLASSES = (
-    LevelBuddyPanel,
-    VertexColorPanel,
-    LevelBuddyBuildMap,
-    LevelBuddyNewGeometry,
-    SetVertexColorOperator,
+last_build_profile = None
 
-    # Snap to Grid (edit mode)
-    ERF_SnapToGridPanel,
-    ERF_SnapToGridOperator,
-    ERF_ToggleContinuousSnapOperator,
-    ERF_ResetGridSizesOperator,
-)
+def new_build_profile():
+    return {"origin": time.perf_counter(), "events": [], "phases": {}, "brushes": [], "total": 0.0}
 
-def register():
-    for cls in CLASSES:
-        bpy.utils.register_class(cls)
-    _register_grid_props()
+def _mesh_counts(obj):
+    return len(obj.data.vertices), len(obj.data.polygons)
 
-def unregister():
-    if continuous_snap_handler in bpy.app.handlers.depsgraph_update_post:
-        bpy.app.handlers.depsgraph_update_post.remove(continuous_snap_handler)
-    for cls in reversed(CLASSES):
-        try: bpy.utils.unregister_class(cls)
-        except Exception: pass
-    for attr in ("grid_size_x", "grid_size_y", "grid_size_z", "continuous_snap"):
-        try: delattr(bpy.types.Scene, attr)
-        except Exception: pass
+def profile_span(profile, name, phase, start, obj=None, before=None, **args):
+    """Record [start, now] as a trace event of phase; returns now. Does nothing but time when profile is None."""
+    now = time.perf_counter()
+    if profile is None: return now
+    if before is not None: args["verts_before"], args["faces_before"] = before
+    if obj is not None: args["verts"], args["faces"] = _mesh_counts(obj)
+    profile["events"].append({
+        "name": name, "cat": phase, "ph": "X", "pid": 1, "tid": 1,
+        "ts": round((start - profile["origin"]) * 1e6, 1), "dur": round((now - start) * 1e6, 1), "args": args,
+    })
+    profile["phases"][phase] = profile["phases"].get(phase, 0.0) + (now - start)
+    return now
+
+def slowest_brushes(profile, count=10):
+    return sorted(profile["brushes"], key=lambda b: -b["seconds"])[:count]
+
+def write_chrome_trace(profile, filepath):
+    """Write profile as Chrome trace JSON (chrome://tracing, Perfetto, speedscope)."""
+    with open(filepath, "w") as f:
+        json.dump({
+            "traceEvents": profile["events"],
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "total_seconds": round(profile["total"], 4),
+                "phases": {k: round(v, 4) for k, v in profile["phases"].items()},
+                "slowest_brushes": slowest_brushes(profile, 25),
+            },
+        }, f, indent=1)
+
+def _report(reporter, kind, message):
+    if reporter: reporter.report({kind}, message)
+    else: print(f"Level Buddy: {message}")
+
+def build_level_geometry(reporter=None, full_rebuild=False, profile=None, blender=None):
+    """Build LevelGeometry from all brushes of the scene using the data API only.
+
+    Selection, active object and mode are left untouched, so this runs from scripts
+    and background Blender as well as from the Build Map operator. Returns the level object.
+    Pass a dict from new_build_profile() to record phase and per-brush timings.
+    With scene.build_regions > 1 the booleans run in background Blender processes
+    (blender, default: this executable); incremental checkpoints and the cache are skipped then.
+    """
+    scn = bpy.context.scene
+    build_start = t = time.perf_counter()
+
+    brush_dictionary_list = {}; brush_orders_sorted_list = []
+    update_pending_brushes(scn)
+    level_map = create_new_boolean_object(scn, "LevelGeometry")
+    old = level_map.data
+    level_map.data = bpy.data.meshes.new("LevelGeometryMesh")
+    bpy.data.meshes.remove(old)
+    level_map.hide_select = True
+    try: level_map.hide_set(False)
+    except Exception: pass
+
+    for ob in indexed_brushes(scn):
+        if ob == level_map: continue
+        if brush_dictionary_list.get(ob.csg_order, None) is None:
+            brush_dictionary_list[ob.csg_order] = []
+        if ob.csg_order not in brush_orders_sorted_list:
+            brush_orders_sorted_list.append(ob.csg_order)
+        brush_dictionary_list[ob.csg_order].append(ob)
+
+    brush_orders_sorted_list.sort()
+    t = profile_span(profile, "collect brushes", "collect", t)
+
+    # incremental: resume after the last order group whose checkpoint is still valid
+    blender = blender or bpy.app.binary_path
+    parallel = scn.build_regions > 1 and bool(blender)
+    incremental = scn.build_incremental and not parallel
+    start = 0
+    if incremental:
+        chains = group_chain_hashes(scn, brush_orders_sorted_list, brush_dictionary_list)
+        kept = checkpoint_indices(len(brush_orders_sorted_list), scn.build_checkpoint_count)
+        resume = -1 if full_rebuild else find_resume_index(brush_orders_sorted_list, chains)
+        if resume >= 0:
+            restore_checkpoint(level_map, brush_orders_sorted_list[resume])
+            start = resume + 1
+    elif not scn.build_incremental:
+        clear_checkpoints()
+    t = profile_span(profile, "restore checkpoint", "checkpoints", t, obj=level_map)
+
+    # persistent cache: skip every order group whose result is already on disk
+    cache_dir = None if parallel else cache_directory(scn)
+    cached = 0
+    if cache_dir:
+        cache_keys = cache_chain_keys(scn, brush_orders_sorted_list, brush_dictionary_list)
+        hit = -1 if full_rebuild else find_cached_index(cache_dir, cache_keys)
+        if hit >= start:
+            load_cached_mesh(level_map, cache_dir, cache_keys[hit])
+            cached = hit + 1 - start; start = hit + 1
+            if incremental and hit in kept: store_checkpoint(level_map, brush_orders_sorted_list[hit], chains[hit])
+        t = profile_span(profile, "cache lookup", "cache", t, obj=level_map, reused=cached)
+
+    # leading sector-only orders are extruded from their 2D arrangement instead of booleans
+    reused = start
+    flat = flat_sector_groups(scn, brush_orders_sorted_list, brush_dictionary_list) \
+        if scn.build_flat_sectors and not parallel else []
+    if len(flat) > start:
+        sectors = [p for group in flat for p in group]
+        cells = build_flat_sectors(level_map, sectors, scn.map_precision)
+        start = len(flat)
+        t = profile_span(profile, "flat sectors", "flat_sectors", t, obj=level_map, sectors=len(sectors), cells=cells)
+        if incremental and start - 1 in kept:
+            store_checkpoint(level_map, brush_orders_sorted_list[start - 1], chains[start - 1])
+        if cache_dir: store_cached_mesh(cache_dir, cache_keys[start - 1], level_map.data)
+        _report(reporter, 'INFO', f"Flat sector build: {len(sectors)} sectors, {cells} cells")
+
+    ensure_color_layer(level_map.data)
+    mesh = level_map.data
+    if hasattr(mesh, "use_auto_smooth"): mesh.use_auto_smooth = scn.map_use_auto_smooth
+    if hasattr(mesh, "auto_smooth_angle"): mesh.auto_smooth_angle = math.radians(scn.map_auto_smooth_angle)
+
+    strategy = scn.build_strategy
+    strategy_name = scn.bl_rna.properties["build_strategy"].enum_items[strategy].name
+    adaptive = scn.build_solver == 'ADAPTIVE'
+    csg_stats = {'BOOLEAN': 0, 'SKIPPED': 0, 'JOINED': 0, 'FAILED': 0}
+    solver_stats = {'FAST': 0, 'EXACT': 0}
+    exact_runs = 0  # multi-brush runs the adaptive solver leaves to EXACT
+    name_index = 0
+    try:
+        if parallel:
+            brushes = [b for order in brush_orders_sorted_list for b in brush_dictionary_list[order]]
+            if build_in_regions(level_map, brushes, scn.build_regions, blender, csg_stats, reporter, profile):
+                start = len(brush_orders_sorted_list)
+            else:
+                _report(reporter, 'WARNING', "Parallel build failed, building serially")
+        for i, order in enumerate(brush_orders_sorted_list):
+            brushes = brush_dictionary_list[order]
+            for brush in brushes:
+                _set_changed(brush, "name", brush.csg_operation + "[" + str(order) + "]" + str(name_index)); name_index += 1
+            if i < start: continue
+            # Tree/Batched apply a whole run of same-operation brushes at once
+            runs = csg_runs(brushes) if strategy in ('TREE', 'BATCHED') else [[b] for b in brushes]
+            for run in runs:
+                t = time.perf_counter()
+                before = _mesh_counts(level_map)
+                operands = [build_operand(b, profile) for b in run]
+                t_csg = time.perf_counter()
+                use_self, solver = False, 'EXACT'
+                if adaptive and len(run) > 1: exact_runs += 1
+                if adaptive and len(run) == 1:
+                    operand = None
+                elif strategy == 'TREE':
+                    operand = reduce_operands_tree(operands, csg_stats, reporter=reporter)
+                elif strategy == 'BATCHED':
+                    operand = batch_operands(operands); use_self = len(run) > 1
+                else:
+                    operand = operands[0]
+                if operand is None:
+                    result, solver = apply_csg_adaptive(level_map, run[0], operands[0], reporter=reporter)
+                else:
+                    result = apply_csg(level_map, run[0], operand, reporter=reporter, use_self=use_self,
+                                       materials=operand if strategy in ('TREE', 'BATCHED') else None)
+                csg_stats[result] += 1
+                if result == 'BOOLEAN': solver_stats[solver] += 1
+                now = profile_span(profile, run[0].name, "apply_csg", t_csg, obj=level_map, before=before,
+                                   result=result, brushes=len(run), solver=solver)
+                if profile is not None:
+                    after = _mesh_counts(level_map)
+                    profile["brushes"].append({
+                        "name": run[0].name, "brushes": [b.name for b in run], "order": order,
+                        "seconds": now - t, "result": result, "solver": solver,
+                        "verts_before": before[0], "faces_before": before[1], "verts": after[0], "faces": after[1],
+                    })
+                release_operands()
+            if incremental and i in kept:
+                t = time.perf_counter()
+                store_checkpoint(level_map, order, chains[i])
+                profile_span(profile, f"checkpoint [{order}]", "checkpoints", t)
+            if cache_dir:
+                t = time.perf_counter()
+                store_cached_mesh(cache_dir, cache_keys[i], level_map.data)
+                profile_span(profile, f"cache [{order}]", "cache", t)
+    finally:
+        free_build_scene()
+        t = time.perf_counter()
+        free_operand_pool()
+        profile_span(profile, "operand pool", "operand_pool", t)
+
+    if cache_dir:
+        evicted = evict_cache(cache_dir, scn.build_cache_size_mb * 1024 * 1024)
+        _report(reporter, 'INFO', f"Build cache: reused {cached}/{len(brush_orders_sorted_list)} CSG order groups"
+                + (f", evicted {evicted} old entries" if evicted else ""))
+
+    if incremental:
+        clear_checkpoints(keep_orders={brush_orders_sorted_list[i] for i in kept})
+        _report(reporter, 'INFO', f"Incremental build: reused {reused}/{len(brush_orders_sorted_list)} CSG order groups")
+    _report(reporter, 'INFO', "Booleans: {BOOLEAN} applied, {SKIPPED} skipped, {JOINED} joined, {FAILED} failed".format(**csg_stats))
+    if adaptive:
+        _report(reporter, 'INFO', "Adaptive solver: {FAST} fast, {EXACT} exact".format(**solver_stats))
+        if exact_runs:
+            _report(reporter, 'WARNING', f"Adaptive solver: {exact_runs} multi-brush {strategy_name} runs used the exact "
+                    "solver without failure memory (use the Sequential strategy to cover every brush)")
+
+    # final clean-up on result mesh: weld, optional world snap, removed materials, precision, normals
+    t = time.perf_counter(); before = _mesh_counts(level_map)
+    snap_step = scn.post_build_snap_step if scn.post_build_snap_enable else 0.0
+    post_process_level_mesh(level_map, merge_dist=1e-5, snap_step=snap_step,
+                            remove=removal_material_names(scn), precision=scn.map_precision)
+    t = profile_span(profile, "LevelGeometry", "post_process_level_mesh", t, obj=level_map, before=before)
+    if scn.build_sector_ids:
+        tag_sector_faces(level_map, sector_volumes(scn), scn.map_precision,
+                         scn.boolean_overlap_epsilon if scn.use_boolean_overlap else 0.0)
+        t = profile_span(profile, "sector ids", "sector_ids", t)
+
+    total = time.perf_counter() - build_start
+    if profile is not None:
+        profile["total"] = total
+    _report(reporter, 'INFO', f"Build Map ({strategy_name}): {total:.2f}s")
+    return level_map
+
+# =========================
+# brush index
+# =========================
+# Brushes of the scene with their world AABBs hashed into a uniform xy grid, so the build,
+# the live preview and the exports ask for brushes by CSG order or by region instead of
+# walking every object and reading every mesh. A depsgraph handler marks brushes that were
+# edited, moved or retyped; they are re-indexed lazily at the next query, and only they get
+# update_brush before the next build. Added or deleted objects only trigger a membership
+# check (no mesh reads). Script edits arrive with the next depsgraph evaluation, which the
+# build forces first. Without the handler (command line, add-on not registered) and after
+# undo or loading a file the next query rebuilds the index.
+
+BRUSH_INDEX_CELL = 16.0
+BRUSH_INDEX_MAX_CELLS = 256
+
+# "entries": session uid -> {"ob", "order", "rank" (scene order), "box", "cells"},
+# "cells": (i, j) -> uids, "large": uids of boxes over BRUSH_INDEX_MAX_CELLS cells,
+# "dirty": uids whose box and order are out of date, "pending": uids that need update_brush
+_brush_index = {"scene": None, "entries": {}, "cells": {}, "large": set(), "dirty": set(),
+                "pending": set(), "members": True, "stale": True}
+
+def _unindex_box(state, uid):
+    entry = state["entries"][uid]
+    for cell in entry["cells"]:
+        uids = state["cells"].get(cell)
+        if uids is None: continue
+        uids.discard(uid)
+        if not uids: del state["cells"][cell]
+    state["large"].discard(uid)
+    entry["box"], entry["cells"] = None, ()
+
+def _index_box(state, uid):
+    entry = state["entries"][uid]
+    ob = entry["ob"]
+    if ob.mode == 'EDIT': ob.update_from_editmode()
+    box = entry["box"] = brush_world_aabb(ob)
+    if box is None: return
+    lo = np.floor(box[0][:2] / BRUSH_INDEX_CELL).astype(int)
+    hi = np.floor(box[1][:2] / BRUSH_INDEX_CELL).astype(int)
+    if np.prod(hi - lo + 1) > BRUSH_INDEX_MAX_CELLS:
+        state["large"].add(uid); return
+    entry["cells"] = [(i, j) for i in range(lo[0], hi[0] + 1) for j in range(lo[1], hi[1] + 1)]
+    for cell in entry["cells"]: state["cells"].setdefault(cell, set()).add(uid)
+
+def brush_index(scn, boxes=False, flush=False):
+    """The index of scn brought up to date; boxes=True also re-indexes the AABBs of edited brushes.
+
+    Script edits reach the handler with the next depsgraph evaluation; flush evaluates it first.
+    """
+    state = _brush_index
+    if brush_index_handler in bpy.app.handlers.depsgraph_update_post:
+        if flush and scn == bpy.context.scene: bpy.context.view_layer.update()
+    else:
+        state["stale"] = True
+    if state["stale"] or state["scene"] != scn.as_pointer():
+        state.update(scene=scn.as_pointer(), entries={}, cells={}, large=set(), dirty=set(),
+                     pending=set(), members=True, stale=False)
+    entries, dirty = state["entries"], state["dirty"]
+    try:
+        if state["members"]:
+            found = {ob.session_uid: (rank, ob) for rank, ob in enumerate(scn.collection.all_objects)
+                     if getattr(ob, "brush_type", 'NONE') != 'NONE'}
+            for uid in [uid for uid in entries if uid not in found]:
+                _unindex_box(state, uid); del entries[uid]
+                dirty.discard(uid); state["pending"].discard(uid)
+            for uid, (rank, ob) in found.items():
+                entry = entries.get(uid)
+                if entry is None:
+                    entries[uid] = {"ob": ob, "order": 0, "rank": rank, "box": None, "cells": ()}
+                    dirty.add(uid); state["pending"].add(uid)
+                else:
+                    entry["ob"], entry["rank"] = ob, rank
+            state["members"] = False
+        for uid in dirty: entries[uid]["order"] = entries[uid]["ob"].csg_order
+        if boxes and dirty:
+            for uid in dirty:
+                _unindex_box(state, uid); _index_box(state, uid)
+            dirty.clear()
+    except ReferenceError:
+        # an object was removed without a depsgraph update reaching the handler
+        state["stale"] = True
+        return brush_index(scn, boxes, flush)
+    return state
+
+def indexed_brushes(scn, lo=None, hi=None, margin=0.0):
+    """Brushes in build order (csg_order, then scene order); with lo/hi only those whose AABB touches that box."""
+    state = brush_index(scn, boxes=lo is not None)
+    entries = state["entries"]
+    if lo is None:
+        found = list(entries.values())
+    else:
+        lo = np.asarray(lo, dtype=np.float64) - margin
+        hi = np.asarray(hi, dtype=np.float64) + margin
+        c0, c1 = np.floor(lo[:2] / BRUSH_INDEX_CELL), np.floor(hi[:2] / BRUSH_INDEX_CELL)
+        span = np.prod(c1 - c0 + 1.0)
+        if not np.isfinite(span) or span > len(state["cells"]):
+            uids = entries.keys()
+        else:
+            uids = set(state["large"])
+            for i in range(int(c0[0]), int(c1[0]) + 1):
+                for j in range(int(c0[1]), int(c1[1]) + 1):
+                    uids |= state["cells"].get((i, j), set())
+        found = [entries[uid] for uid in uids if aabbs_overlap(entries[uid]["box"], (lo, hi))]
+    found.sort(key=lambda entry: (entry["order"], entry["rank"]))
+    return [entry["ob"] for entry in found]
+
+def brush_neighbours(scn, ob, margin=0.0):
+    """Brushes whose AABB touches ob's (grown by margin), in build order, ob excluded."""
+    box = brush_world_aabb(ob)
+    if box is None: return []
+    return [other for other in indexed_brushes(scn, box[0], box[1], margin) if other != ob]
+
+def sectors_at_point(scn, point):
+    """Sectors whose extruded footprint contains the world point, in build order."""
+    p = np.asarray(point, dtype=np.float64)
+    found = []
+    for ob in indexed_brushes(scn, p, p):
+        me = ob.data
+        if ob.brush_type != 'SECTOR' or not len(me.polygons): continue
+        m = np.array(object_matrix(ob), dtype=np.float64)
+        co = read_vertex_coords(me).astype(np.float64)
+        up = -1.0 if _foreach_array(me.polygons, "normal", 3, np.float32)[2::3].sum() < 0.0 else 1.0
+        prism = np.concatenate((co + (0.0, 0.0, up * ob.floor_height), co + (0.0, 0.0, up * ob.ceiling_height)))
+        prism = prism @ m[:3, :3].T + m[:3, 3]
+        if not prism[:, 2].min() <= p[2] <= prism[:, 2].max(): continue
+        me.calc_loop_triangles()
+        tris = prism[_foreach_array(me.loop_triangles, "vertices", 3, np.int32).reshape(-1, 3), :2]
+        # signed areas of the point against the three edges: all on one side means inside
+        a, b = tris, np.roll(tris, -1, axis=1)
+        side = (b[..., 0] - a[..., 0]) * (p[1] - a[..., 1]) - (b[..., 1] - a[..., 1]) * (p[0] - a[..., 0])
+        inside = np.all(side >= -1e-9, axis=1) | np.all(side <= 1e-9, axis=1)
+        if inside.any(): found.append(ob)
+    return found
+
+def update_pending_brushes(scn):
+    """update_brush on the brushes edited since their last update (every brush without the handler)."""
+    state = brush_index(scn, flush=True)
+    pending, state["pending"] = state["pending"], set()
+    for uid in pending:
+        entry = state["entries"].get(uid)
+        if entry is not None: update_brush(entry["ob"])
+    return len(pending)
+
+@persistent
+def brush_index_handler(scene, depsgraph=None):
+    state = _brush_index
+    if depsgraph is None or state["stale"] or scene.as_pointer() != state["scene"]: return
+    entries = state["entries"]
+    for update in depsgraph.updates:
+        id_data = getattr(update.id, "original", update.id)
+        if isinstance(id_data, bpy.types.Object):
+            uid = id_data.session_uid
+            if uid in entries:
+                # new datablocks report every object, without geometry or transform changes
+                if update.is_updated_geometry or update.is_updated_transform:
+                    state["dirty"].add(uid); state["pending"].add(uid)
+            elif getattr(id_data, "brush_type", 'NONE') != 'NONE':
+                state["members"] = True
+        elif isinstance(id_data, (bpy.types.Scene, bpy.types.Collection)):
+            # objects were added or deleted
+            state["members"] = True
+
+@persistent
+def _reset_brush_index(*args):
+    """Undo, redo and file load: rebuild at the next query."""
+    _brush_index["stale"] = True
+
+def _brush_index_changed(self, context):
+    """Property update: csg_order, type and material changes don't reach the depsgraph handler."""
+    state = _brush_index
+    uid = self.session_uid
+    if uid in state["entries"]:
+        state["dirty"].add(uid); state["pending"].add(uid)
+    if uid not in state["entries"] or self.brush_type == 'NONE':
+        state["members"] = True
+
+def _brush_index_settings_changed(self, context):
+    """Property update: map precision and the overlap epsilon change every brush."""
+    _reset_brush_index()
+
+# =========================
+# live preview
+# =========================
+# While Live Preview is on, brush edits are collected from depsgraph updates and, once
+# they settle, only the preview tiles touched by the changed brushes (old and new bounds)
+# are rebuilt, with the FAST solver and without clean-up or snapping. Tiles are child
+# objects of the LevelPreview empty; Build Map stays the exact, final build.
+# The float solver fails on coplanar faces, so leading sector orders use the flat sector
+# build and every other operand is nudged by a tiny random offset. Tiles are cut out of
+# their brushes' result with bisect_plane (a surface cut, no caps on the tile walls).
+
+PREVIEW_NAME = "LevelPreview"
+
+# "boxes": brush session_uid -> world AABB at the last preview update (Build Map renames
+# brushes, so names are no key), "dirty": session_uids edited since
+_preview_state = {"boxes": {}, "dirty": set(), "check_deleted": False, "last": None}
+
+def _scene_brushes(scn):
+    """Brushes of the scene in build order (csg_order, then scene order)."""
+    return indexed_brushes(scn)
+
+def preview_tiles(box, size):
+    """(i, j) of the preview tiles a world AABB touches."""
+    lo = np.floor(box[0][:2] / size).astype(int)
+    hi = np.floor(box[1][:2] / size).astype(int)
+    return {(i, j) for i in range(lo[0], hi[0] + 1) for j in range(lo[1], hi[1] + 1)}
+
+def clip_mesh_xy(me, lo, hi):
+    """Cut the surface of me (world space) to the xy box lo..hi in place."""
+    bm = bmesh.new()
+    bm.from_mesh(me)
+    try:
+        for axis in (0, 1):
+            for co, sign in ((lo, 1.0), (hi, -1.0)):
+                normal = Vector((0.0, 0.0, 0.0)); normal[axis] = sign
+                geom = bm.verts[:] + bm.edges[:] + bm.faces[:]
+                bmesh.ops.bisect_plane(bm, geom=geom, dist=1e-6, plane_co=Vector((co[0], co[1], 0.0)),
+                                       plane_no=normal, clear_inner=True)
+    finally:
+        bm.to_mesh(me)
+        bm.free()
+
+def _remove_temp_object(ob):
+    me = ob.data
+    bpy.data.objects.remove(ob)
+    if me is not None and me.users == 0: bpy.data.meshes.remove(me)
+
+def build_preview_mesh(brushes, lo, hi):
+    """Mesh of brushes (in build order) clipped to the xy box lo..hi, FAST solver, no clean-up."""
+    scn = bpy.context.scene
+    region = bpy.data.objects.new("_LB_PreviewRegion", bpy.data.meshes.new("_LB_PreviewRegion"))
+    ensure_color_layer(region.data)
+    try:
+        orders = sorted({b.csg_order for b in brushes})
+        by_order = {order: [b for b in brushes if b.csg_order == order] for order in orders}
+        # always flat here: the FAST solver fails on the coplanar faces of neighbouring sectors
+        flat = flat_sector_groups(scn, orders, by_order)
+        if flat:
+            build_flat_sectors(region, [p for group in flat for p in group], scn.map_precision)
+            ensure_color_layer(region.data)
+        jitter = 10.0 ** -(scn.map_precision + 1)
+        rng = random.Random(0)
+        for brush in brushes[sum(len(group) for group in flat):]:
+            operand = build_operand(brush)
+            operand.location += Vector([rng.uniform(-jitter, jitter) for _ in range(3)])
+            try: apply_csg(region, brush, operand, solver='FAST')
+            finally: release_operands()
+        region.data.transform(object_matrix(region))
+        clip_mesh_xy(region.data, lo, hi)
+        return region.data
+    finally:
+        bpy.data.objects.remove(region)
+        free_build_scene()
+        free_operand_pool()
+
+def _preview_root(scn):
+    root = bpy.data.objects.get(PREVIEW_NAME)
+    if root is None:
+        root = bpy.data.objects.new(PREVIEW_NAME, None)
+        root.hide_select = True
+    if scn.collection.all_objects.get(PREVIEW_NAME) is None:
+        scn.collection.objects.link(root)
+    return root
+
+def remove_live_preview():
+    root = bpy.data.objects.get(PREVIEW_NAME)
+    if root is None: return
+    for tile in list(root.children): _remove_temp_object(tile)
+    bpy.data.objects.remove(root)
+
+def update_live_preview(scn, full=False):
+    """Bring the preview up to date; returns the number of tiles rebuilt."""
+    t = time.perf_counter()
+    state = _preview_state
+    size = scn.live_preview_tile_size
+    dirty, state["dirty"] = state["dirty"], set()
+    full = full or bpy.data.objects.get(PREVIEW_NAME) is None or not state["boxes"]
+    if full:
+        remove_live_preview(); state["boxes"] = {}
+    brushes = _scene_brushes(scn)
+    boxes = state["boxes"]
+    changed = []
+    if state["check_deleted"] or len(boxes) > len(brushes):
+        # deleted brushes
+        state["check_deleted"] = False
+        uids = {ob.session_uid for ob in brushes}
+        dirty |= {uid for uid in boxes if uid not in uids}
+    for uid in dirty:
+        if uid in boxes: changed.append(boxes.pop(uid))
+    for ob in brushes:
+        if ob.session_uid not in boxes:
+            if ob.mode == 'EDIT': ob.update_from_editmode()
+            boxes[ob.session_uid] = brush_world_aabb(ob)
+            changed.append(boxes[ob.session_uid])
+    tiles = set()
+    for box in changed:
+        if box is not None: tiles |= preview_tiles(box, size)
+
+    root = _preview_root(scn)
+    existing = {tile.name: tile for tile in root.children}
+    for i, j in sorted(tiles):
+        lo, hi = np.array((i * size, j * size)), np.array(((i + 1) * size, (j + 1) * size))
+        inside = indexed_brushes(scn, (lo[0], lo[1], -np.inf), (hi[0], hi[1], np.inf))
+        name = f"{PREVIEW_NAME}.tile({i},{j})"
+        tile = existing.get(name)
+        if not inside:
+            if tile is not None: _remove_temp_object(tile)
+            continue
+        me = build_preview_mesh(inside, lo, hi)
+        if tile is None:
+            tile = bpy.data.objects.new(name, me)
+            tile.parent = root; tile.hide_select = True
+            for collection in root.users_collection: collection.objects.link(tile)
+        else:
+            old, tile.data = tile.data, me
+            bpy.data.meshes.remove(old)
+        me.name = name
+    state["last"] = (len(tiles), time.perf_counter() - t)
+    return len(tiles)
+
+def _live_preview_timer():
+    scn = bpy.context.scene
+    if scn is not None and scn.live_preview:
+        try: update_live_preview(scn)
+        except Exception:
+            # a timer swallows exceptions, print the whole traceback
+            print("Level Buddy: live preview failed")
+            traceback.print_exc()
+    return None
+
+@persistent
+def live_preview_handler(scene, depsgraph=None):
+    if not scene.live_preview or depsgraph is None: return
+    state = _preview_state
+    edited = False
+    for update in depsgraph.updates:
+        id_data = getattr(update.id, "original", update.id)
+        if isinstance(id_data, bpy.types.Object):
+            if getattr(id_data, "brush_type", 'NONE') != 'NONE' and (update.is_updated_geometry or update.is_updated_transform):
+                state["dirty"].add(id_data.session_uid); edited = True
+        elif isinstance(id_data, (bpy.types.Scene, bpy.types.Collection)) and id_data.name != BUILD_SCENE_NAME:
+            # objects were added or deleted
+            state["check_deleted"] = edited = True
+    if not edited: return
+    # debounce: restart the timer on every edit, rebuild once the burst settles
+    if bpy.app.timers.is_registered(_live_preview_timer):
+        bpy.app.timers.unregister(_live_preview_timer)
+    bpy.app.timers.register(_live_preview_timer, first_interval=scene.live_preview_delay)
+
+def _reset_live_preview():
+    _preview_state.update(boxes={}, dirty=set(), check_deleted=False, last=None)
+    if bpy.app.timers.is_registered(_live_preview_timer):
+        bpy.app.timers.unregister(_live_preview_timer)
+
+def _update_live_preview(self, context):
+    handlers = bpy.app.handlers.depsgraph_update_post
+    _reset_live_preview()
+    if self.live_preview:
+        if live_preview_handler not in handlers: handlers.append(live_preview_handler)
+        bpy.app.timers.register(_live_preview_timer, first_interval=0.0)
+    else:
+        if live_preview_handler in handlers: handlers.remove(live_preview_handler)
+        remove_live_preview()
+
+@persistent
+def _live_preview_load_post(*args):
+    """A loaded file starts from a fresh preview state; re-arm the handler if it has Live Preview on."""
+    handlers = bpy.app.handlers.depsgraph_update_post
+    _reset_live_preview()
+    scn = bpy.context.scene
+    if scn is not None and scn.live_preview:
+        if live_preview_handler not in handlers: handlers.append(live_preview_handler)
+        bpy.app.timers.register(_live_preview_timer, first_interval=0.0)
+    elif live_preview_handler in handlers:
+        handlers.remove(live_preview_handler)
+
+# =========================
+# AO bake
+# =========================
+# Vertex ambient occlusion baked into the colour attribute of LevelGeometry, without a
+# render setup: one BVHTree over the map, a fixed cosine-weighted hemisphere of rays per
+# unique vertex position (corners at the same position share it), cast in batches. The
+# colours the build produced are kept in AO_BASE_ATTR, so a re-bake starts from them
+# again. Results are remembered per position; the next bake of a rebuilt map only casts
+# rays for points within ray distance of triangles that appeared or vanished.
+
+AO_BASE_ATTR = "lb_base_color"
+AO_BATCH = 4096
+
+# "params": (samples, distance, precision) of the last bake, "tris": triangle keys,
+# "tri_co": their world corners (t, 3, 3), "points": position key -> AO of that bake.
+# Keys are exact: the bytes of the rounded integer positions (a triangle's sorted corners).
+_ao_state = {"params": None, "tris": None, "tri_co": None, "points": {}}
+
+def hemisphere_directions(samples):
+    """Cosine-weighted directions (samples, 3) around +z on a Fibonacci spiral."""
+    k = np.arange(samples) + 0.5
+    r = np.sqrt(k / samples)
+    phi = k * math.pi * (3.0 - math.sqrt(5.0))
+    return np.column_stack((r * np.cos(phi), r * np.sin(phi), np.sqrt(1.0 - r * r)))
+
+def _quantized_positions(co, precision):
+    """World positions rounded to the map precision, int64 (n, 3)."""
+    return np.round(co * 10.0 ** precision).astype(np.int64)
+
+def _row_keys(rows):
+    """One exact key per row of an int64 array (void scalars, bytes in tolist())."""
+    rows = np.ascontiguousarray(rows)
+    return rows.view(np.dtype((np.void, rows.itemsize * rows.shape[1]))).ravel()
+
+def _changed_triangles(tri_keys, tri_co):
+    """World corners of triangles added or removed since the last bake, or None if there is none to diff."""
+    old_keys, old_co = _ao_state["tris"], _ao_state["tri_co"]
+    if old_keys is None: return None
+    added = ~np.isin(tri_keys, old_keys)
+    removed = ~np.isin(old_keys, tri_keys)
+    return np.concatenate((tri_co[added], old_co[removed]))
+
+def bake_vertex_ao(level_map, samples=16, distance=2.0, incremental=True):
+    """Bake AO into the colour attribute of level_map; returns (points, points ray-cast)."""
+    me = level_map.data
+    scn = bpy.context.scene
+    precision = scn.map_precision
+    m = np.array(level_map.matrix_world, dtype=np.float64)
+    co = read_vertex_coords(me).astype(np.float64) @ m[:3, :3].T + m[:3, 3]
+    corner_vert = _foreach_array(me.loops, "vertex_index", 1, np.int32)
+    me.calc_loop_triangles()
+    tris = _foreach_array(me.loop_triangles, "vertices", 3, np.int32).reshape(-1, 3)
+
+    # unique positions with area-weighted normals of all faces around them
+    unique, point_of = np.unique(_quantized_positions(co, precision), axis=0, return_inverse=True)
+    point_of = point_of.reshape(-1)
+    point_keys = _row_keys(unique)
+    cross = np.cross(co[tris[:, 1]] - co[tris[:, 0]], co[tris[:, 2]] - co[tris[:, 0]])
+    normal = np.zeros((len(unique), 3))
+    for i in range(3): np.add.at(normal, point_of[tris[:, i]], cross)
+    length = np.linalg.norm(normal, axis=1)
+    normal /= np.where(length > 1e-12, length, 1.0)[:, None]
+    point_co = np.zeros((len(unique), 3)); point_co[point_of] = co
+
+    # which points need rays: all, or those near triangles changed since the last bake
+    # unique rows come out sorted, so sorted point indices order the corners by position
+    tri_keys = _row_keys(unique[np.sort(point_of[tris], axis=1)].reshape(-1, 9))
+    tri_co = co[tris]
+    params = (samples, round(distance, 6), precision)
+    todo = np.ones(len(unique), dtype=bool)
+    ao = np.ones(len(unique))
+    changed = _changed_triangles(tri_keys, tri_co) if incremental and _ao_state["params"] == params else None
+    if changed is not None and len(changed) <= len(tris) // 4:
+        cached = _ao_state["points"]
+        known = np.fromiter((k in cached for k in point_keys.tolist()), dtype=bool, count=len(unique))
+        ao[known] = [cached[k] for k in point_keys[known].tolist()]
+        near = np.zeros(len(unique), dtype=bool)
+        for i in range(0, len(changed), 64):
+            lo = changed[i:i + 64].min(axis=1) - distance; hi = changed[i:i + 64].max(axis=1) + distance
+            near |= np.any(np.all((point_co[:, None] >= lo) & (point_co[:, None] <= hi), axis=2), axis=1)
+        todo = near | ~known
+
+    # rays: the hemisphere turned onto each normal, with a per-position twist against banding
+    index = np.flatnonzero(todo & (length > 1e-12))
+    if len(index) and len(tris):
+        bvh = BVHTree.FromPolygons(co.tolist(), tris.tolist())
+        hemisphere = hemisphere_directions(samples)
+        bias = max(10.0 ** -precision, 1e-5)
+        seed = (unique[:, 0] * 73856093 ^ unique[:, 1] * 19349663 ^ unique[:, 2] * 83492791) % 1024
+        for b in range(0, len(index), AO_BATCH):
+            batch = index[b:b + AO_BATCH]
+            n = normal[batch]
+            t = np.cross(n, np.where(np.abs(n[:, :1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]]))
+            t /= np.linalg.norm(t, axis=1)[:, None]
+            twist = seed[batch] / 1024.0 * 2.0 * math.pi
+            t = t * np.cos(twist)[:, None] + np.cross(n, t) * np.sin(twist)[:, None]
+            s = np.cross(n, t)
+            dirs = (hemisphere[None, :, :1] * t[:, None] + hemisphere[None, :, 1:2] * s[:, None]
+                    + hemisphere[None, :, 2:] * n[:, None])
+            origins = point_co[batch] + n * bias
+            for j, (o, ds) in enumerate(zip(origins.tolist(), dirs.tolist())):
+                origin = Vector(o)
+                occlusion = 0.0
+                for d in ds:
+                    hit = bvh.ray_cast(origin, Vector(d), distance)
+                    if hit[0] is not None: occlusion += 1.0 - hit[3] / distance
+                ao[batch[j]] = 1.0 - occlusion / samples
+    _ao_state.update(params=params, tris=tri_keys, tri_co=tri_co, points=dict(zip(point_keys.tolist(), ao.tolist())))
+
+    # colour = colour of the build x AO, per corner
+    layer = ensure_color_layer(me)
+    n_color = len(layer.data)
+    base_attr = me.color_attributes.get(AO_BASE_ATTR)
+    if base_attr is not None and (base_attr.domain != layer.domain or len(base_attr.data) != n_color):
+        me.color_attributes.remove(base_attr); base_attr = None
+    if base_attr is None:
+        base = _foreach_array(layer.data, "color", 4, np.float32).reshape(-1, 4)
+        base_attr = me.color_attributes.new(AO_BASE_ATTR, 'FLOAT_COLOR', layer.domain)
+        base_attr.data.foreach_set("color", base.ravel())
+        layer = ensure_color_layer(me)
+    else:
+        base = _foreach_array(base_attr.data, "color", 4, np.float32).reshape(-1, 4)
+    factor = ao[point_of[corner_vert]] if layer.domain == 'CORNER' else ao[point_of]
+    color = base.copy()
+    color[:, :3] *= factor[:, None]
+    layer.data.foreach_set("color", color.ravel())
+    me.update()
+    return len(unique), len(index)
+
+# =========================
+# sector portals and PVS
+# =========================
+# Added sectors are the rooms of the map. Two sectors are joined by a portal where their
+# footprint outlines share a segment and their floor..ceiling ranges overlap; the portal
+# is that vertical rectangle. Sectors whose footprints overlap, or that one added brush
+# reaches, open into each other anywhere, so they are grouped and see as one. The PVS of
+# a group follows portal chains from each of its portals and drops the next portal once
+# no line through the first portal and the previous one can reach it (separating planes,
+# as in Quake's vis). What is left is conservative: it may see too much, never too little.
+
+SECTOR_ID_ATTR = "sector_id"
+PVS_MAGIC = 0x5650424C  # "LBPV"
+PVS_VERSION = 1
+PVS_FLOW_BUDGET = 500
+
+def sector_volumes(scn):
+    """Added sectors in ID order (build order) with their world footprint, outline and bounds."""
+    sectors = []
+    for ob in _scene_brushes(scn):
+        if ob.brush_type != 'SECTOR' or ob.csg_operation != 'ADD': continue
+        me = ob.data
+        if not len(me.polygons) or abs(ob.ceiling_height - ob.floor_height) < 1e-9: continue
+        m = np.array(object_matrix(ob), dtype=np.float64)
+        co = read_vertex_coords(me).astype(np.float64)
+        up = -1.0 if _foreach_array(me.polygons, "normal", 3, np.float32)[2::3].sum() < 0.0 else 1.0
+        prism = np.concatenate((co + (0.0, 0.0, up * ob.floor_height), co + (0.0, 0.0, up * ob.ceiling_height)))
+        prism = prism @ m[:3, :3].T + m[:3, 3]
+        xy = prism[:len(co), :2]
+        corner_vert = _foreach_array(me.loops, "vertex_index", 1, np.int32)
+        corner_edge = _foreach_array(me.loops, "edge_index", 1, np.int32)
+        starts = _foreach_array(me.polygons, "loop_start", 1, np.int32)
+        totals = _foreach_array(me.polygons, "loop_total", 1, np.int32)
+        face_of = np.repeat(np.arange(len(starts)), totals)
+        nxt = starts[face_of] + (np.arange(len(corner_vert)) - starts[face_of] + 1) % totals[face_of]
+        # outline: edges used by one face, turned so the sector lies on their left in world xy
+        p, q = xy[corner_vert], xy[corner_vert[nxt]]
+        area = np.bincount(face_of, weights=p[:, 0] * q[:, 1] - p[:, 1] * q[:, 0], minlength=len(starts))
+        outline = np.flatnonzero(np.bincount(corner_edge, minlength=len(me.edges))[corner_edge] == 1)
+        ccw = (area[face_of[outline]] > 0.0)[:, None]
+        a, b = p[outline], q[outline]
+        me.calc_loop_triangles()
+        tris = xy[_foreach_array(me.loop_triangles, "vertices", 3, np.int32).reshape(-1, 3)]
+        sectors.append({"ob": ob, "edges": (np.where(ccw, a, b), np.where(ccw, b, a)), "tris": tris,
+                        "lo": prism.min(axis=0), "hi": prism.max(axis=0)})
+    return sectors
+
+def sector_portals(sectors, eps=1e-4):
+    """Portals between neighbouring sectors: (i, j, quad (4, 3), horizontal normal from i into j)."""
+    lines = {}
+    for i, sec in enumerate(sectors):
+        a, b = sec["edges"]
+        length = np.linalg.norm(b - a, axis=1)
+        keep = length > eps
+        a, length = a[keep], length[keep]
+        u = (b[keep] - a) / length[:, None]
+        # one direction per line; flipping an edge puts its sector on the right
+        flip = (u[:, 0] < -1e-9) | ((np.abs(u[:, 0]) <= 1e-9) & (u[:, 1] < 0.0))
+        u[flip] *= -1.0
+        offset = u[:, 0] * a[:, 1] - u[:, 1] * a[:, 0]
+        t0 = np.einsum("ij,ij->i", a, u)
+        t1 = t0 + np.where(flip, -length, length)
+        for k in range(len(u)):
+            key = (round(u[k, 0], 5), round(u[k, 1], 5), round(offset[k] / eps))
+            lines.setdefault(key, []).append((min(t0[k], t1[k]), max(t0[k], t1[k]), -1.0 if flip[k] else 1.0, i, u[k], offset[k]))
+    portals = []
+    for segments in lines.values():
+        for k, (lo_a, hi_a, side_a, i, u, offset) in enumerate(segments):
+            for lo_b, hi_b, side_b, j, _, _ in segments[k + 1:]:
+                # neighbours lie on opposite sides of the shared segment
+                if i == j or side_a == side_b: continue
+                t0, t1 = max(lo_a, lo_b), min(hi_a, hi_b)
+                z0, z1 = max(sectors[i]["lo"][2], sectors[j]["lo"][2]), min(sectors[i]["hi"][2], sectors[j]["hi"][2])
+                if t1 - t0 <= eps or z1 - z0 <= eps: continue
+                n = np.array((-u[1], u[0], 0.0))
+                p0 = np.array((*(u * t0), 0.0)) + n * offset
+                p1 = np.array((*(u * t1), 0.0)) + n * offset
+                quad = np.array([p0, p1, p1, p0]); quad[:, 2] = (z0, z0, z1, z1)
+                portals.append((i, j, quad, -side_a * n))
+    return portals
+
+def _footprints_overlap(tris_a, tris_b):
+    """True if two footprints share area, not just an outline."""
+    def shrunk(t):
+        c = t.mean(axis=0)
+        return [Vector(c + (p - c) * (1.0 - 1e-4)) for p in t]
+    lo_b, hi_b = tris_b.min(axis=1), tris_b.max(axis=1)
+    for ta in tris_a:
+        near = np.flatnonzero(np.all(lo_b < ta.max(axis=0), axis=1) & np.all(ta.min(axis=0) < hi_b, axis=1))
+        if any(intersect_tri_tri_2d(*shrunk(ta), *shrunk(tris_b[k])) for k in near): return True
+    return False
+
+def sector_groups(scn, sectors, eps=1e-4):
+    """Group index per sector; grouped sectors open into each other without a portal."""
+    parent = list(range(len(sectors)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]; i = parent[i]
+        return i
+    if sectors:
+        lo = np.array([s["lo"] for s in sectors]); hi = np.array([s["hi"] for s in sectors])
+        for i in range(len(sectors)):
+            # touching in z counts: a floor on another sector's ceiling leaves no solid in between
+            near = np.flatnonzero(np.all(lo <= hi[i] + eps, axis=1) & np.all(lo[i] <= hi + eps, axis=1))
+            for j in near[near > i]:
+                if find(i) != find(j) and _footprints_overlap(sectors[i]["tris"], sectors[j]["tris"]):
+                    parent[find(i)] = find(j)
+        for ob in _scene_brushes(scn):
+            if ob.brush_type != 'BRUSH' or ob.csg_operation != 'ADD': continue
+            box = brush_world_aabb(ob)
+            if box is None: continue
+            reached = np.flatnonzero(np.all(lo <= box[1] + eps, axis=1) & np.all(box[0] <= hi + eps, axis=1))
+            for j in reached[1:]: parent[find(j)] = find(reached[0])
+    roots = [find(i) for i in range(len(sectors))]
+    index = {r: k for k, r in enumerate(dict.fromkeys(roots))}
+    return [index[r] for r in roots]
+
+# portal polygons have a handful of corners, so the clipping below works on plain tuples;
+# numpy's per-call overhead would dominate at this size
+
+def _dot(a, b): return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+def _clip_polygon(poly, n, d, eps=1e-6):
+    """Part of the convex polygon poly (corner tuples) with n·x >= d, or None if nothing of it is left."""
+    dist = [_dot(p, n) - d for p in poly]
+    if min(dist) >= -eps: return poly
+    if max(dist) <= eps: return None
+    out = []
+    for k, p in enumerate(poly):
+        q, da, db = poly[k - len(poly) + 1], dist[k], dist[k - len(poly) + 1]
+        if da >= -eps: out.append(p)
+        if (da < -eps and db > eps) or (da > eps and db < -eps):
+            t = da / (da - db)
+            out.append((p[0] + (q[0] - p[0]) * t, p[1] + (q[1] - p[1]) * t, p[2] + (q[2] - p[2]) * t))
+    return out if len(out) >= 3 else None
+
+def _separating_planes(source, target, eps=1e-6):
+    """Planes (n, d) through an edge of source and a corner of target, source behind, target in front.
+
+    A line through source and then target stays in front of every such plane afterwards.
+    """
+    planes = []
+    for k, a in enumerate(source):
+        b = source[k - len(source) + 1]
+        e = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+        for p in target:
+            v = (p[0] - a[0], p[1] - a[1], p[2] - a[2])
+            n = (e[1] * v[2] - e[2] * v[1], e[2] * v[0] - e[0] * v[2], e[0] * v[1] - e[1] * v[0])
+            length = math.sqrt(_dot(n, n))
+            if length <= eps: continue
+            n = (n[0] / length, n[1] / length, n[2] / length)
+            d = _dot(n, a)
+            ds = [_dot(q, n) - d for q in source]
+            if max(ds) > eps:
+                if min(ds) < -eps: continue
+                n, d, ds = (-n[0], -n[1], -n[2]), -d, [-x for x in ds]
+            elif min(ds) >= -eps: continue
+            dt = [_dot(q, n) - d for q in target]
+            if min(dt) >= -eps and max(dt) > eps: planes.append((n, d))
+    return planes
+
+def _portal_flow(portals, out, shows, source, pass_, node, might, stack, seen, budget):
+    """Mark what is visible through source, then pass_, into node; False once the budget is spent.
+
+    shows: (mightsee, rows), what each portal and each group may show; might: what every
+    portal and group of the chain so far may show. A chain that can only reach groups
+    already seen is not followed.
+    """
+    mightsee, rows = shows
+    for k in out[node]:
+        to, quad, n, d = portals[k]
+        if stack >> to & 1 or not might & mightsee[k] & rows[to] & ~seen[0]: continue
+        budget[0] -= 1
+        if budget[0] < 0: return False
+        poly = _clip_polygon(quad, source[1], source[2])
+        if poly is not None and pass_ is not None:
+            poly = _clip_polygon(poly, pass_[1], pass_[2])
+            for sn, sd in _separating_planes(source[0], pass_[0]) if poly is not None else ():
+                poly = _clip_polygon(poly, sn, sd)
+                if poly is None: break
+        if poly is None: continue
+        seen[0] |= 1 << to
+        if not _portal_flow(portals, out, shows, source, (poly, n, d), to, might & mightsee[k] & rows[to],
+                            stack | 1 << to, seen, budget):
+            return False
+    return True
+
+def sector_pvs(portals, groups, budget=PVS_FLOW_BUDGET):
+    """(sectors, sectors) bool matrix, True where the column sector may be visible from the row sector.
+
+    budget caps the portal chains followed per group; past it the group keeps its flood set.
+    """
+    count = max(groups, default=-1) + 1
+    # directed portals between groups: (to, quad, normal, d), in front is n·x > d
+    directed, origin, out = [], [], [[] for _ in range(count)]
+    for i, j, quad, n in portals:
+        gi, gj = groups[i], groups[j]
+        if gi == gj: continue
+        for g, to, sign in ((gi, gj, 1.0), (gj, gi, -1.0)):
+            out[g].append(len(directed)); origin.append(g)
+            directed.append((to, [tuple(p) for p in quad.tolist()], tuple((n * sign).tolist()), float(quad[0] @ n) * sign))
+    # flood through the portals partly in front of each portal, with it partly behind them:
+    # a superset of what the portal shows
+    mightsee = []
+    for to, quad, n, d in directed:
+        seen, queue = 1 << to, [to]
+        while queue:
+            for k in out[queue.pop()]:
+                nxt = directed[k]
+                if not seen >> nxt[0] & 1 and any(_dot(p, n) - d > 1e-6 for p in nxt[1]) \
+                        and any(_dot(p, nxt[2]) - nxt[3] < -1e-6 for p in quad):
+                    seen |= 1 << nxt[0]; queue.append(nxt[0])
+        mightsee.append(seen)
+    # groups that might see little first; a finished group prunes the chains through it, and
+    # sight is mutual, so every group it sees starts out seeing it
+    rows = [1 << g for g in range(count)]
+    for k, g in enumerate(origin): rows[g] |= mightsee[k]
+    seen_by = [0] * count
+    for g in sorted(range(count), key=lambda g: bin(rows[g]).count("1")):
+        seen, left = [1 << g | seen_by[g]], [budget]
+        for k in out[g]:
+            to, quad, n, d = directed[k]
+            seen[0] |= 1 << to
+            if not _portal_flow(directed, out, (mightsee, rows), (quad, n, d), None, to, mightsee[k] & rows[to],
+                                1 << g | 1 << to, seen, left):
+                break
+        else:
+            rows[g] = seen[0]
+            for h in range(count):
+                if seen[0] >> h & 1: seen_by[h] |= 1 << g
+    groups = np.array(groups, dtype=np.int64)
+    group_vis = np.array([[row >> h & 1 for h in range(count)] for row in rows], dtype=bool).reshape(count, count)
+    visible = group_vis[groups[:, None], groups[None, :]]
+    return visible | visible.T
+
+def tag_sector_faces(level_map, sectors, precision, overlap=0.0):
+    """Store the sector each face looks into as the SECTOR_ID_ATTR face attribute (-1: none).
+
+    overlap is the boolean overlap epsilon the operands were scaled by.
+    """
+    me = level_map.data
+    count = len(me.polygons)
+    m = np.array(object_matrix(level_map), dtype=np.float64)
+    centers = _foreach_array(me.polygons, "center", 3, np.float32).reshape(-1, 3) @ m[:3, :3].T + m[:3, 3]
+    normals = _foreach_array(me.polygons, "normal", 3, np.float32).reshape(-1, 3) @ np.linalg.inv(m[:3, :3])
+    normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+    # faces point into the open space; just in front of them is the sector they belong to
+    eps = 10.0 ** -precision
+    p = centers + normals * eps
+    # the overlap scaling and rounding let faces drift out of their prism by up to tol
+    tol = 2.0 * eps + overlap * np.abs(p).max(axis=1)
+    order = np.argsort(p[:, 0]); xs = p[order, 0]
+    reach = float(tol.max(initial=0.0))
+    ids = np.full(count, -1, dtype=np.int32)
+    exact = np.zeros(count, dtype=bool)
+    for i, sec in enumerate(sectors):
+        near = order[np.searchsorted(xs, sec["lo"][0] - reach):np.searchsorted(xs, sec["hi"][0] + reach, side='right')]
+        t = tol[near, None]
+        near = near[np.all(p[near] >= sec["lo"] - t, axis=1) & np.all(p[near] <= sec["hi"] + t, axis=1)]
+        if not len(near): continue
+        q, t = p[near, None, :2], tol[near, None]
+        a, b, c = (sec["tris"][:, k] for k in range(3))
+        def side(u, v):
+            e = v - u
+            return (e[:, 0] * (q[..., 1] - u[:, 1]) - e[:, 1] * (q[..., 0] - u[:, 0])) / np.maximum(np.linalg.norm(e, axis=1), 1e-12)
+        s0, s1, s2 = side(a, b), side(b, c), side(c, a)
+        low, high = np.minimum(np.minimum(s0, s1), s2), np.maximum(np.maximum(s0, s1), s2)
+        inside = ((low >= -t) | (high <= t)).any(axis=1)
+        strict = ((low >= -eps * 0.01) | (high <= eps * 0.01)).any(axis=1) & \
+            np.all(p[near] >= sec["lo"] - eps * 0.01, axis=1) & np.all(p[near] <= sec["hi"] + eps * 0.01, axis=1)
+        # later sectors in CSG order win, but a face inside a prism beats one that drifted in
+        take = strict | (inside & ~exact[near])
+        ids[near[take]] = i; exact[near[strict]] = True
+    attr = me.attributes.get(SECTOR_ID_ATTR)
+    if attr is not None and (attr.domain != 'FACE' or attr.data_type != 'INT'):
+        me.attributes.remove(attr); attr = None
+    if attr is None: attr = me.attributes.new(SECTOR_ID_ATTR, 'INT', 'FACE')
+    attr.data.foreach_set("value", ids)
+    return ids
+
+def export_sector_pvs(scn, filepath):
+    """Write the portal graph and PVS as a little-endian binary file; returns (sectors, portals, visible pairs).
+
+    Layout: five uint32 (magic "LBPV", version, sector count S, portal count P, row bytes R),
+    S x 6 float32 sector bounds (min, max), P x (2 uint32 sector IDs, 4 x 3 float32 corners),
+    S rows of R bytes (bit j of row i, lowest bit first: sector j may be visible from i),
+    then S NUL-terminated UTF-8 sector names. Sector IDs match SECTOR_ID_ATTR of LevelGeometry.
+    """
+    sectors = sector_volumes(scn)
+    portals = sector_portals(sectors, 10.0 ** -scn.map_precision)
+    visible = sector_pvs(portals, sector_groups(scn, sectors))
+    rows = np.packbits(visible, axis=1, bitorder='little')
+    records = np.zeros(len(portals), dtype=[("a", "<u4"), ("b", "<u4"), ("quad", "<f4", (4, 3))])
+    for k, (i, j, quad, n) in enumerate(portals): records[k] = (i, j, quad)
+    filepath = os.path.abspath(filepath)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "wb") as f:
+        f.write(np.array([PVS_MAGIC, PVS_VERSION, len(sectors), len(portals), rows.shape[1]], dtype="<u4").tobytes())
+        f.write(np.array([np.concatenate((s["lo"], s["hi"])) for s in sectors], dtype="<f4").tobytes())
+        f.write(records.tobytes())
+        f.write(rows.tobytes())
+        f.write(b"".join(s["ob"].name.encode("utf-8") + b"\0" for s in sectors))
+    return len(sectors), len(portals), int(np.count_nonzero(visible))
+
+# Blender types and scene properties: skipped when the numpy helpers are imported outside Blender (tests/).
+if bpy is not None:
+    # =========================
+    # properties
+    # =========================
+
+    bpy.types.Scene.map_precision = bpy.props.IntProperty(
+        name="Map Precision", default=3, min=0, max=6,
+        description="Rounding level of vertex precision", update=_brush_index_settings_changed
+    )
+    bpy.types.Scene.map_use_auto_smooth = bpy.props.BoolProperty(
+        name="Map Auto Smooth", description="Use auto smooth", default=True,
+    )
+    bpy.types.Scene.map_auto_smooth_angle = bpy.props.FloatProperty(
+        name="Angle", description="Auto smooth angle",
+        default=30, min=0, max=180, step=1, precision=0,
+    )
+    bpy.types.Scene.remove_material = bpy.props.StringProperty(
+        name="Remove Material",
+        description="Faces with this material will be removed on build (add more with the + button)"
+    )
+    bpy.types.Scene.color_attribute_name = bpy.props.StringProperty(
+        name="Color Attribute Name",
+        description="Per-corner color attribute to use",
+        default=PREFERRED_COLOR_ATTR_NAME
+    )
+
+    # Boolean Overlap control (default ON with 0.002)
+    bpy.types.Scene.use_boolean_overlap = bpy.props.BoolProperty(
+        name="Use Boolean Overlap", default=True, update=_brush_index_settings_changed,
+        description="If enabled, operands are slightly expanded to ensure overlap for booleans"
+    )
+    bpy.types.Scene.boolean_overlap_epsilon = bpy.props.FloatProperty(
+        name="Overlap Epsilon",
+        description="Tiny uniform scale on boolean operands before operations. Set 0 to disable.",
+        default=0.002, min=0.0, max=0.01, precision=5, step=0.0001, update=_brush_index_settings_changed
+    )
+    bpy.types.Scene.use_boolean_broadphase = bpy.props.BoolProperty(
+        name="Bounding-Box Broadphase", default=True,
+        description="Skip subtractions that cannot touch the map and join disjoint unions instead of running the exact boolean"
+    )
+
+    # Post-build snap control (default ON, 0.01 world grid)
+    bpy.types.Scene.post_build_snap_enable = bpy.props.BoolProperty(
+        name="Post-Build Snap", default=True,
+        description="Snap final LevelGeometry to a world grid after booleans"
+    )
+    bpy.types.Scene.post_build_snap_step = bpy.props.FloatProperty(
+        name="Snap Step",
+        description="World grid step for post-build snap",
+        default=0.01, min=0.0001, max=10.0, precision=4
+    )
+
+    bpy.types.Scene.build_strategy = bpy.props.EnumProperty(
+        items=[("SEQUENTIAL", "Sequential", "Apply every brush to the growing map, one at a time"),
+               ("TREE", "Balanced Tree", "Union consecutive brushes of the same operation pairwise, then apply them to the map at once"),
+               ("BATCHED", "Batched", "Join consecutive brushes of the same operation into one operand and apply a single boolean")],
+        name="Build Strategy", description="How brushes of one CSG order are combined", default='SEQUENTIAL'
+    )
+
+    bpy.types.Scene.build_solver = bpy.props.EnumProperty(
+        items=[("EXACT", "Exact", "Use the exact boolean solver for every brush"),
+               ("ADAPTIVE", "Adaptive", "Try the fast solver on simple convex brushes, validate the result and fall back to exact; "
+                                        "failed brushes are retried with another overlap epsilon and the outcome is remembered per brush. "
+                                        "Balanced Tree and Batched runs of several brushes always use exact")],
+        name="Solver", description="Boolean solver policy of Build Map", default='EXACT'
+    )
+
+    bpy.types.Scene.build_profile = bpy.props.BoolProperty(
+        name="Profile Builds", default=False,
+        description="Record per-phase and per-brush timings of Build Map for the Build Profile panel and trace export"
+    )
+
+    # Incremental build (checkpoint per csg_order group, resume at first dirty group)
+    bpy.types.Scene.build_incremental = bpy.props.BoolProperty(
+        name="Incremental Build", default=False,
+        description="Keep checkpoint meshes between CSG orders and only rebuild from the last checkpoint before the first changed brush"
+    )
+    bpy.types.Scene.build_checkpoint_count = bpy.props.IntProperty(
+        name="Checkpoints", default=8, min=1, max=256,
+        description="Most CSG orders that keep a checkpoint, spread evenly with the last order always kept. "
+                    "Every checkpoint is a full copy of LevelGeometry saved in the .blend, so the file grows by up to "
+                    "this many map copies; fewer checkpoints rebuild more orders after an edit"
+    )
+
+    bpy.types.Scene.build_regions = bpy.props.IntProperty(
+        name="Parallel Regions", default=0, min=0, max=256,
+        description="Split the map into this many regions and build them in background Blender processes, at most one per CPU at a time (0 or 1: build here)"
+    )
+
+    bpy.types.Scene.build_flat_sectors = bpy.props.BoolProperty(
+        name="Flat Sector Build", default=False,
+        description="Build the leading sector-only CSG orders from their 2D footprint arrangement instead of booleans (tilted, sloped or painted sectors use booleans). Much faster, but LevelGeometry comes out triangulated"
+    )
+    bpy.types.Scene.build_sector_ids = bpy.props.BoolProperty(
+        name="Tag Sector IDs", default=True,
+        description="Store the sector each LevelGeometry face looks into as an integer face attribute (sector_id, -1: none), matching the IDs of the PVS export"
+    )
+
+    # Live preview (FAST solver, neighbourhood rebuilds)
+    bpy.types.Scene.live_preview = bpy.props.BoolProperty(
+        name="Live Preview", default=False, update=_update_live_preview,
+        description="Rebuild the edited part of the map into a separate preview object with the fast solver while brushes change"
+    )
+    bpy.types.Scene.live_preview_delay = bpy.props.FloatProperty(
+        name="Preview Delay", default=0.3, min=0.0, max=5.0, precision=2, subtype='TIME',
+        description="Seconds without further edits before the preview is rebuilt"
+    )
+    bpy.types.Scene.live_preview_tile_size = bpy.props.FloatProperty(
+        name="Preview Tile Size", default=16.0, min=1.0, subtype='DISTANCE',
+        description="Edge length of the preview tiles; an edit rebuilds the tiles its brushes touch"
+    )
+    bpy.types.Scene.ao_samples = bpy.props.IntProperty(
+        name="AO Samples", default=16, min=1, max=256, description="Hemisphere rays per vertex position"
+    )
+    bpy.types.Scene.ao_distance = bpy.props.FloatProperty(
+        name="AO Distance", default=2.0, min=0.01, subtype='DISTANCE', description="Length of the occlusion rays"
+    )
+
+    # Persistent build cache (content-addressed order-group results on disk)
+    bpy.types.Scene.build_cache_enable = bpy.props.BoolProperty(
+        name="Build Cache", default=False,
+        description="Store the map after every CSG order on disk and reuse it in later sessions or on other machines"
+    )
+    bpy.types.Scene.build_cache_dir = bpy.props.StringProperty(
+        name="Cache Directory", default="//levelbuddy_cache", subtype='DIR_PATH',
+        description="Directory of the build cache ('//' is relative to the .blend file)"
+    )
+    bpy.types.Scene.build_cache_size_mb = bpy.props.IntProperty(
+        name="Cache Size (MB)", default=512, min=1,
+        description="Least recently used cache entries are deleted beyond this size"
+    )
+
+    # UV/Height etc.
+    bpy.types.Object.ceiling_texture_scale_offset = bpy.props.FloatVectorProperty(
+        name="Ceiling Texture Scale Offset", default=(1, 1, 0, 0),
+        min=0, step=10, precision=3, size=4
+    )
+    bpy.types.Object.wall_texture_scale_offset = bpy.props.FloatVectorProperty(
+        name="Wall Texture Scale Offset", default=(1, 1, 0, 0),
+        min=0, step=10, precision=3, size=4
+    )
+    bpy.types.Object.floor_texture_scale_offset = bpy.props.FloatVectorProperty(
+        name="Floor Texture Scale Offset", default=(1, 1, 0, 0),
+        min=0, step=10, precision=3, size=4
+    )
+    bpy.types.Object.ceiling_texture_rotation = bpy.props.FloatProperty(
+        name="Ceiling Texture Rotation", default=0, min=0, step=10, precision=3,
+    )
+    bpy.types.Object.wall_texture_rotation = bpy.props.FloatProperty(
+        name="Wall Texture Rotation", default=0, min=0, step=10, precision=3,
+    )
+    bpy.types.Object.floor_texture_rotation = bpy.props.FloatProperty(
+        name="Floor Texture Rotation", default=0, min=0, step=10, precision=3,
+    )
+    bpy.types.Object.ceiling_height = bpy.props.FloatProperty(
+        name="Ceiling Height", default=4, step=10, precision=3, update=_update_sector_solidify
+    )
+    bpy.types.Object.floor_height = bpy.props.FloatProperty(
+        name="Floor Height", default=0, step=10, precision=3, update=_update_sector_solidify
+    )
+    bpy.types.Object.floor_texture = bpy.props.StringProperty(name="Floor Texture", update=_brush_index_changed)
+    bpy.types.Object.wall_texture = bpy.props.StringProperty(name="Wall Texture", update=_brush_index_changed)
+    bpy.types.Object.ceiling_texture = bpy.props.StringProperty(name="Ceiling Texture", update=_brush_index_changed)
+
+    bpy.types.Object.brush_type = bpy.props.EnumProperty(
+        items=[("BRUSH", "Brush", "is a brush"),
+               ("SECTOR", "Sector", "is a sector"),
+               ("NONE", "None", "none")],
+        name="Brush Type", description="the brush type", default='NONE', update=_brush_index_changed
+    )
+
+    # UI labels swapped, behavior unchanged:
+    # ADD (UNION) is shown as "Subtract", SUBTRACT (DIFFERENCE) is shown as "Add".
+    bpy.types.Object.csg_operation = bpy.props.EnumProperty(
+        items=[
+            ("ADD", "Subtract", "Boolean UNION (label swapped)"),
+            ("SUBTRACT", "Add", "Boolean DIFFERENCE (label swapped)")
+        ],
+        name="CSG Op",
+        description="Boolean operation (labels swapped by request)",
+        default='ADD', update=_brush_index_changed
+    )
+
+    # mapping restored to original behavior
+    csg_operation_to_blender_boolean = {"ADD": "UNION", "SUBTRACT": "DIFFERENCE"}
+
+    bpy.types.Object.csg_order = bpy.props.IntProperty(
+        name="CSG Order", default=0, description="Controls the order of CSG operation of the object",
+        update=_brush_index_changed
+    )
+    bpy.types.Object.brush_auto_texture = bpy.props.BoolProperty(
+        name="Brush Auto Texture", default=True, description="Auto Texture on or off", update=_brush_index_changed
+    )
+    bpy.types.Object.brush_material = bpy.props.StringProperty(
+        name="Brush Material", description="Material used by Brush objects (copied into the built geometry)",
+        update=_brush_index_changed
+    )
+    bpy.types.Object.color_mode = bpy.props.EnumProperty(
+        name="Color", default='LAYER',
+        items=[('LAYER', "Color Attribute", "Use the brush's own color attribute"),
+               ('PARTS', "Floor / Wall / Ceiling", "One colour per face class, applied during the build"),
+               ('GRADIENT', "Height Gradient", "Blend two colours over world height, applied during the build")],
+        update=_brush_index_changed,
+    )
+    bpy.types.Object.color_wall = bpy.props.FloatVectorProperty(name="Wall", subtype='COLOR', size=4, default=(1.0, 1.0, 1.0, 1.0), min=0.0, max=1.0, update=_brush_index_changed)
+    bpy.types.Object.color_ceiling = bpy.props.FloatVectorProperty(name="Ceiling", subtype='COLOR', size=4, default=(1.0, 1.0, 1.0, 1.0), min=0.0, max=1.0, update=_brush_index_changed)
+    bpy.types.Object.color_floor = bpy.props.FloatVectorProperty(name="Floor", subtype='COLOR', size=4, default=(1.0, 1.0, 1.0, 1.0), min=0.0, max=1.0, update=_brush_index_changed)
+    bpy.types.Object.color_bottom = bpy.props.FloatVectorProperty(name="Bottom", subtype='COLOR', size=4, default=(0.0, 0.0, 0.0, 1.0), min=0.0, max=1.0, update=_brush_index_changed)
+    bpy.types.Object.color_top = bpy.props.FloatVectorProperty(name="Top", subtype='COLOR', size=4, default=(1.0, 1.0, 1.0, 1.0), min=0.0, max=1.0, update=_brush_index_changed)
+    bpy.types.Object.color_height_range = bpy.props.FloatVectorProperty(
+        name="Height Range", size=2, default=(0.0, 4.0), subtype='NONE', description="World heights of the bottom and top colour",
+        update=_brush_index_changed,
+    )
+
+    # Color Attribute UI
+    bpy.types.Scene.color_picker = bpy.props.FloatVectorProperty(
+        name="Active", subtype='COLOR', default=(1.0, 1.0, 1.0), min=0.0, max=1.0
+    )
+
+    # =========================
+    # UI helpers
+    # =========================
+
+    def draw_uv_box(parent, obj, prop_name, label, rot_prop_name, rot_label="Rotation"):
+        box = parent.box(); col = box.column(align=True)
+        col.label(text=label)
+        row = col.row(align=True); row.label(text="Scale")
+        sub = row.row(align=True); sub.prop(obj, prop_name, index=0, text="U"); sub.prop(obj, prop_name, index=1, text="V")
+        row2 = col.row(align=True); row2.label(text="Shift")
+        sub2 = row2.row(align=True); sub2.prop(obj, prop_name, index=2, text="U"); sub2.prop(obj, prop_name, index=3, text="V")
+        row3 = col.row(align=True); row3.label(text=rot_label); row3.prop(obj, rot_prop_name, text="°")
+
+    # =========================
+    # UI Panels
+    # =========================
+
+    class LevelBuddyPanel(bpy.types.Panel):
+        bl_label = "Level Buddy"
+        bl_space_type = "VIEW_3D"
+        bl_region_type = 'UI'
+        bl_category = 'Level Buddy'
+        def draw(self, context):
+            ob = context.active_object
+            scn = bpy.context.scene
+            layout = self.layout
+            mode = context.mode
+
+            col = layout.column(align=True)
+            col.label(icon="WORLD", text="Map Settings")
+            col.prop(scn, "map_precision")
+            row = col.row(align=True)
+            row.prop(scn, "map_use_auto_smooth", text="Auto Smooth")
+            row.prop(scn, "map_auto_smooth_angle", text="Angle")
+            row = col.row(align=True)
+            row.prop_search(scn, "remove_material", bpy.data, "materials")
+            row.operator("scene.level_buddy_remove_material_list", text="", icon="ADD").action = 'ADD'
+            for i, item in enumerate(scn.remove_materials):
+                row = col.row(align=True)
+                row.prop(item, "material", text="")
+                op = row.operator("scene.level_buddy_remove_material_list", text="", icon="X")
+                op.action, op.index = 'REMOVE', i
+            col.separator()
+            col.prop(scn, "color_attribute_name")
+
+            box = layout.box()
+            box.label(text="Boolean Stability")
+            rowb = box.row(align=True)
+            rowb.prop(scn, "use_boolean_overlap", text="Use Boolean Overlap")
+            rowb.prop(scn, "boolean_overlap_epsilon", text="Epsilon")
+            box.prop(scn, "use_boolean_broadphase", text="Bounding-Box Broadphase")
+
+            box2 = layout.box()
+            box2.label(text="Post-Build Snap")
+            rowp = box2.row(align=True)
+            rowp.prop(scn, "post_build_snap_enable", text="Enable")
+            rowp.prop(scn, "post_build_snap_step", text="Step")
+
+            box3 = layout.box()
+            box3.prop(scn, "build_strategy", text="Strategy")
+            box3.prop(scn, "build_solver", text="Solver")
+            if scn.build_solver == 'ADAPTIVE' and scn.build_strategy != 'SEQUENTIAL':
+                box3.label(text="Adaptive covers single-brush runs only", icon="INFO")
+            box3.prop(scn, "build_regions")
+            box3.prop(scn, "build_flat_sectors")
+            box3.prop(scn, "build_sector_ids")
+            box3.label(text="Incremental Build")
+            box3.prop(scn, "build_incremental", text="Reuse Unchanged Orders")
+            if scn.build_incremental:
+                box3.prop(scn, "build_checkpoint_count")
+            box3.prop(scn, "build_cache_enable", text="Cache on Disk")
+            if scn.build_cache_enable:
+                box3.prop(scn, "build_cache_dir", text="")
+                box3.prop(scn, "build_cache_size_mb", text="Max MB")
+
+            box4 = layout.box()
+            rowl = box4.row(align=True)
+            rowl.prop(scn, "live_preview", text="Live Preview")
+            rowl.prop(scn, "live_preview_delay", text="Delay")
+            box4.prop(scn, "live_preview_tile_size", text="Tile Size")
+            last = _preview_state["last"]
+            if scn.live_preview and last is not None:
+                box4.label(text=f"Last update: {last[0]} tiles, {last[1]:.2f}s")
+
+            col = layout.column(align=True)
+            col.operator("scene.level_buddy_build_map", text="Build Map", icon="MOD_BUILD").bool_op = "UNION"
+            if scn.build_incremental:
+                col.operator("scene.level_buddy_build_map", text="Full Rebuild", icon="FILE_REFRESH").full_rebuild = True
+            col.operator("scene.level_buddy_export_chunks", icon="EXPORT")
+            col.operator("scene.level_buddy_export_collision", icon="MOD_PHYSICS")
+            col.operator("scene.level_buddy_export_pvs", icon="HIDE_OFF")
+
+            if mode == 'OBJECT':
+                col = layout.column(align=True)
+                col.label(icon="SNAP_PEEL_OBJECT", text="Tools")
+                row = col.row(align=True)
+                op1 = row.operator("scene.level_buddy_new_geometry", text="New Sector", icon="MESH_PLANE"); op1.brush_type = 'SECTOR'
+                op2 = row.operator("scene.level_buddy_new_geometry", text="New Brush", icon="CUBE"); op2.brush_type = 'BRUSH'
+
+            if ob is not None and len(bpy.context.selected_objects) > 0:
+                col = layout.column(align=True)
+                col.label(icon="MOD_ARRAY", text="Brush Properties")
+                typ = getattr(ob, "brush_type", "NONE")
+                col.label(text=f"Type: {typ.title() if isinstance(typ, str) else str(typ)}")
+                col.prop(ob, "csg_operation", text="CSG Op")
+                col.prop(ob, "csg_order", text="CSG Order")
+                col.prop(ob, "brush_auto_texture", text="Auto Texture")
+
+                if ob.brush_auto_texture:
+                    draw_uv_box(col, ob, "ceiling_texture_scale_offset", "Ceiling UV", "ceiling_texture_rotation")
+                    draw_uv_box(col, ob, "wall_texture_scale_offset", "Wall UV", "wall_texture_rotation")
+                    draw_uv_box(col, ob, "floor_texture_scale_offset", "Floor UV", "floor_texture_rotation")
+
+                if getattr(ob, "brush_type", 'NONE') == 'SECTOR':
+                    sec = layout.column(align=True)
+                    sec.label(icon="MOD_SOLIDIFY", text="Sector Properties")
+                    sec.prop(ob, "ceiling_height"); sec.prop(ob, "floor_height")
+                    mat = layout.column(align=True)
+                    mat.label(icon="MATERIAL", text="Sector Materials")
+                    mat.prop_search(ob, "ceiling_texture", bpy.data, "materials", icon="MATERIAL", text="Ceiling")
+                    mat.prop_search(ob, "wall_texture", bpy.data, "materials", icon="MATERIAL", text="Wall")
+                    mat.prop_search(ob, "floor_texture", bpy.data, "materials", icon="MATERIAL", text="Floor")
+
+                if getattr(ob, "brush_type", 'NONE') == 'BRUSH':
+                    br = layout.column(align=True)
+                    br.label(icon="MATERIAL", text="Brush Material")
+                    br.prop_search(ob, "brush_material", bpy.data, "materials", icon="MATERIAL", text="Material")
+
+    class LevelBuddyProfilePanel(bpy.types.Panel):
+        bl_idname = "VIEW3D_PT_level_buddy_profile"
+        bl_label = "Build Profile"
+        bl_space_type = "VIEW_3D"
+        bl_region_type = "UI"
+        bl_category = "Level Buddy"
+        bl_options = {'DEFAULT_CLOSED'}
+        def draw(self, context):
+            layout = self.layout
+            layout.prop(context.scene, "build_profile")
+            profile = last_build_profile
+            if profile is None:
+                layout.label(text="Build with profiling on to see timings", icon="INFO"); return
+            col = layout.column(align=True)
+            col.label(text=f"Last build: {profile['total']:.2f}s", icon="TIME")
+            for phase, seconds in sorted(profile["phases"].items(), key=lambda p: -p[1])[:5]:
+                row = col.row(); row.label(text=phase); row.label(text=f"{seconds:.3f}s")
+            box = layout.box()
+            box.label(text="Slowest Brushes")
+            for entry in slowest_brushes(profile, 10):
+                row = box.row(align=True)
+                label = entry["name"] if len(entry["brushes"]) == 1 else f"{entry['name']} +{len(entry['brushes']) - 1}"
+                row.operator("scene.level_buddy_select_brushes", text=label, icon="RESTRICT_SELECT_OFF").names = "\n".join(entry["brushes"])
+                solver = entry.get("solver", 'EXACT')
+                row.label(text=f"{entry['seconds']:.3f}s  {entry['verts_before']}>{entry['verts']}v" + (" fast" if solver == 'FAST' else ""))
+            layout.operator("scene.level_buddy_export_profile", icon="EXPORT")
+
+    class VertexColorPanel(bpy.types.Panel):
+        bl_idname = "OBJECT_PT_vertex_color_panel"
+        bl_label = "Color Attribute"
+        bl_space_type = "VIEW_3D"
+        bl_region_type = "UI"
+        bl_category = "Level Buddy"
+        def draw(self, context):
+            layout = self.layout
+            scn = bpy.context.scene
+            row = layout.row(align=True)
+            row.prop(scn, "color_picker", text="")
+            row.operator("object.set_vertex_color", text="Set Color")
+            col = layout.column(align=True)
+            col.operator("object.level_buddy_batch_color", text="Fill Selected").color = (*scn.color_picker, 1.0)
+            row = col.row(align=True)
+            row.operator("object.level_buddy_batch_color", text="Floor / Wall / Ceiling").mode = 'PARTS'
+            row.operator("object.level_buddy_batch_color", text="Height Gradient").mode = 'GRADIENT'
+            ob = context.active_object
+            if ob is not None and getattr(ob, "brush_type", 'NONE') != 'NONE':
+                col = layout.column(align=True)
+                col.prop(ob, "color_mode", text="")
+                if ob.color_mode == 'PARTS':
+                    col.prop(ob, "color_floor"); col.prop(ob, "color_wall"); col.prop(ob, "color_ceiling")
+                elif ob.color_mode == 'GRADIENT':
+                    col.prop(ob, "color_bottom"); col.prop(ob, "color_top"); col.prop(ob, "color_height_range", text="")
+            box = layout.box()
+            row = box.row(align=True)
+            row.prop(scn, "ao_samples", text="Samples")
+            row.prop(scn, "ao_distance", text="Distance")
+            box.operator("scene.level_buddy_bake_ao", icon="SHADING_RENDERED")
+
+    # =========================
+    # SNAP TO GRID (world-space) — Edit mode tools
+    # =========================
+
+    # Continuous snap state: only the active edit object is tracked, as compact arrays.
+    # "index" are positions in bm.verts of the selected verts, "co" their last seen local coords.
+    _snap_state = {"key": None, "count": 0, "index": None, "co": None, "own_write": False}
+
+    def _sgs_validate_context(context):
+        if not context.active_object: return False, "No active object"
+        if context.active_object.type != 'MESH': return False, "Active object is not a mesh"
+        if context.mode != 'EDIT_MESH': return False, "Not in Edit Mode"
+        return True, ""
+
+    def _snap_world_coords(co, mw, gx, gy, gz):
+        """Snap local coords (k, 3) to a world grid per axis (step <= 0 leaves an axis alone)."""
+        m = np.array(mw, dtype=np.float64)
+        im = np.array(mw.inverted_safe(), dtype=np.float64)
+        wco = co @ m[:3, :3].T + m[:3, 3]
+        for axis, step in enumerate((gx, gy, gz)):
+            if step > 0: wco[:, axis] = np.round(wco[:, axis] / step) * step
+        return wco @ im[:3, :3].T + im[:3, 3]
+
+    def _bm_coords(verts):
+        return np.fromiter((c for v in verts for c in v.co), dtype=np.float64, count=len(verts) * 3).reshape(-1, 3)
+
+    def _sgs_snap_to_grid(obj, selected_verts, gx, gy, gz):
+        if not selected_verts: return 0
+        co = _bm_coords(selected_verts)
+        new_co = _snap_world_coords(co, obj.matrix_world, gx, gy, gz)
+        moved = np.flatnonzero(np.linalg.norm(new_co - co, axis=1) > 1e-6)
+        for k in moved:
+            selected_verts[k].co = new_co[k]
+        return len(moved)
+
+    def _reset_continuous_snap():
+        _snap_state.update(key=None, count=0, index=None, co=None, own_write=False)
+        if bpy.app.timers.is_registered(_continuous_snap_timer):
+            bpy.app.timers.unregister(_continuous_snap_timer)
+
+    def _continuous_snap_target(scene):
+        if bpy.context.mode != 'EDIT_MESH' or not scene.continuous_snap: return None
+        obj = bpy.context.active_object
+        if not obj or obj.type != 'MESH': return None
+        return obj
+
+    def _tracked_selection(obj, bm):
+        """Selected verts of bm; reuses the tracked index array when the selection is unchanged (O(selected))."""
+        verts = bm.verts
+        verts.ensure_lookup_table()
+        idx = _snap_state["index"]
+        if idx is not None and _snap_state["count"] == len(verts) and len(idx) == obj.data.total_vert_sel:
+            sel = [verts[i] for i in idx]
+            # same count and every tracked vert still selected means the same selection
+            if all(v.select for v in sel):
+                return idx, sel, False
+        idx = np.array([i for i, v in enumerate(verts) if v.select], dtype=np.int32)
+        return idx, [verts[i] for i in idx], True
+
+    def _snap_tracked_selection(scene, obj):
+        bm = bmesh.from_edit_mesh(obj.data)
+        idx, sel, _ = _tracked_selection(obj, bm)
+        snapped = _sgs_snap_to_grid(obj, sel, scene.grid_size_x, scene.grid_size_y, scene.grid_size_z)
+        _snap_state.update(count=len(bm.verts), index=idx, co=_bm_coords(sel))
+        if snapped:
+            _snap_state["own_write"] = True
+            bmesh.update_edit_mesh(obj.data)
+        return snapped
+
+    def _continuous_snap_timer():
+        scene = bpy.context.scene
+        obj = _continuous_snap_target(scene)
+        if obj is not None and _snap_state["key"] == (obj.name, obj.data.name):
+            _snap_tracked_selection(scene, obj)
+        return None
+
+    def continuous_snap_handler(scene, depsgraph=None):
+        state = _snap_state
+        if state["own_write"]:
+            # depsgraph update caused by our own snap write
+            state["own_write"] = False; return
+        obj = _continuous_snap_target(scene)
+        key = (obj.name, obj.data.name) if obj else None
+        if key != state["key"]:
+            _reset_continuous_snap(); state["key"] = key
+        if obj is None: return
+        if obj.data.total_vert_sel == 0:
+            state.update(index=None, co=None); return
+        bm = bmesh.from_edit_mesh(obj.data)
+        idx, sel, reselected = _tracked_selection(obj, bm)
+        co = _bm_coords(sel)
+        prev = state["co"]
+        state.update(count=len(bm.verts), index=idx, co=co)
+        if reselected or prev is None or not np.any(np.linalg.norm(co - prev, axis=1) > 0.0001):
+            return
+        delay = scene.continuous_snap_delay
+        if delay <= 0.0:
+            _snap_tracked_selection(scene, obj); return
+        # debounce: restart the timer on every move, snap once the burst settles
+        if bpy.app.timers.is_registered(_continuous_snap_timer):
+            bpy.app.timers.unregister(_continuous_snap_timer)
+        bpy.app.timers.register(_continuous_snap_timer, first_interval=delay)
+
+    class ERF_SnapToGridPanel(bpy.types.Panel):
+        bl_label = "Snap to Grid"
+        bl_idname = "VIEW3D_PT_erf_snap_to_grid"
+        bl_space_type = 'VIEW_3D'
+        bl_region_type = 'UI'
+        bl_category = 'Level Buddy'
+        bl_context = 'mesh_edit'
+        def draw(self, context):
+            layout = self.layout; scene = context.scene
+            box = layout.box(); box.label(text="Grid Settings:")
+            box.prop(scene, "grid_size_x", text="Grid Size X")
+            box.prop(scene, "grid_size_y", text="Grid Size Y")
+            box.prop(scene, "grid_size_z", text="Grid Size Z")
+            row = box.row(align=True); row.operator("mesh.reset_grid_sizes", text="Reset to Default")
+            layout.separator(); layout.operator("mesh.snap_to_grid", text="Snap Selected to Grid")
+            layout.separator(); box = layout.box(); box.label(text="Continuous Snapping:")
+            row = box.row(align=True); row.operator("mesh.toggle_continuous_snap", text="Toggle Continuous Snap")
+            icon = 'CHECKBOX_HLT' if scene.continuous_snap else 'CHECKBOX_DEHLT'
+            status_text = "ON" if scene.continuous_snap else "OFF"
+            row.label(text=f"Status: {status_text}", icon=icon)
+            box.prop(scene, "continuous_snap_delay", text="Debounce")
+            if scene.continuous_snap: box.label(text="⚠ World-space snapping active", icon='INFO')
+
+    class ERF_SnapToGridOperator(bpy.types.Operator):
+        bl_idname = "mesh.snap_to_grid"
+        bl_label = "Snap to Grid"
+        bl_options = {'REGISTER', 'UNDO'}
+        @classmethod
+        def poll(cls, context): ok, _ = _sgs_validate_context(context); return ok
+        def execute(self, context):
+            try:
+                ok, msg = _sgs_validate_context(context)
+                if not ok: self.report({'ERROR'}, msg); return {'CANCELLED'}
+                obj = context.active_object; bm = bmesh.from_edit_mesh(obj.data)
+                sel = [v for v in bm.verts if v.select]
+                if not sel:
+                    self.report({'INFO'}, "No vertices selected. Please select vertices in Edit Mode.")
+                    return {'CANCELLED'}
+                snapped_count = _sgs_snap_to_grid(
+                    obj, sel, context.scene.grid_size_x, context.scene.grid_size_y, context.scene.grid_size_z
+                )
+                bmesh.update_edit_mesh(obj.data)
+                self.report({'INFO'}, f"Snapped {snapped_count}/{len(sel)} vertices to world grid." if snapped_count>0 else "No vertices needed snapping (already on grid).")
+                return {'FINISHED'}
+            except Exception as e:
+                self.report({'ERROR'}, f"Error during grid snapping: {str(e)}"); return {'CANCELLED'}
+
+    class ERF_ToggleContinuousSnapOperator(bpy.types.Operator):
+        bl_idname = "mesh.toggle_continuous_snap"
+        bl_label = "Toggle Continuous Snap"
+        bl_options = {'REGISTER', 'UNDO'}
+        @classmethod
+        def poll(cls, context): ok, _ = _sgs_validate_context(context); return ok
+        def execute(self, context):
+            try:
+                context.scene.continuous_snap = not context.scene.continuous_snap
+                if context.scene.continuous_snap:
+                    if continuous_snap_handler not in bpy.app.handlers.depsgraph_update_post:
+                        bpy.app.handlers.depsgraph_update_post.append(continuous_snap_handler)
+                    self.report({'INFO'}, "Continuous snapping ON (world-space).")
+                else:
+                    if continuous_snap_handler in bpy.app.handlers.depsgraph_update_post:
+                        bpy.app.handlers.depsgraph_update_post.remove(continuous_snap_handler)
+                    _reset_continuous_snap()
+                    self.report({'INFO'}, "Continuous snapping OFF.")
+                return {'FINISHED'}
+            except Exception as e:
+                self.report({'ERROR'}, f"Error toggling continuous snap: {str(e)}"); return {'CANCELLED'}
+
+    class ERF_ResetGridSizesOperator(bpy.types.Operator):
+        bl_idname = "mesh.reset_grid_sizes"
+        bl_label = "Reset Grid Sizes"
+        bl_description = "Reset all grid sizes to default values"
+        bl_options = {'REGISTER', 'UNDO'}
+        def execute(self, context):
+            context.scene.grid_size_x = 1.0; context.scene.grid_size_y = 1.0; context.scene.grid_size_z = 1.0
+            self.report({'INFO'}, "Grid sizes reset to default (1.0)"); return {'FINISHED'}
+
+    # =========================
+    # operators (rest)
+    # =========================
+
+    class LevelBuddyNewGeometry(bpy.types.Operator):
+        bl_idname = "scene.level_buddy_new_geometry"
+        bl_label = "Level New Geometry"
+        brush_type: bpy.props.StringProperty(name="brush_type", default='NONE')
+        @classmethod
+        def poll(cls, context): return context.mode == 'OBJECT'
+        def execute(self, context):
+            bpy.ops.object.select_all(action='DESELECT')
+            if self.brush_type == 'SECTOR': bpy.ops.mesh.primitive_plane_add(size=2)
+            else: bpy.ops.mesh.primitive_cube_add(size=2)
+            ob = bpy.context.active_object
+            bpy.context.view_layer.objects.active = ob
+            setup_new_brush(ob, self.brush_type)
+            return {"FINISHED"}
+
+    class LevelBuddyBuildMap(bpy.types.Operator):
+        bl_idname = "scene.level_buddy_build_map"
+        bl_label = "Build Map"
+        bool_op: bpy.props.StringProperty(name="bool_op", default="UNION")
+        full_rebuild: bpy.props.BoolProperty(name="full_rebuild", default=False, options={'SKIP_SAVE'})
+        def execute(self, context):
+            # flush pending edit-mode changes without leaving edit mode
+            for ob in getattr(context, "objects_in_mode", []) or []:
+                ob.update_from_editmode()
+            global last_build_profile
+            profile = new_build_profile() if context.scene.build_profile else None
+            build_level_geometry(reporter=self, full_rebuild=self.full_rebuild, profile=profile)
+            if profile is not None:
+                last_build_profile = profile
+                slowest = slowest_brushes(profile, 1)
+                if slowest:
+                    self.report({'INFO'}, f"Slowest brush: {slowest[0]['name']} ({slowest[0]['seconds']:.3f}s)")
+            return {"FINISHED"}
+
+    class LevelBuddySelectBrushes(bpy.types.Operator):
+        bl_idname = "scene.level_buddy_select_brushes"
+        bl_label = "Select Brushes"
+        bl_description = "Select these brushes"
+        bl_options = {'REGISTER', 'UNDO'}
+        names: bpy.props.StringProperty(name="names", description="Brush names, one per line")
+        @classmethod
+        def poll(cls, context): return context.mode == 'OBJECT'
+        def execute(self, context):
+            obs = [bpy.data.objects.get(n) for n in self.names.split("\n")]
+            obs = [ob for ob in obs if ob is not None and ob.name in context.view_layer.objects]
+            if not obs:
+                self.report({'WARNING'}, "Brushes no longer exist (build again)"); return {'CANCELLED'}
+            for ob in context.selected_objects: ob.select_set(False)
+            for ob in obs: ob.select_set(True)
+            context.view_layer.objects.active = obs[0]
+            return {'FINISHED'}
+
+    class LevelBuddyExportProfile(bpy.types.Operator, ExportHelper):
+        bl_idname = "scene.level_buddy_export_profile"
+        bl_label = "Export Build Trace"
+        bl_description = "Write the last profiled build as Chrome trace JSON"
+        filename_ext = ".json"
+        filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+        @classmethod
+        def poll(cls, context): return last_build_profile is not None
+        def execute(self, context):
+            write_chrome_trace(last_build_profile, self.filepath)
+            self.report({'INFO'}, f"Build trace written to {self.filepath}")
+            return {'FINISHED'}
+
+    class LevelBuddyExportChunks(bpy.types.Operator, ExportHelper):
+        bl_idname = "scene.level_buddy_export_chunks"
+        bl_label = "Export Chunks"
+        bl_description = "Write LevelGeometry as a glTF binary of spatial chunks with per-material submeshes and a bounds manifest"
+        filename_ext = ".glb"
+        filter_glob: bpy.props.StringProperty(default="*.glb", options={'HIDDEN'})
+        chunk_size: bpy.props.FloatProperty(name="Chunk Size", default=32.0, min=0.1, subtype='DISTANCE')
+        @classmethod
+        def poll(cls, context): return bpy.data.objects.get("LevelGeometry") is not None
+        def execute(self, context):
+            manifest = export_chunked_glb(bpy.data.objects["LevelGeometry"], self.filepath, self.chunk_size)
+            self.report({'INFO'}, f"Exported {len(manifest['chunks'])} chunks to {self.filepath}")
+            return {'FINISHED'}
+
+    class LevelBuddyExportCollision(bpy.types.Operator, ExportHelper):
+        bl_idname = "scene.level_buddy_export_collision"
+        bl_label = "Export Collision"
+        bl_description = "Write convex collision hulls straight from the brushes, without building the map"
+        filename_ext = ".json"
+        filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+        thickness: bpy.props.FloatProperty(name="Wall Thickness", default=1.0, min=0.01, subtype='DISTANCE',
+                                           description="Solid kept around the open space of the map")
+        def execute(self, context):
+            start = time.perf_counter()
+            count = export_collision_hulls(context.scene, self.filepath, self.thickness)
+            self.report({'INFO'}, f"Exported {count} collision hulls to {self.filepath} in {time.perf_counter() - start:.2f}s")
+            return {'FINISHED'}
+
+    class LevelBuddyExportPVS(bpy.types.Operator, ExportHelper):
+        bl_idname = "scene.level_buddy_export_pvs"
+        bl_label = "Export Sector PVS"
+        bl_description = "Write the sector portal graph and a conservative potentially visible set per sector as a bitset file"
+        filename_ext = ".pvs"
+        filter_glob: bpy.props.StringProperty(default="*.pvs", options={'HIDDEN'})
+        def execute(self, context):
+            start = time.perf_counter()
+            sectors, portals, pairs = export_sector_pvs(context.scene, self.filepath)
+            self.report({'INFO'}, f"Exported PVS of {sectors} sectors ({portals} portals, {pairs} visible pairs) "
+                                  f"to {self.filepath} in {time.perf_counter() - start:.2f}s")
+            return {'FINISHED'}
+
+    class LevelBuddyRemoveMaterial(bpy.types.PropertyGroup):
+        material: bpy.props.PointerProperty(name="Material", type=bpy.types.Material)
+
+    class LevelBuddyRemoveMaterialList(bpy.types.Operator):
+        bl_idname = "scene.level_buddy_remove_material_list"
+        bl_label = "Removed Materials"
+        bl_description = "Add or remove a material whose faces are removed on build"
+        bl_options = {'REGISTER', 'UNDO'}
+        action: bpy.props.EnumProperty(items=[('ADD', "Add", ""), ('REMOVE', "Remove", "")])
+        index: bpy.props.IntProperty(default=-1)
+        def execute(self, context):
+            items = context.scene.remove_materials
+            if self.action == 'ADD':
+                items.add()
+            elif 0 <= self.index < len(items):
+                items.remove(self.index)
+            return {'FINISHED'}
+
+    class SetVertexColorOperator(bpy.types.Operator):
+        bl_idname = "object.set_vertex_color"
+        bl_label = "Set Vertex Color"
+        def execute(self, context):
+            obj = context.active_object
+            if obj is None or obj.type != 'MESH': return {'CANCELLED'}
+            color = bpy.context.scene.color_picker
+            ensure_color_layer(obj.data); fill_color_layer_object_mode(obj, (color[0], color[1], color[2], 1.0))
+            return {'FINISHED'}
+
+    class LevelBuddyBakeAO(bpy.types.Operator):
+        bl_idname = "scene.level_buddy_bake_ao"
+        bl_label = "Bake AO"
+        bl_description = "Bake vertex ambient occlusion of LevelGeometry into its color attribute; after a rebuild only changed regions are ray-cast again"
+        bl_options = {'REGISTER', 'UNDO'}
+        full: bpy.props.BoolProperty(name="Full Bake", default=False, description="Ray-cast every vertex, ignoring earlier results")
+        @classmethod
+        def poll(cls, context): return bpy.data.objects.get("LevelGeometry") is not None
+        def execute(self, context):
+            scn = context.scene
+            start = time.perf_counter()
+            points, cast = bake_vertex_ao(bpy.data.objects["LevelGeometry"], scn.ao_samples, scn.ao_distance, not self.full)
+            self.report({'INFO'}, f"AO: {cast} of {points} points ray-cast in {time.perf_counter() - start:.2f}s")
+            return {'FINISHED'}
+
+    class LevelBuddyBatchColor(bpy.types.Operator):
+        bl_idname = "object.level_buddy_batch_color"
+        bl_label = "Color Selected Brushes"
+        bl_description = "Fill the color attribute of all selected brushes, or give them a floor/wall/ceiling or height gradient preset applied during the build"
+        bl_options = {'REGISTER', 'UNDO'}
+        mode: bpy.props.EnumProperty(name="Mode", default='FILL', items=[
+            ('FILL', "Fill", "Fill the color attribute with one colour"),
+            ('PARTS', "Floor / Wall / Ceiling", "One colour per face class"),
+            ('GRADIENT', "Height Gradient", "Blend two colours over world height")])
+        color: bpy.props.FloatVectorProperty(name="Color", subtype='COLOR', size=4, default=(1.0, 1.0, 1.0, 1.0), min=0.0, max=1.0)
+        floor: bpy.props.FloatVectorProperty(name="Floor", subtype='COLOR', size=4, default=(0.5, 0.5, 0.5, 1.0), min=0.0, max=1.0)
+        wall: bpy.props.FloatVectorProperty(name="Wall", subtype='COLOR', size=4, default=(1.0, 1.0, 1.0, 1.0), min=0.0, max=1.0)
+        ceiling: bpy.props.FloatVectorProperty(name="Ceiling", subtype='COLOR', size=4, default=(0.8, 0.8, 0.8, 1.0), min=0.0, max=1.0)
+        bottom: bpy.props.FloatVectorProperty(name="Bottom", subtype='COLOR', size=4, default=(0.0, 0.0, 0.0, 1.0), min=0.0, max=1.0)
+        top: bpy.props.FloatVectorProperty(name="Top", subtype='COLOR', size=4, default=(1.0, 1.0, 1.0, 1.0), min=0.0, max=1.0)
+        extent: bpy.props.EnumProperty(name="Extent", default='SELECTION', items=[
+            ('SELECTION', "Selection", "One gradient over the height of all selected brushes"),
+            ('BRUSH', "Per Brush", "Each brush spans the whole gradient")])
+        @classmethod
+        def poll(cls, context): return context.mode == 'OBJECT'
+        def draw(self, context):
+            layout = self.layout
+            layout.prop(self, "mode")
+            if self.mode == 'FILL':
+                layout.prop(self, "color")
+            elif self.mode == 'PARTS':
+                layout.prop(self, "floor"); layout.prop(self, "wall"); layout.prop(self, "ceiling")
+            else:
+                layout.prop(self, "bottom"); layout.prop(self, "top"); layout.prop(self, "extent")
+        def execute(self, context):
+            brushes = [ob for ob in context.selected_objects if ob.type == 'MESH' and getattr(ob, "brush_type", 'NONE') != 'NONE']
+            if not brushes:
+                self.report({'WARNING'}, "No brushes selected")
+                return {'CANCELLED'}
+            if self.mode == 'FILL':
+                fill_color_layers(brushes, self.color)
+                for ob in brushes: ob.color_mode = 'LAYER'
+            elif self.mode == 'PARTS':
+                for ob in brushes:
+                    ob.color_mode = 'PARTS'; ob.color_floor = self.floor; ob.color_wall = self.wall; ob.color_ceiling = self.ceiling
+            else:
+                ranges = {ob: brush_height_range(ob) for ob in brushes}
+                known = [r for r in ranges.values() if r is not None]
+                shared = (min(r[0] for r in known), max(r[1] for r in known)) if known else (0.0, 0.0)
+                for ob in brushes:
+                    ob.color_mode = 'GRADIENT'; ob.color_bottom = self.bottom; ob.color_top = self.top
+                    ob.color_height_range = shared if self.extent == 'SELECTION' or ranges[ob] is None else ranges[ob]
+            self.report({'INFO'}, f"Colored {len(brushes)} brushes")
+            return {'FINISHED'}
+
+    # =========================
+    # register
+    # =========================
+
+    def _register_grid_props():
+        bpy.types.Scene.grid_size_x = bpy.props.FloatProperty(
+            name="Grid Size X", default=1.0, min=0.01, max=100.0, precision=3,
+            description="Grid snapping size for the X-axis (world space)"
+        )
+        bpy.types.Scene.grid_size_y = bpy.props.FloatProperty(
+            name="Grid Size Y", default=1.0, min=0.01, max=100.0, precision=3,
+            description="Grid snapping size for the Y-axis (world space)"
+        )
+        bpy.types.Scene.grid_size_z = bpy.props.FloatProperty(
+            name="Grid Size Z", default=1.0, min=0.01, max=100.0, precision=3,
+            description="Grid snapping size for the Z-axis (world space)"
+        )
+        bpy.types.Scene.continuous_snap = bpy.props.BoolProperty(
+            name="Continuous Snap", default=False,
+            description="Enable continuous world-space snapping of selected vertices while editing"
+        )
+        bpy.types.Scene.continuous_snap_delay = bpy.props.FloatProperty(
+            name="Snap Delay", default=0.1, min=0.0, max=2.0, precision=2, subtype='TIME',
+            description="Seconds without further edits before continuous snap applies (0 snaps on every update)"
+        )
+
+    CLASSES = (
+        LevelBuddyRemoveMaterial,
+        LevelBuddyRemoveMaterialList,
+        LevelBuddyPanel,
+        LevelBuddyProfilePanel,
+        VertexColorPanel,
+        LevelBuddyBuildMap,
+        LevelBuddySelectBrushes,
+        LevelBuddyExportProfile,
+        LevelBuddyExportChunks,
+        LevelBuddyExportCollision,
+        LevelBuddyExportPVS,
+        LevelBuddyNewGeometry,
+        SetVertexColorOperator,
+        LevelBuddyBakeAO,
+        LevelBuddyBatchColor,
+
+        # Snap to Grid (edit mode)
+        ERF_SnapToGridPanel,
+        ERF_SnapToGridOperator,
+        ERF_ToggleContinuousSnapOperator,
+        ERF_ResetGridSizesOperator,
+    )
+
+def register():
+    for cls in CLASSES:
+        bpy.utils.register_class(cls)
+    _register_grid_props()
+    bpy.types.Scene.remove_materials = bpy.props.CollectionProperty(type=LevelBuddyRemoveMaterial)
+    if brush_index_handler not in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.append(brush_index_handler)
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _reset_brush_index not in handlers: handlers.append(_reset_brush_index)
+    _reset_brush_index()
+    if _live_preview_load_post not in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.append(_live_preview_load_post)
+
+def unregister():
+    if continuous_snap_handler in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(continuous_snap_handler)
+    if live_preview_handler in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(live_preview_handler)
+    if brush_index_handler in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(brush_index_handler)
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _reset_brush_index in handlers: handlers.remove(_reset_brush_index)
+    if _live_preview_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_live_preview_load_post)
+    _reset_live_preview()
+    if hasattr(bpy.types.Scene, "remove_materials"): del bpy.types.Scene.remove_materials
+    for cls in reversed(CLASSES):
+        try: bpy.utils.unregister_class(cls)
+        except Exception: pass
+    _reset_continuous_snap()
+    for attr in ("grid_size_x", "grid_size_y", "grid_size_z", "continuous_snap", "continuous_snap_delay"):
+        try: delattr(bpy.types.Scene, attr)
+        except Exception: pass
+
+# =========================
+# benchmarks (background Blender)
+# =========================
+#
+#   blender -b --python ERF_LevelBuddy.py -- --benchmark --bench-output bench.json
+#   blender -b --python ERF_LevelBuddy.py -- --benchmark --bench-baseline bench.json --bench-threshold 0.15
+
+DEFAULT_BENCH_CASES = "grid:6,stairs:24,detail:32,stack:12"
+
+def bench_grid(scn, n, rng):
+    """n x n touching sectors with mixed floor and ceiling heights."""
+    for i in range(n):
+        for j in range(n):
+            ob = new_brush_object(scn, 'SECTOR', location=(i * 2.0, j * 2.0, 0.0))
+            ob.floor_height = rng.choice((0.0, 0.25, 0.5))
+            ob.ceiling_height = rng.choice((3.0, 3.5, 4.0))
+
+def bench_stairs(scn, n, rng):
+    """A row of n step sectors, each one a quarter unit higher than the last."""
+    for k in range(n):
+        ob = new_brush_object(scn, 'SECTOR', location=(k * 2.0, 0.0, 0.0), scale=(1.0, 2.0, 1.0))
+        ob.floor_height = k * 0.25
+        ob.ceiling_height = k * 0.25 + 4.0
+
+def bench_detail(scn, n, rng):
+    """One large room with n random subtractive pillar brushes."""
+    size = max(4.0, n ** 0.5 * 4.0)
+    room = new_brush_object(scn, 'SECTOR', scale=(size, size, 1.0))
+    room.ceiling_height = 6.0
+    for _ in range(n):
+        ob = new_brush_object(scn, 'BRUSH',
+                              location=(rng.uniform(-size, size), rng.uniform(-size, size), rng.uniform(0.5, 3.0)),
+                              scale=(rng.uniform(0.1, 0.8), rng.uniform(0.1, 0.8), rng.uniform(0.5, 2.0)))
+        ob.csg_operation = 'SUBTRACT'; ob.csg_order = 1
+        ob.rotation_euler.z = rng.uniform(0.0, math.pi)
+
+def bench_stack(scn, n, rng):
+    """A room with n overlapping brushes on n separate csg_orders, alternating operations."""
+    room = new_brush_object(scn, 'SECTOR', scale=(8.0, 8.0, 1.0))
+    room.ceiling_height = 8.0
+    for k in range(n):
+        s = 6.0 * (1.0 - k / (n + 1))
+        ob = new_brush_object(scn, 'BRUSH', location=(rng.uniform(-0.5, 0.5), rng.uniform(-0.5, 0.5), 4.0),
+                              scale=(s, s * 0.8, 3.0 - 2.0 * k / (n + 1)))
+        ob.csg_operation = 'SUBTRACT' if k % 2 == 0 else 'ADD'
+        ob.csg_order = k + 1
+
+BENCH_GENERATORS = {"grid": bench_grid, "stairs": bench_stairs, "detail": bench_detail, "stack": bench_stack}
+
+def _bench_clear_scene(scn):
+    for ob in list(scn.collection.all_objects):
+        bpy.data.objects.remove(ob)
+    for m in list(bpy.data.meshes):
+        if m.users == 0: bpy.data.meshes.remove(m)
+    clear_checkpoints()
+
+def run_benchmark_case(kind, size, repeat=1, seed=0):
+    """Generate one synthetic map into the current scene and time full builds of it."""
+    scn = bpy.context.scene
+    _bench_clear_scene(scn)
+    BENCH_GENERATORS[kind](scn, size, random.Random(seed))
+    brushes = sum(1 for ob in scn.collection.all_objects if ob.brush_type != 'NONE')
+    runs = []
+    for _ in range(max(1, repeat)):
+        profile = new_build_profile()
+        level_map = build_level_geometry(full_rebuild=True, profile=profile)
+        runs.append((profile["total"], profile["phases"]))
+    total, phases = min(runs, key=lambda r: r[0])
+    me = level_map.data
+    return {"kind": kind, "size": size, "seed": seed, "brushes": brushes,
+            "verts": len(me.vertices), "faces": len(me.polygons),
+            "total": round(total, 4), "runs": [round(r[0], 4) for r in runs],
+            "phases": {k: round(v, 4) for k, v in sorted(phases.items())}}
+
+def run_benchmarks(cases=DEFAULT_BENCH_CASES, repeat=1, seed=0):
+    """Run 'kind:size,...' benchmark cases; returns a JSON-serialisable result dict."""
+    scn = bpy.context.scene
+    incremental = scn.build_incremental
+    scn.build_incremental = False
+    results = {}
+    try:
+        for case in cases.split(","):
+            kind, _, size = case.strip().partition(":")
+            if kind not in BENCH_GENERATORS:
+                raise ValueError(f"Unknown benchmark '{kind}' (use one of {', '.join(BENCH_GENERATORS)})")
+            results[f"{kind}_{size or 8}"] = run_benchmark_case(kind, int(size or 8), repeat, seed)
+    finally:
+        scn.build_incremental = incremental
+    return {"blender": bpy.app.version_string, "strategy": scn.build_strategy,
+            "broadphase": scn.use_boolean_broadphase, "cases": results}
+
+def compare_benchmarks(results, baseline, threshold=0.1, min_delta=0.01):
+    """Cases whose total time grew by more than threshold (relative) and min_delta seconds."""
+    regressions = []
+    for key, case in results["cases"].items():
+        base = baseline.get("cases", {}).get(key)
+        if not base: continue
+        delta = case["total"] - base["total"]
+        if delta > min_delta and case["total"] > base["total"] * (1.0 + threshold):
+            regressions.append((key, base["total"], case["total"]))
+    return regressions
+
+# =========================
+# command line (background Blender)
+# =========================
+#
+#   blender -b map.blend --python ERF_LevelBuddy.py -- --save
+#   blender -b map.blend --python ERF_LevelBuddy.py -- --export out/{name}.glb
+#   blender -b --python ERF_LevelBuddy.py -- --jobs 8 --report nightly.json --save maps/*.blend
+
+EXPORT_FORMATS = (".obj", ".fbx", ".glb", ".gltf")
+
+def export_level_geometry(level_map, filepath):
+    """Export only level_map with Blender's exporter matching the file extension."""
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{ext}' (use one of {', '.join(EXPORT_FORMATS)})")
+    os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+    for ob in bpy.context.view_layer.objects:
+        ob.select_set(False)
+    level_map.hide_select = False
+    level_map.select_set(True)
+    try:
+        if ext == ".obj":
+            bpy.ops.wm.obj_export(filepath=filepath, export_selected_objects=True)
+        elif ext == ".fbx":
+            bpy.ops.export_scene.fbx(filepath=filepath, use_selection=True)
+        else:
+            bpy.ops.export_scene.gltf(filepath=filepath, use_selection=True,
+                                      export_format='GLB' if ext == ".glb" else 'GLTF_SEPARATE')
+    finally:
+        level_map.hide_select = True
+
+# ---------- Chunked export ----------
+# Level Buddy's own glTF binary writer. The map is split into a grid of xy chunks and every
+# chunk into one primitive per material. The mesh is read once into its native foreach_get
+# arrays (which cannot be read in slices); vertex records, buffers and indices are built per
+# chunk and streamed into a temporary BIN file, so the per-chunk record memory is bounded
+# while the source arrays still grow with the map. <name>.chunks.json lists the chunk
+# bounds for engine-side culling.
+
+GLTF_FLOAT, GLTF_UNSIGNED_BYTE, GLTF_UNSIGNED_SHORT, GLTF_UNSIGNED_INT = 5126, 5121, 5123, 5125
+GLTF_ARRAY_BUFFER, GLTF_ELEMENT_ARRAY_BUFFER = 34962, 34963
+
+def _corner_normals(me):
+    if hasattr(me, "corner_normals"):
+        return _foreach_array(me.corner_normals, "vector", 3, np.float32).reshape(-1, 3)
+    me.calc_normals_split()
+    return _foreach_array(me.loops, "normal", 3, np.float32).reshape(-1, 3)
+
+def _gltf_axes(v):
+    """Blender Z-up to glTF Y-up: (x, y, z) -> (x, z, -y)."""
+    return np.stack([v[:, 0], v[:, 2], -v[:, 1]], axis=1)
+
+def _write_buffer_view(f, gltf, data, target):
+    """Append data (numpy) to the BIN stream f at a 4-byte boundary; returns the bufferView index."""
+    pad = -f.tell() % 4
+    if pad: f.write(b"\0" * pad)
+    gltf["bufferViews"].append({"buffer": 0, "byteOffset": f.tell(), "byteLength": data.nbytes, "target": target})
+    f.write(data.tobytes())
+    return len(gltf["bufferViews"]) - 1
+
+def _write_accessor(f, gltf, data, kind, target=GLTF_ARRAY_BUFFER, component=GLTF_FLOAT, **extra):
+    view = _write_buffer_view(f, gltf, np.ascontiguousarray(data), target)
+    gltf["accessors"].append(dict({"bufferView": view, "componentType": component,
+                                   "count": len(data), "type": kind}, **extra))
+    return len(gltf["accessors"]) - 1
+
+def export_chunked_glb(level_map, filepath, chunk_size=32.0):
+    """Write level_map as a GLB of xy chunks with one primitive per material; returns the manifest.
+
+    The manifest (also written as <file>.chunks.json) holds every chunk's node, xy cell,
+    materials, triangle count and bounds in glTF (Y-up) space. Only the source arrays span the
+    whole mesh; records are assembled and written one primitive at a time.
+    """
+    me = level_map.data
+    mw = np.array(level_map.matrix_world, dtype=np.float64)
+    me.calc_loop_triangles()
+    tri_loops = _foreach_array(me.loop_triangles, "loops", 3, np.int32).reshape(-1, 3)
+    tri_mat = _foreach_array(me.loop_triangles, "material_index", 1, np.int32)
+    tri_poly = _foreach_array(me.loop_triangles, "polygon_index", 1, np.int32)
+
+    # source arrays as read; per-corner records in glTF space are gathered chunk by chunk
+    co = read_vertex_coords(me)
+    corner_vert = _foreach_array(me.loops, "vertex_index", 1, np.int32)
+    corner_normal = _corner_normals(me)
+    normal_matrix = np.linalg.inv(mw[:3, :3])
+    uv_layer = me.uv_layers.active
+    if uv_layer is not None:
+        uv = _foreach_array(uv_layer.data, "uv", 2, np.float32).reshape(-1, 2)
+    layer = me.color_attributes.active_color if hasattr(me, "color_attributes") else None
+    if layer is not None:
+        color = _foreach_array(layer.data, "color", 4, np.float32).reshape(-1, 4)
+
+    def corner_records(loops):
+        """Position, normal, uv and colour of the given corners as float32 rows."""
+        normal = corner_normal[loops].astype(np.float64) @ normal_matrix
+        normal /= np.maximum(np.linalg.norm(normal, axis=1), 1e-12)[:, None]
+        position = co[corner_vert[loops]].astype(np.float64) @ mw[:3, :3].T + mw[:3, 3]
+        streams = [_gltf_axes(position), _gltf_axes(normal)]
+        if uv_layer is not None:
+            streams.append(np.stack([uv[loops, 0], 1.0 - uv[loops, 1]], axis=1))  # glTF v points down
+        if layer is not None:
+            streams.append(color[corner_vert[loops]] if layer.domain == 'POINT' else color[loops])
+        return np.concatenate(streams, axis=1).astype(np.float32)
+
+    # chunk of every triangle from its polygon's center, then triangles grouped by (chunk, material)
+    center = _foreach_array(me.polygons, "center", 3, np.float32).reshape(-1, 3) @ mw[:3, :3].T + mw[:3, 3]
+    cells, chunk_of = np.unique(np.floor(center[tri_poly, :2] / chunk_size).astype(np.int64), axis=0, return_inverse=True)
+    chunk_of = chunk_of.ravel()
+    order = np.lexsort((tri_mat, chunk_of))
+    group_key = chunk_of[order] * (len(me.materials) + 1) + tri_mat[order]
+    splits = np.flatnonzero(np.diff(group_key)) + 1
+
+    gltf = {"asset": {"version": "2.0", "generator": "Level Buddy chunked export"},
+            "scene": 0, "scenes": [{"name": level_map.name, "nodes": []}], "nodes": [], "meshes": [],
+            "materials": [], "accessors": [], "bufferViews": []}
+    slot_material = []
+    for m in me.materials:
+        if m is None:
+            slot_material.append(None); continue
+        slot_material.append(len(gltf["materials"]))
+        gltf["materials"].append({"name": m.name, "pbrMetallicRoughness": {
+            "baseColorFactor": [float(c) for c in m.diffuse_color], "metallicFactor": 0.0, "roughnessFactor": 1.0}})
+
+    filepath = os.path.abspath(filepath)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    manifest = {"file": os.path.basename(filepath), "up": "Y", "chunk_size": chunk_size, "chunks": []}
+    fd, bin_path = tempfile.mkstemp(suffix=".bin", dir=os.path.dirname(filepath))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            chunk = None
+            for tris in np.split(order, splits) if len(order) else []:
+                c, slot = int(chunk_of[tris[0]]), int(tri_mat[tris[0]])
+                if chunk is None or chunk["cell"] != c:
+                    chunk = {"cell": c, "primitives": [], "materials": [], "triangles": 0, "min": None, "max": None}
+                    gltf["meshes"].append({"name": f"chunk_{cells[c][0]}_{cells[c][1]}", "primitives": chunk["primitives"]})
+                    gltf["nodes"].append({"name": gltf["meshes"][-1]["name"], "mesh": len(gltf["meshes"]) - 1})
+                    gltf["scenes"][0]["nodes"].append(len(gltf["nodes"]) - 1)
+                    manifest["chunks"].append(chunk)
+                # one vertex per distinct corner record of this submesh
+                verts, index = np.unique(corner_records(tri_loops[tris].ravel()), axis=0, return_inverse=True)
+                index = index.ravel().astype(np.uint16 if len(verts) < 65536 else np.uint32)
+                lo, hi = verts[:, :3].min(axis=0), verts[:, :3].max(axis=0)
+                attributes = {"POSITION": _write_accessor(f, gltf, verts[:, 0:3], "VEC3", min=lo.tolist(), max=hi.tolist()),
+                              "NORMAL": _write_accessor(f, gltf, verts[:, 3:6], "VEC3")}
+                k = 6
+                if uv_layer is not None:
+                    attributes["TEXCOORD_0"] = _write_accessor(f, gltf, verts[:, k:k + 2], "VEC2"); k += 2
+                if layer is not None:
+                    rgba = np.round(np.clip(verts[:, k:k + 4], 0.0, 1.0) * 255.0).astype(np.uint8)
+                    attributes["COLOR_0"] = _write_accessor(f, gltf, rgba, "VEC4", component=GLTF_UNSIGNED_BYTE, normalized=True)
+                primitive = {"attributes": attributes, "indices": _write_accessor(
+                    f, gltf, index, "SCALAR", GLTF_ELEMENT_ARRAY_BUFFER,
+                    GLTF_UNSIGNED_SHORT if index.dtype == np.uint16 else GLTF_UNSIGNED_INT)}
+                material = slot_material[slot] if slot < len(slot_material) else None
+                if material is not None: primitive["material"] = material
+                chunk["primitives"].append(primitive)
+                chunk["materials"].append(me.materials[slot].name if material is not None else None)
+                chunk["triangles"] += len(tris)
+                chunk["min"] = lo if chunk["min"] is None else np.minimum(chunk["min"], lo)
+                chunk["max"] = hi if chunk["max"] is None else np.maximum(chunk["max"], hi)
+            pad = -f.tell() % 4
+            if pad: f.write(b"\0" * pad)
+            bin_length = f.tell()
+
+        for node, chunk in enumerate(manifest["chunks"]):
+            bounds = {"min": chunk.pop("min").tolist(), "max": chunk.pop("max").tolist()}
+            del chunk["primitives"]
+            chunk.update(node=node, cell=cells[chunk["cell"]].tolist(), bounds=bounds)
+            gltf["nodes"][node]["extras"] = {"bounds": bounds}
+        if bin_length:
+            gltf["buffers"] = [{"byteLength": bin_length}]
+        for key in ("materials", "meshes", "nodes", "accessors", "bufferViews"):
+            if not gltf[key]: del gltf[key]
+        text = json.dumps(gltf, separators=(",", ":")).encode()
+        text += b" " * (-len(text) % 4)
+        with open(filepath, "wb") as out:
+            total = 12 + 8 + len(text) + (8 + bin_length if bin_length else 0)
+            out.write(np.array([0x46546C67, 2, total], dtype="<u4").tobytes())  # "glTF", version 2
+            out.write(np.array([len(text), 0x4E4F534A], dtype="<u4").tobytes() + text)  # "JSON"
+            if bin_length:
+                out.write(np.array([bin_length, 0x004E4942], dtype="<u4").tobytes())  # "BIN\0"
+                with open(bin_path, "rb") as f:
+                    shutil.copyfileobj(f, out)
+    finally:
+        os.remove(bin_path)
+    with open(os.path.splitext(filepath)[0] + ".chunks.json", "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+# ---------- Collision export ----------
+# Collision hulls straight from brush data, without booleans. Added brushes and sectors
+# are the open (walkable) space of the map and subtracted ones put solid back, so in CSG
+# order the hulls start as one box around the map (padded by the wall thickness), every
+# added convex piece is carved out of them by half-space differences and every
+# subtracted hull is added as a solid. Neighbouring hulls sharing a plane are merged
+# when their union is still convex. A hull is a dict of outward convex polygons with
+# their planes, bounds and volume.
+
+def _face_rings(faces):
+    """Concatenated corners of polygons, the index of each corner's successor, and the face starts."""
+    sizes = np.fromiter((len(f) for f in faces), dtype=np.int64, count=len(faces))
+    starts = np.cumsum(sizes) - sizes
+    nxt = np.arange(int(sizes.sum())) + 1
+    nxt[starts + sizes - 1] = starts
+    return np.concatenate(faces), nxt, starts, sizes
+
+def _hull(faces, decimals=6):
+    """Hull dict of convex polygons oriented outward, or None if it has no volume.
+
+    "planes" holds the unique face planes as rows (nx, ny, nz, d), n·x <= d inside.
+    """
+    faces = [f for f in faces if len(f) >= 3]
+    if len(faces) < 4: return None
+    pts, nxt, starts, sizes = _face_rings(faces)
+    # Newell normals, twice the area vectors of the faces
+    normals = np.add.reduceat(np.cross(pts, pts[nxt]), starts)
+    centers = np.add.reduceat(pts, starts) / sizes[:, None]
+    flip = np.einsum("ij,ij->i", normals, centers - centers.mean(axis=0)) < 0.0
+    if flip.any():
+        faces = [f[::-1] if fl else f for f, fl in zip(faces, flip)]
+        normals[flip] *= -1.0
+    # divergence theorem
+    volume = float(np.einsum("ij,ij->i", normals, centers).sum()) / 6.0
+    if volume < 1e-9: return None
+    length = np.linalg.norm(normals, axis=1)
+    keep = length > 1e-12
+    n = normals[keep] / length[keep, None]
+    planes = np.column_stack((n, np.einsum("ij,ij->i", n, centers[keep])))
+    same = np.all(np.abs(planes[:, None] - planes[None]) < 10.0 ** -decimals, axis=2)
+    planes = planes[~np.tril(same, -1).any(axis=1)]
+    return {"faces": faces, "planes": planes, "lo": pts.min(axis=0), "hi": pts.max(axis=0), "volume": volume}
+
+def clip_hull(hull, n, d, eps=1e-7):
+    """Part of hull with n·x <= d, or None if empty."""
+    pts, nxt, starts, sizes = _face_rings(hull["faces"])
+    dist = pts @ n - d
+    if np.all(dist <= eps): return hull
+    if not np.any(dist < -eps): return None
+    # Sutherland-Hodgman on every polygon at once: each corner emits itself if kept,
+    # then the crossing point of its outgoing edge if that edge crosses the plane
+    dn = dist[nxt]
+    crossing = ((dist < -eps) & (dn > eps)) | ((dist > eps) & (dn < -eps))
+    t = np.zeros(len(pts))
+    t[crossing] = dist[crossing] / (dist[crossing] - dn[crossing])
+    hits = pts + (pts[nxt] - pts) * t[:, None]
+    emit = np.stack((dist <= eps, crossing), axis=1)
+    counts = np.add.reduceat(emit.sum(axis=1), starts)
+    faces = [f for f in np.split(np.stack((pts, hits), axis=1)[emit], np.cumsum(counts)[:-1]) if len(f) >= 3]
+    # cap: the points on the plane ordered counter-clockwise around n
+    cut = np.concatenate((hits[crossing], pts[np.abs(dist) <= eps]))
+    if len(cut) >= 3:
+        u = np.cross(n, (1.0, 0.0, 0.0) if abs(n[0]) < 0.9 else (0.0, 1.0, 0.0)); u /= np.linalg.norm(u)
+        rel = cut - cut.mean(axis=0)
+        cut = cut[np.argsort(np.arctan2(rel @ np.cross(n, u), rel @ u))]
+        step = np.linalg.norm(cut - np.roll(cut, -1, axis=0), axis=1)
+        faces.append(cut[step > 1e-9])
+    return _hull(faces)
+
+def subtract_hull(hull, other, eps=1e-7):
+    """Convex pieces of hull outside the convex hull other."""
+    pieces, rest = [], hull
+    for n, d in zip(other["planes"][:, :3], other["planes"][:, 3]):
+        dist = np.concatenate(rest["faces"]) @ n - d
+        if np.all(dist <= eps): continue
+        if np.all(dist >= -eps):
+            pieces.append(rest); break
+        pieces.append(clip_hull(rest, -n, -d))
+        rest = clip_hull(rest, n, d)
+        if rest is None: break
+    return [p for p in pieces if p is not None]
+
+def _box_hull(lo, hi):
+    c = np.array([[x, y, z] for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+    return _hull([c[[0, 1, 3, 2]], c[[4, 5, 7, 6]], c[[0, 1, 5, 4]], c[[2, 3, 7, 6]], c[[0, 2, 6, 4]], c[[1, 3, 7, 5]]])
+
+def _convex_hull_of(points):
+    bm = bmesh.new()
+    try:
+        for p in np.unique(np.round(points, 9), axis=0): bm.verts.new(p)
+        result = bmesh.ops.convex_hull(bm, input=bm.verts[:])
+        bmesh.ops.delete(bm, geom=list({v for v in result["geom_interior"] + result["geom_unused"]
+                                        if isinstance(v, bmesh.types.BMVert)}), context='VERTS')
+        bm.normal_update()
+        bmesh.ops.dissolve_limit(bm, angle_limit=1e-4, verts=bm.verts[:], edges=bm.edges[:])
+        return _hull([np.array([v.co for v in f.verts], dtype=np.float64) for f in bm.faces])
+    finally:
+        bm.free()
+
+def _is_convex_2d(pts):
+    e = np.roll(pts, -1, axis=0) - pts
+    cross = e[:, 0] * np.roll(e[:, 1], -1) - e[:, 1] * np.roll(e[:, 0], -1)
+    return bool(np.all(cross >= -1e-9) or np.all(cross <= 1e-9))
+
+def brush_collision_hulls(ob):
+    """Convex hulls of a brush in world space: sector prisms per footprint face, brushes as their hull."""
+    m = np.array(object_matrix(ob), dtype=np.float64)
+    if ob.brush_type == 'SECTOR':
+        me = ob.data
+        if abs(ob.ceiling_height - ob.floor_height) < 1e-9 or not len(me.polygons): return []
+        co = read_vertex_coords(me).astype(np.float64)
+        up = -1.0 if _foreach_array(me.polygons, "normal", 3, np.float32)[2::3].sum() < 0.0 else 1.0
+        me.calc_loop_triangles()
+        hulls = []
+        for poly in me.polygons:
+            ring = list(poly.vertices)
+            rings = [ring] if _is_convex_2d(co[ring, :2]) else \
+                [list(t.vertices) for t in me.loop_triangles if t.polygon_index == poly.index]
+            for ring in rings:
+                bottom, top = co[ring].copy(), co[ring].copy()
+                bottom[:, 2] += up * ob.floor_height; top[:, 2] += up * ob.ceiling_height
+                bottom, top = bottom @ m[:3, :3].T + m[:3, 3], top @ m[:3, :3].T + m[:3, 3]
+                k = len(ring)
+                hull = _hull([bottom, top] + [np.array([bottom[i], bottom[(i + 1) % k], top[(i + 1) % k], top[i]])
+                                              for i in range(k)])
+                if hull is not None: hulls.append(hull)
+        return hulls
+    me = evaluate_object_mesh(ob) if ob.modifiers else ob.data
+    try:
+        co = read_vertex_coords(me).astype(np.float64)
+    finally:
+        if me is not ob.data: bpy.data.meshes.remove(me)
+    if len(co) < 4: return []
+    hull = _convex_hull_of(co @ m[:3, :3].T + m[:3, 3])
+    return [hull] if hull is not None else []
+
+def _shares_plane(a, b, tolerance):
+    pa, pb = a["planes"], b["planes"]
+    return bool(np.any((pa[:, :3] @ pb[:, :3].T < -1.0 + 1e-6) & (np.abs(pa[:, 3, None] + pb[None, :, 3]) < tolerance)))
+
+def merge_hull_pair(a, b, tolerance=1e-5):
+    """Single hull covering exactly a and b, or None if their union is not convex.
+
+    The faces of a convex union lie on face planes of a or b, and every face plane but
+    the shared one keeps all points of both. The union is then the box around both
+    clipped by those planes; any volume beyond a's and b's means it was not convex.
+    """
+    points = np.concatenate(a["faces"] + b["faces"])
+    planes = np.concatenate((a["planes"], b["planes"]))
+    keep = np.all(points @ planes[:, :3].T - planes[:, 3] <= tolerance, axis=0)
+    if len(planes) - np.count_nonzero(keep) > 2: return None
+    merged = _box_hull(points.min(axis=0), points.max(axis=0))
+    for n, d in zip(planes[keep, :3], planes[keep, 3]):
+        merged = clip_hull(merged, n, d)
+        if merged is None: return None
+    return merged if abs(merged["volume"] - a["volume"] - b["volume"]) <= 1e-6 * max(1.0, merged["volume"]) else None
+
+def merge_coplanar_hulls(hulls, tolerance=1e-5):
+    """Merge hulls that touch along a shared plane and whose union is convex."""
+    hulls = list(hulls)
+    i = 0
+    while i < len(hulls):
+        lo = np.array([h["lo"] for h in hulls]); hi = np.array([h["hi"] for h in hulls])
+        a = hulls[i]
+        near = np.flatnonzero(np.all(lo <= a["hi"] + tolerance, axis=1) & np.all(a["lo"] <= hi + tolerance, axis=1))
+        for j in near:
+            if j == i or not _shares_plane(a, hulls[j], tolerance): continue
+            merged = merge_hull_pair(a, hulls[j], tolerance)
+            if merged is not None:
+                hulls[i] = merged; del hulls[j]
+                if j < i: i -= 1
+                break
+        else:
+            i += 1
+    return hulls
+
+def collision_hulls(scn, thickness=1.0):
+    """Solid convex hulls of the map in world space, in CSG order, without the boolean pipeline."""
+    brushes = [(ob, brush_collision_hulls(ob)) for ob in _scene_brushes(scn)]
+    free_build_scene()
+    open_space = [h for ob, hulls in brushes if ob.csg_operation == 'ADD' for h in hulls]
+    if not open_space: return []
+    lo = np.min([h["lo"] for h in open_space], axis=0) - thickness
+    hi = np.max([h["hi"] for h in open_space], axis=0) + thickness
+    solids = [_box_hull(lo, hi)]
+    for ob, hulls in brushes:
+        if ob.csg_operation == 'ADD':
+            for hull in hulls:
+                lo = np.array([s["lo"] for s in solids]); hi = np.array([s["hi"] for s in solids])
+                cut = np.all(lo < hull["hi"], axis=1) & np.all(hull["lo"] < hi, axis=1)
+                # merging the fresh pieces right away keeps later carves from fragmenting them further
+                solids = [s for s, c in zip(solids, cut) if not c] + \
+                    merge_coplanar_hulls([piece for s, c in zip(solids, cut) if c for piece in subtract_hull(s, hull)])
+        else:
+            solids.extend(hulls)
+    return merge_coplanar_hulls(solids)
+
+def export_collision_hulls(scn, filepath, thickness=1.0):
+    """Write the collision hulls as JSON (points and planes per hull, Z up); returns the hull count."""
+    precision = scn.map_precision
+    data = {"up": "Z", "thickness": thickness, "hulls": []}
+    for hull in collision_hulls(scn, thickness):
+        points = np.unique(np.round(np.concatenate(hull["faces"]), precision), axis=0)
+        planes = np.column_stack((np.round(hull["planes"][:, :3], 6), np.round(hull["planes"][:, 3], precision))) + 0.0
+        data["hulls"].append({"points": points.tolist(), "planes": planes.tolist()})
+    filepath = os.path.abspath(filepath)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    return len(data["hulls"])
+
+def _cli_parser():
+    parser = argparse.ArgumentParser(
+        prog="blender -b [map.blend] --python ERF_LevelBuddy.py --",
+        description="Build Level Buddy maps without a UI. With map files given, fan them out "
+                    "across background Blender processes; otherwise build the open .blend.",
+    )
+    parser.add_argument("maps", nargs="*", help="map .blend files to build in parallel (driver mode)")
+    parser.add_argument("--save", action="store_true", help="save the built map back into its .blend")
+    parser.add_argument("--output", help="save the built map as this .blend ({name} = map name)")
+    parser.add_argument("--export", help="export LevelGeometry to .obj/.fbx/.glb/.gltf ({name} = map name)")
+    parser.add_argument("--bake-ao", action="store_true", help="bake vertex AO into the color attribute after the build (scene samples and distance)")
+    parser.add_argument("--export-chunks", help="write LevelGeometry as a chunked .glb plus .chunks.json manifest ({name} = map name)")
+    parser.add_argument("--chunk-size", type=float, default=32.0, help="edge length of the exported chunks (%(default)s)")
+    parser.add_argument("--export-collision", help="write convex collision hulls as JSON; skips the build if nothing else is asked ({name} = map name)")
+    parser.add_argument("--collision-thickness", type=float, default=1.0, help="solid kept around the open space (%(default)s)")
+    parser.add_argument("--export-pvs", help="write the sector portal graph and PVS bitsets; skips the build if nothing else is asked ({name} = map name)")
+    parser.add_argument("--strategy", choices=("SEQUENTIAL", "TREE", "BATCHED"), help="override the scene's build strategy")
+    parser.add_argument("--solver", choices=("EXACT", "ADAPTIVE"), help="override the scene's boolean solver policy")
+    parser.add_argument("--full-rebuild", action="store_true", help="ignore incremental-build checkpoints and cache hits")
+    parser.add_argument("--cache", help="enable the build cache in this directory (may be shared between machines)")
+    parser.add_argument("--regions", type=int, help="build each map in this many parallel regions")
+    parser.add_argument("--region-job", help=argparse.SUPPRESS)
+    parser.add_argument("--profile-trace", help="write a Chrome trace JSON of the build ({name} = map name)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="parallel Blender processes (driver mode)")
+    parser.add_argument("--blender", default=bpy.app.binary_path, help="Blender executable for worker processes")
+    parser.add_argument("--log-dir", help="directory for per-map logs (default: next to each map)")
+    parser.add_argument("--timeout", type=float, help="seconds before a worker is killed")
+    parser.add_argument("--report", help="write a JSON summary of all maps to this path")
+    bench = parser.add_argument_group("benchmarks")
+    bench.add_argument("--benchmark", action="store_true", help="build synthetic maps and time every build phase")
+    bench.add_argument("--bench-cases", default=DEFAULT_BENCH_CASES, help="comma separated kind:size list (%(default)s)")
+    bench.add_argument("--bench-repeat", type=int, default=3, help="builds per case, the fastest counts")
+    bench.add_argument("--bench-seed", type=int, default=0)
+    bench.add_argument("--bench-output", help="write results as JSON")
+    bench.add_argument("--bench-baseline", help="compare against a stored results JSON")
+    bench.add_argument("--bench-threshold", type=float, default=0.1, help="relative slowdown flagged as regression")
+    return parser
+
+def _map_name():
+    return os.path.splitext(os.path.basename(bpy.data.filepath))[0] or "untitled"
+
+def cli_build(args):
+    """Build the open .blend and save/export it; returns a process exit code."""
+    scn = bpy.context.scene
+    if args.strategy:
+        scn.build_strategy = args.strategy
+    if args.solver:
+        scn.build_solver = args.solver
+    if args.cache:
+        scn.build_cache_enable = True; scn.build_cache_dir = os.path.abspath(args.cache)
+    if args.regions is not None:
+        scn.build_regions = args.regions
+    start = time.perf_counter()
+    if args.export_collision:
+        count = export_collision_hulls(scn, args.export_collision.format(name=_map_name()), args.collision_thickness)
+        print(f"Level Buddy: {count} collision hulls for {_map_name()} in {time.perf_counter() - start:.2f}s")
+    if args.export_pvs:
+        start = time.perf_counter()
+        sectors, portals, pairs = export_sector_pvs(scn, args.export_pvs.format(name=_map_name()))
+        print(f"Level Buddy: PVS of {sectors} sectors, {portals} portals, {pairs} visible pairs for {_map_name()} "
+              f"in {time.perf_counter() - start:.2f}s")
+    if args.export_collision or args.export_pvs:
+        if not (args.save or args.output or args.export or args.export_chunks or args.profile_trace): return 0
+        start = time.perf_counter()
+    profile = new_build_profile() if args.profile_trace else None
+    level_map = build_level_geometry(full_rebuild=args.full_rebuild, profile=profile, blender=args.blender)
+    if profile is not None:
+        write_chrome_trace(profile, args.profile_trace.format(name=_map_name()))
+    me = level_map.data
+    print(f"Level Buddy: built {_map_name()} in {time.perf_counter() - start:.2f}s "
+          f"({len(me.vertices)} verts, {len(me.polygons)} faces)")
+    if args.bake_ao:
+        start = time.perf_counter()
+        points, cast = bake_vertex_ao(level_map, scn.ao_samples, scn.ao_distance)
+        print(f"Level Buddy: baked AO for {cast} of {points} points in {time.perf_counter() - start:.2f}s")
+    if args.export:
+        export_level_geometry(level_map, args.export.format(name=_map_name()))
+    if args.export_chunks:
+        export_chunked_glb(level_map, args.export_chunks.format(name=_map_name()), args.chunk_size)
+    if args.output:
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(args.output.format(name=_map_name())), copy=True)
+    elif args.save:
+        if not bpy.data.filepath:
+            print("Level Buddy: --save needs a .blend file", file=sys.stderr)
+            return 1
+        bpy.ops.wm.save_mainfile()
+    return 0
+
+CLI_OUTPUT_OPTIONS = ("output", "export", "export_chunks", "export_collision", "export_pvs", "profile_trace")
+
+def _worker_command(args, map_path):
+    cmd = [args.blender, "-b", map_path, "--factory-startup", "--python-exit-code", "1",
+           "--python", os.path.abspath(__file__), "--"]
+    if args.save: cmd.append("--save")
+    if args.output: cmd += ["--output", args.output]
+    if args.export: cmd += ["--export", args.export]
+    if args.bake_ao: cmd.append("--bake-ao")
+    if args.export_chunks: cmd += ["--export-chunks", args.export_chunks, "--chunk-size", str(args.chunk_size)]
+    if args.export_collision: cmd += ["--export-collision", args.export_collision, "--collision-thickness", str(args.collision_thickness)]
+    if args.export_pvs: cmd += ["--export-pvs", args.export_pvs]
+    if args.strategy: cmd += ["--strategy", args.strategy]
+    if args.solver: cmd += ["--solver", args.solver]
+    if args.full_rebuild: cmd.append("--full-rebuild")
+    if args.cache: cmd += ["--cache", os.path.abspath(args.cache)]
+    if args.regions is not None: cmd += ["--regions", str(args.regions)]
+    if args.profile_trace: cmd += ["--profile-trace", args.profile_trace]
+    return cmd
+
+def _run_worker(args, map_path):
+    name = os.path.splitext(os.path.basename(map_path))[0]
+    log_dir = args.log_dir or os.path.dirname(os.path.abspath(map_path))
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, name + ".levelbuddy.log")
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        try:
+            code = subprocess.run(_worker_command(args, map_path), stdout=log, stderr=subprocess.STDOUT,
+                                  stdin=subprocess.DEVNULL, timeout=args.timeout).returncode
+        except subprocess.TimeoutExpired:
+            log.write(f"\nLevel Buddy: killed after {args.timeout}s\n")
+            code = -1
+        except OSError as e:
+            log.write(f"\nLevel Buddy: could not start Blender: {e}\n")
+            code = -2
+    return {"map": os.path.abspath(map_path), "exit_code": code,
+            "seconds": round(time.perf_counter() - start, 3), "log": log_path}
+
+def cli_drive(args):
+    """Build every map in its own background Blender, args.jobs at a time; returns an exit code."""
+    if not args.blender:
+        print("Level Buddy: no Blender executable, pass --blender", file=sys.stderr)
+        return 2
+    if len(args.maps) > 1:
+        # every worker writes its own file, so a path without {name} would be overwritten per map
+        fixed = [option for option in CLI_OUTPUT_OPTIONS if getattr(args, option) and "{name}" not in getattr(args, option)]
+        if fixed:
+            print("Level Buddy: with several maps " + ", ".join("--" + o.replace("_", "-") for o in fixed)
+                  + " must contain {name}", file=sys.stderr)
+            return 2
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = list(pool.map(lambda m: _run_worker(args, m), args.maps))
+    for r in results:
+        status = "ok" if r["exit_code"] == 0 else f"FAILED ({r['exit_code']})"
+        print(f"{status:>12}  {r['seconds']:8.2f}s  {r['map']}  [{r['log']}]")
+    failed = sum(1 for r in results if r["exit_code"] != 0)
+    total = time.perf_counter() - start
+    print(f"Level Buddy: {len(results) - failed}/{len(results)} maps built in {total:.2f}s with {args.jobs} jobs")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"jobs": args.jobs, "seconds": round(total, 3), "failed": failed, "maps": results}, f, indent=2)
+    return 1 if failed else 0
+
+def cli_benchmark(args):
+    if args.strategy:
+        bpy.context.scene.build_strategy = args.strategy
+    if args.solver:
+        bpy.context.scene.build_solver = args.solver
+    results = run_benchmarks(args.bench_cases, args.bench_repeat, args.bench_seed)
+    for key, case in results["cases"].items():
+        slowest = sorted(case["phases"].items(), key=lambda p: -p[1])[:3]
+        print(f"{key:>14}  {case['brushes']:5d} brushes  {case['total']:8.3f}s  "
+              + "  ".join(f"{k} {v:.3f}s" for k, v in slowest))
+    if args.bench_output:
+        with open(args.bench_output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.bench_baseline:
+        with open(args.bench_baseline) as f:
+            regressions = compare_benchmarks(results, json.load(f), args.bench_threshold)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: {before:.3f}s -> {after:.3f}s (+{(after / before - 1.0) * 100.0:.0f}%)")
+        if regressions:
+            return 1
+    return 0
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    if "--" not in argv:
+        register()
+        return
+    args = _cli_parser().parse_args(argv[argv.index("--") + 1:])
+    if args.region_job:
+        build_region_job(args.region_job)
+        code = 0
+    elif args.benchmark:
+        code = cli_benchmark(args)
+    else:
+        code = cli_drive(args) if args.maps else cli_build(args)
+    if code:
+        sys.exit(code)
 
 if __name__ == "__main__":
-    register()
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the add-on is a single module at the repository root; outside Blender it only exposes
+# the numpy algorithms, which is what these tests cover
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,30 @@
+import ERF_LevelBuddy as lb
+
+
+def results(**totals):
+    return {"cases": {key: {"total": total} for key, total in totals.items()}}
+
+
+def test_regression_past_threshold_is_reported():
+    base = results(grid_6=1.0, stairs_24=2.0)
+    assert lb.compare_benchmarks(results(grid_6=1.2, stairs_24=2.1), base) == [("grid_6", 1.0, 1.2)]
+
+
+def test_speedups_and_noise_are_not_regressions():
+    base = results(grid_6=1.0, stairs_24=2.0)
+    assert lb.compare_benchmarks(results(grid_6=0.5, stairs_24=2.19), base) == []
+    # small cases: relative growth alone is below min_delta seconds
+    assert lb.compare_benchmarks(results(tiny_1=0.008), results(tiny_1=0.004)) == []
+    assert lb.compare_benchmarks(results(tiny_1=0.008), results(tiny_1=0.004), min_delta=0.001) == \
+        [("tiny_1", 0.004, 0.008)]
+
+
+def test_threshold_is_configurable():
+    base, run = results(grid_6=1.0), results(grid_6=1.12)
+    assert lb.compare_benchmarks(run, base, threshold=0.15) == []
+    assert lb.compare_benchmarks(run, base, threshold=0.05) == [("grid_6", 1.0, 1.12)]
+
+
+def test_cases_missing_from_the_baseline_are_skipped():
+    assert lb.compare_benchmarks(results(detail_32=5.0), results(grid_6=1.0)) == []
+    assert lb.compare_benchmarks(results(detail_32=5.0), {}) == []
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import ERF_LevelBuddy as lb
+
+
+def box(lo, hi):
+    return lb._box_hull(np.array(lo, dtype=np.float64), np.array(hi, dtype=np.float64))
+
+
+def test_box_hull_volume_and_bounds():
+    hull = box((0, 0, 0), (2, 3, 4))
+    assert hull["volume"] == pytest.approx(24.0)
+    assert len(hull["planes"]) == 6
+    assert np.allclose(hull["lo"], (0, 0, 0)) and np.allclose(hull["hi"], (2, 3, 4))
+
+
+def test_clip_hull_halves_a_box():
+    half = lb.clip_hull(box((0, 0, 0), (2, 2, 2)), np.array((1.0, 0.0, 0.0)), 1.0)
+    assert half["volume"] == pytest.approx(4.0)
+    assert np.allclose(half["hi"], (1, 2, 2))
+
+
+def test_clip_hull_keeps_or_drops_whole_box():
+    hull = box((0, 0, 0), (1, 1, 1))
+    assert lb.clip_hull(hull, np.array((0.0, 0.0, 1.0)), 2.0) is hull
+    assert lb.clip_hull(hull, np.array((0.0, 0.0, 1.0)), -1.0) is None
+
+
+def test_clip_hull_diagonal_cut():
+    wedge = lb.clip_hull(box((0, 0, 0), (1, 1, 1)), np.array((1.0, 1.0, 0.0)) / np.sqrt(2.0), np.sqrt(0.5))
+    assert wedge["volume"] == pytest.approx(0.5)
+    assert len(wedge["planes"]) == 5
+
+
+def test_subtract_inner_box_leaves_a_shell():
+    pieces = lb.subtract_hull(box((0, 0, 0), (4, 4, 4)), box((1, 1, 1), (3, 3, 3)))
+    assert len(pieces) == 6
+    assert sum(p["volume"] for p in pieces) == pytest.approx(56.0)
+    for p in pieces:
+        # no piece reaches into the removed box
+        assert np.any((p["hi"] <= 1.0 + 1e-9) | (p["lo"] >= 3.0 - 1e-9))
+
+
+def test_subtract_corner_box():
+    pieces = lb.subtract_hull(box((0, 0, 0), (2, 2, 2)), box((1, 1, 1), (3, 3, 3)))
+    assert len(pieces) == 3
+    assert sum(p["volume"] for p in pieces) == pytest.approx(7.0)
+
+
+def test_subtract_disjoint_and_covering_boxes():
+    hull = box((0, 0, 0), (1, 1, 1))
+    assert lb.subtract_hull(hull, box((2, 0, 0), (3, 1, 1))) == [hull]
+    assert lb.subtract_hull(hull, box((-1, -1, -1), (2, 2, 2))) == []
+
+
+def test_merge_adjacent_boxes():
+    merged = lb.merge_hull_pair(box((0, 0, 0), (1, 1, 1)), box((1, 0, 0), (3, 1, 1)))
+    assert merged["volume"] == pytest.approx(3.0)
+    assert len(merged["planes"]) == 6
+    assert np.allclose(merged["lo"], (0, 0, 0)) and np.allclose(merged["hi"], (3, 1, 1))
+
+
+def test_merge_refuses_non_convex_union():
+    assert lb.merge_hull_pair(box((0, 0, 0), (2, 1, 1)), box((0, 1, 0), (1, 2, 1))) is None
+
+
+def test_subtracted_shell_merges_back_to_fewer_hulls():
+    pieces = lb.subtract_hull(box((0, 0, 0), (4, 1, 1)), box((1, -1, -1), (2, 2, 2)))
+    merged = lb.merge_coplanar_hulls(pieces + [box((1, 0, 0), (2, 1, 1))])
+    assert len(merged) == 1
+    assert merged[0]["volume"] == pytest.approx(4.0)
@@ -0,0 +1,66 @@
+import numpy as np
+
+import ERF_LevelBuddy as lb
+
+
+def room(x0, y0, x1, y1, z0=0.0, z1=3.0):
+    """Sector dict as sector_volumes builds it: outline edges with the room on their left."""
+    pts = np.array(((x0, y0), (x1, y0), (x1, y1), (x0, y1)), dtype=np.float64)
+    return {"edges": (pts, np.roll(pts, -1, axis=0)), "lo": np.array((x0, y0, z0)), "hi": np.array((x1, y1, z1))}
+
+
+def pairs(portals):
+    return sorted((i, j) for i, j, _, _ in portals)
+
+
+def test_clip_polygon():
+    square = [(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0), (0.0, 1.0, 0.0)]
+    half = lb._clip_polygon(square, (1.0, 0.0, 0.0), 0.5)
+    assert sorted(half) == [(0.5, 0.0, 0.0), (0.5, 1.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0)]
+    assert lb._clip_polygon(square, (1.0, 0.0, 0.0), -1.0) is square
+    assert lb._clip_polygon(square, (1.0, 0.0, 0.0), 2.0) is None
+    assert len(lb._clip_polygon(square, (0.6, 0.8, 0.0), 1.2)) == 3
+
+
+def test_doorway_portals():
+    # two rooms joined by a low, narrow doorway sector
+    sectors = [room(0, 0, 4, 4), room(4, 1.5, 5, 2.5, 0.0, 2.0), room(5, 0, 9, 4)]
+    portals = lb.sector_portals(sectors)
+    assert pairs(portals) == [(0, 1), (1, 2)]
+    i, j, quad, n = next(p for p in portals if p[:2] == (0, 1))
+    assert np.allclose(quad[:, 0], 4.0)
+    assert np.allclose(sorted(set(quad[:, 1])), (1.5, 2.5)) and np.allclose(sorted(set(quad[:, 2])), (0.0, 2.0))
+    assert np.allclose(n, (1.0, 0.0, 0.0))
+
+
+def test_rooms_joined_by_doorway_see_each_other():
+    sectors = [room(0, 0, 4, 4), room(4, 1.5, 5, 2.5, 0.0, 2.0), room(5, 0, 9, 4)]
+    visible = lb.sector_pvs(lb.sector_portals(sectors), [0, 1, 2])
+    assert visible.all()
+
+
+def test_no_portal_between_rooms_that_only_touch_at_a_corner():
+    assert lb.sector_portals([room(0, 0, 1, 1), room(1, 1, 2, 2)]) == []
+    visible = lb.sector_pvs([], [0, 1])
+    assert visible.tolist() == [[True, False], [False, True]]
+
+
+def test_corridor_around_a_bend_hides_the_far_room():
+    # A -> B heads +x, B -> C heads +y, C -> D heads back -x: no line crosses all three
+    sectors = [room(0, 0, 1, 1), room(1, 0, 2, 1), room(1, 1, 2, 2), room(0, 1.5, 1, 2.5)]
+    portals = lb.sector_portals(sectors)
+    assert pairs(portals) == [(0, 1), (1, 2), (2, 3)]
+    visible = lb.sector_pvs(portals, [0, 1, 2, 3])
+    assert (visible == visible.T).all()
+    assert visible[0, :3].all() and not visible[0, 3]
+    assert visible[1].all() and visible[3, 1:].all()
+    # without a budget for portal chains every group keeps its flood set, a superset
+    flood = lb.sector_pvs(portals, [0, 1, 2, 3], budget=0)
+    assert (flood | visible == flood).all()
+
+
+def test_grouped_sectors_share_visibility():
+    sectors = [room(0, 0, 1, 1), room(1, 0, 2, 1), room(1, 1, 2, 2), room(0, 1.5, 1, 2.5)]
+    # C and D open into each other without a portal, so whatever sees one sees both
+    visible = lb.sector_pvs(lb.sector_portals(sectors), [0, 1, 2, 2])
+    assert visible[0].all()
@@ -0,0 +1,55 @@
+import numpy as np
+
+import ERF_LevelBuddy as lb
+
+
+def row(count, axis=0, gap=1.0):
+    """count unit boxes in a row along axis, gap apart."""
+    boxes = []
+    for k in range(count):
+        lo = np.zeros(3); lo[axis] = k * (1.0 + gap)
+        boxes.append((lo, lo + 1.0))
+    return boxes
+
+
+def slab_sizes(boxes, axis, cuts):
+    centers = [(lo[axis] + hi[axis]) * 0.5 for lo, hi in boxes]
+    return np.bincount(np.searchsorted(cuts, centers), minlength=len(cuts) + 1).tolist()
+
+
+def test_split_is_balanced():
+    boxes = row(16)
+    axis, cuts = lb.partition_regions(boxes, 4)
+    assert axis == 0 and len(cuts) == 3
+    assert slab_sizes(boxes, axis, cuts) == [4, 4, 4, 4]
+
+
+def test_split_follows_the_longer_axis():
+    boxes = row(9, axis=1)
+    axis, cuts = lb.partition_regions(boxes, 3)
+    assert axis == 1
+    assert slab_sizes(boxes, axis, cuts) == [3, 3, 3]
+
+
+def test_uneven_density_is_split_by_brush_count():
+    # a dense cluster on the left and a few brushes spread out to the right
+    boxes = row(12, gap=0.25) + [(lo + (40.0, 0, 0), hi + (40.0, 0, 0)) for lo, hi in row(4, gap=9.0)]
+    axis, cuts = lb.partition_regions(boxes, 2)
+    assert slab_sizes(boxes, axis, cuts) == [8, 8]
+
+
+def test_cuts_stay_off_brush_faces():
+    # touching boxes: every candidate cut is halfway between two faces
+    boxes = row(16, gap=0.0)
+    axis, cuts = lb.partition_regions(boxes, 4)
+    faces = np.array([b[k][axis] for b in boxes for k in (0, 1)])
+    assert len(cuts) == 3
+    assert np.abs(np.array(cuts)[:, None] - faces[None, :]).min() >= 0.5 - 1e-9
+    assert max(slab_sizes(boxes, axis, cuts)) - min(slab_sizes(boxes, axis, cuts)) <= 2
+
+
+def test_nothing_to_split():
+    assert lb.partition_regions(row(5), 1)[1] == []
+    # more regions than gaps between faces: at most one cut per gap
+    axis, cuts = lb.partition_regions(row(3), 8)
+    assert len(cuts) == len(set(cuts)) <= 5